@@ -0,0 +1,86 @@
+"""
+File selection of ZipPackage.filter_package on a large project tree
+
+Compares the former approach (one recursive glob per include and exclude
+pattern, set difference, then fnmatch against IGNORE_PATTERNS) with the
+single pruning os.scandir walk.
+
+Usage:
+    python -m benchmarks.bench_filter_package [--files 100000]
+"""
+
+import argparse
+import fnmatch
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from benchmarks.common import set_mocks, measure
+
+set_mocks()
+
+from lambda_packaging.zip_package import ZipPackage, IGNORE_PATTERNS  # noqa: E402
+
+EXCLUDE = ["node_modules/**", "tests/**"]
+
+
+def generate_tree(root, files):
+    """
+    Writes a project where most files live in excluded or hidden directories
+    """
+    layout = [
+        ("src", 0.1),
+        ("node_modules", 0.5),
+        (".venv/lib/site-packages", 0.3),
+        ("tests", 0.1),
+    ]
+    for folder, share in layout:
+        count = int(files * share)
+        for i in range(count):
+            directory = os.path.join(root, folder, f"pkg_{i // 100}", f"sub_{i % 10}")
+            os.makedirs(directory, exist_ok=True)
+            open(os.path.join(directory, f"module_{i}.py"), "w").close()
+
+
+def glob_filter_package(package):
+    """Former implementation of ZipPackage.filter_package"""
+    exclude = [str(Path(p)) for p in package.exclude]
+    include = [str(Path(p)) for p in package.include]
+    exclude_files = package._match_glob_files(exclude)
+    include_files = package._match_glob_files(include)
+    files = set(include_files) - set(exclude_files)
+    return sorted(
+        f
+        for f in files
+        if not any(fnmatch.fnmatch(Path(f), p) for p in IGNORE_PATTERNS)
+        and os.path.isfile(f)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--files", type=int, default=100000)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp()
+    try:
+        generate_tree(root, args.files)
+        package = ZipPackage(
+            resource_name="benchmark", project_root=root, exclude=EXCLUDE
+        )
+        print(f"synthetic tree: {args.files} files")
+
+        expected, glob_time = measure(lambda: glob_filter_package(package))
+        print(f"      glob: {glob_time:6.2f} s, {len(expected)} files")
+
+        files, walk_time = measure(package.filter_package)
+        print(f"      walk: {walk_time:6.2f} s, {len(files)} files")
+
+        assert files == expected, "file selection differs"
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
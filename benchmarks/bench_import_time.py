@@ -0,0 +1,114 @@
+"""
+Import time of a packaged dependency tree with and without precompiled bytecode
+
+Archives a synthetic package with ZipPackage, once as sources only and once
+with compile_bytecode, extracts each archive and times the import of the
+package in fresh interpreters run with -B, like a read-only lambda task root
+where compiled modules cannot be cached.
+
+Usage:
+    python -m benchmarks.bench_import_time [--modules 200] [--functions 50] [--runs 5]
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import zipfile
+
+from benchmarks.common import set_mocks
+
+IMPORT_SCRIPT = """
+import time
+start = time.perf_counter()
+import synthetic
+print(time.perf_counter() - start)
+"""
+
+
+def generate_tree(root, modules, functions):
+    """
+    Writes a "synthetic" package of modules imported by its __init__.py
+    """
+    package = os.path.join(root, "synthetic")
+    os.makedirs(package)
+    with open(os.path.join(package, "__init__.py"), "w") as f:
+        for i in range(modules):
+            f.write(f"from . import module_{i}\n")
+    for i in range(modules):
+        with open(os.path.join(package, f"module_{i}.py"), "w") as f:
+            for j in range(functions):
+                f.write(
+                    f"def function_{j}(values, factor={j}):\n"
+                    f"    '''Scales the even values of values'''\n"
+                    f"    return [value * factor for value in values if value % 2 == 0]\n\n"
+                )
+
+
+def build_archive(root, target, compile_bytecode):
+    set_mocks()
+    from lambda_packaging.zip_package import ZipPackage
+
+    package = ZipPackage(
+        resource_name="benchmark",
+        project_root=root,
+        target_folder=target,
+        incremental=False,
+        compile_bytecode=compile_bytecode,
+        runtime=f"python{sys.version_info.major}.{sys.version_info.minor}",
+    )
+    return package.zip_package(requirements=False)
+
+
+def time_imports(path, runs):
+    timings = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-B", "-c", IMPORT_SCRIPT],
+            cwd=path,
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+        timings.append(float(result.stdout))
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--modules", type=int, default=200)
+    parser.add_argument("--functions", type=int, default=50)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    try:
+        root = os.path.join(tmp, "project")
+        generate_tree(root, args.modules, args.functions)
+        print(
+            f"synthetic package: {args.modules} modules of {args.functions} functions"
+        )
+
+        for compile_bytecode in (False, True):
+            name = "pycs" if compile_bytecode else "sources"
+            archive = build_archive(
+                root, os.path.join(tmp, f"dist-{name}"), compile_bytecode
+            )
+            extracted = os.path.join(tmp, name)
+            with zipfile.ZipFile(archive) as zip_file:
+                zip_file.extractall(extracted)
+
+            elapsed = time_imports(extracted, args.runs)
+            size_kb = os.path.getsize(archive) / 1024
+            print(
+                f"{name:>8}: import {elapsed * 1000:8.1f} ms (median), archive {size_kb:8.1f} KB"
+            )
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Peak memory of archiving a synthetic tree of large files
+
+Compares the former whole-file buffering (fp.read() + writestr) with the
+chunked streaming of ZipPackage._add_files. Each run happens in its own
+process so that peak RSS is measured independently.
+
+Usage:
+    python -m benchmarks.bench_memory [--size-mb 1024] [--files 4]
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+from benchmarks.common import peak_rss_mb, set_mocks
+
+CONST_DATETIME = (2020, 1, 1, 0, 0, 0)
+
+
+def generate_tree(root, size_mb, files):
+    """
+    Writes "files" files summing up to size_mb of partly compressible data
+    """
+    block = os.urandom(512 * 1024) + bytes(512 * 1024)
+    per_file = max(1, size_mb // files)
+    for i in range(files):
+        with open(os.path.join(root, f"model_{i}.bin"), "wb") as f:
+            for _ in range(per_file):
+                f.write(block)
+
+
+def list_files(root):
+    return sorted(str(p) for p in Path(root).rglob("*") if p.is_file())
+
+
+def buffered_add_files(zip_path, files, base_path):
+    """Former implementation of ZipPackage._add_files"""
+    zip_file = zipfile.ZipFile(zip_path, "w")
+    for file in sorted(files):
+        zip_info = zipfile.ZipInfo.from_file(file, os.path.relpath(file, base_path))
+        zip_info.date_time = CONST_DATETIME
+        with open(file, "rb") as fp:
+            zip_file.writestr(zip_info, fp.read(), compress_type=zipfile.ZIP_DEFLATED)
+    zip_file.close()
+
+
+def streaming_add_files(zip_path, files, base_path):
+    """Current implementation of ZipPackage._add_files"""
+    set_mocks()
+    from lambda_packaging.zip_package import ZipPackage
+
+    package = ZipPackage(resource_name="benchmark", project_root=base_path)
+    package._add_files(zip_path, files, base_path=base_path)
+
+
+def run_child(mode, root, zip_path):
+    """Archives root in the current process and prints peak RSS"""
+    files = list_files(root)
+    start = time.perf_counter()
+    if mode == "buffered":
+        buffered_add_files(zip_path, files, root)
+    else:
+        streaming_add_files(zip_path, files, root)
+    elapsed = time.perf_counter() - start
+
+    peak_mb = peak_rss_mb()
+    print(f"{mode:>10}: peak RSS {peak_mb:8.1f} MB, {elapsed:6.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--size-mb", type=int, default=1024)
+    parser.add_argument("--files", type=int, default=4)
+    parser.add_argument("--child", choices=["buffered", "streaming"])
+    parser.add_argument("--root")
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.root, os.path.join(args.root, "..", "out.zip"))
+        return
+
+    tmp = tempfile.mkdtemp()
+    try:
+        root = os.path.join(tmp, "tree")
+        os.makedirs(root)
+        generate_tree(root, args.size_mb, args.files)
+        print(f"synthetic tree: {args.size_mb} MB in {args.files} files")
+
+        for mode in ("buffered", "streaming"):
+            subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_memory"]
+                + ["--child", mode, "--root", root],
+                check=True,
+            )
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
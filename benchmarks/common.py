@@ -0,0 +1,39 @@
+"""
+Helpers shared by the benchmarks, which run offline without a Pulumi engine
+"""
+
+import resource
+import time
+
+
+def set_mocks():
+    """
+    Replaces the Pulumi engine with mocks, as the tests do
+    """
+    import pulumi
+
+    class Mocks(pulumi.runtime.Mocks):
+        def call(self, *args, **kwargs):
+            return {}
+
+        def new_resource(self, *args, **kwargs):
+            return ["", {}]
+
+    pulumi.runtime.set_mocks(Mocks())
+
+
+def measure(fn):
+    """
+    Returns the result of fn and its wall time in seconds
+    """
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def peak_rss_mb():
+    """
+    Returns the peak resident memory of the current process in MB
+    """
+    # ru_maxrss is reported in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
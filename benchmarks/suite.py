@@ -0,0 +1,186 @@
+"""
+Throughput and memory of the packaging steps on synthetic trees of several shapes
+
+Generates a project and an installed dependency tree for each shape, then
+times ZipPackage.filter_package, ZipPackage._add_files,
+ZipPackage.zip_requirements and filebase64sha256, each in its own process
+so that peak RSS is measured independently. Results are compared with
+benchmarks/baselines.json and runs slower or larger than the baseline by
+more than the tolerance are reported as regressions (exit code 1).
+
+Usage:
+    python -m benchmarks.suite [--scale 1.0] [--shapes tiny-files,huge-files,deep-nesting]
+                               [--tolerance 0.25] [--save-baseline]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from benchmarks.common import set_mocks, measure, peak_rss_mb
+
+BASELINES_PATH = Path(__file__).parent / "baselines.json"
+
+# Layout of each shape: (number of files, file size in bytes, nesting depth)
+SHAPES = {
+    "tiny-files": (20000, 512, 2),
+    "huge-files": (4, 64 * 1024**2, 1),
+    "deep-nesting": (5000, 4096, 25),
+}
+
+CASES = ["filter_package", "add_files", "zip_requirements", "filebase64sha256"]
+
+# Differences below which a metric is considered noise, whatever the tolerance
+NOISE = {"seconds": 0.05, "peak_rss_mb": 5}
+
+
+def write_tree(root, files, size, depth):
+    """
+    Writes files of size bytes, half random and half zeros, spread over
+    folders nested depth levels deep
+    """
+    chunk = min(size, 1024**2)
+    block = os.urandom(chunk // 2) + bytes(chunk - chunk // 2)
+    for i in range(files):
+        parts = [f"level_{level}_{(i >> level) % 4}" for level in range(depth)]
+        directory = os.path.join(root, *parts)
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"module_{i}.py"), "wb") as f:
+            for _ in range(size // chunk):
+                f.write(block)
+            f.write(block[: size % chunk])
+
+
+def generate_shape(root, shape, scale):
+    """
+    Writes the project files and installed requirements of a shape
+    """
+    files, size, depth = SHAPES[shape]
+
+    # shapes of a few large files are scaled by size, others by file count
+    if files > 4:
+        files = max(1, int(files * scale))
+    else:
+        size = max(1, int(size * scale))
+    write_tree(os.path.join(root, "app"), files, size, depth)
+    write_tree(os.path.join(root, "dist", "requirements"), files, size, depth)
+
+
+def tree_size(files):
+    return sum(os.path.getsize(f) for f in files)
+
+
+def run_case(case, root):
+    """
+    Runs a case on a generated tree in the current process and returns its results
+    """
+    set_mocks()
+    from lambda_packaging.zip_package import ZipPackage
+    from lambda_packaging.utils import filebase64sha256
+
+    package = ZipPackage(resource_name="benchmark", project_root=root)
+    if case == "filter_package":
+        files, seconds = measure(package.filter_package)
+    elif case == "add_files":
+        files = package.filter_package()
+        zip_path = package.get_path("add-files.zip")
+        _, seconds = measure(lambda: package._add_files(zip_path, files, "w", root))
+    elif case == "zip_requirements":
+        files = package._requirement_files()
+        _, seconds = measure(package.zip_requirements)
+    else:
+        zip_path = package.zip_requirements()
+        files = [zip_path]
+        _, seconds = measure(lambda: filebase64sha256(zip_path))
+
+    size = tree_size(files)
+    return {
+        "seconds": round(seconds, 4),
+        "files": len(files),
+        "mb_per_s": round(size / 1024**2 / seconds, 2) if seconds else None,
+        "files_per_s": round(len(files) / seconds, 1) if seconds else None,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def compare(results, baselines, tolerance):
+    """
+    Returns the list of "shape/case metric" regressing beyond tolerance
+    """
+    regressions = []
+    for name, result in sorted(results.items()):
+        baseline = baselines.get(name)
+        if not baseline:
+            continue
+        for metric in ["seconds", "peak_rss_mb"]:
+            allowed = max(baseline[metric] * tolerance, NOISE[metric])
+            if result[metric] > baseline[metric] + allowed:
+                regressions.append(
+                    f"{name} {metric}: {result[metric]} > {baseline[metric]}"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--shapes", default=",".join(SHAPES))
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--child", choices=CASES)
+    parser.add_argument("--root")
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_case(args.child, args.root)))
+        return
+
+    results = {}
+    for shape in args.shapes.split(","):
+        root = tempfile.mkdtemp()
+        try:
+            generate_shape(root, shape, args.scale)
+            for case in CASES:
+                output = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.suite"]
+                    + ["--child", case, "--root", root],
+                    check=True,
+                    stdout=subprocess.PIPE,
+                    universal_newlines=True,
+                ).stdout
+                result = results[f"{shape}/{case}"] = json.loads(output)
+                print(
+                    f"{shape:>12} {case:>16}: {result['seconds']:8.3f} s"
+                    f" {result['mb_per_s'] or 0:9.1f} MB/s"
+                    f" {result['files_per_s'] or 0:10.1f} files/s"
+                    f" peak RSS {result['peak_rss_mb']:7.1f} MB"
+                )
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+
+    stored = {}
+    if BASELINES_PATH.is_file():
+        with open(BASELINES_PATH) as f:
+            stored = json.load(f)
+
+    if args.save_baseline:
+        stored[str(args.scale)] = results
+        with open(BASELINES_PATH, "w") as f:
+            json.dump(stored, f, indent=2, sort_keys=True)
+        print(f"baseline saved to {BASELINES_PATH}")
+        return
+
+    # baselines are only comparable at the same scale
+    regressions = compare(results, stored.get(str(args.scale), {}), args.tolerance)
+    for regression in regressions:
+        print(f"regression: {regression}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
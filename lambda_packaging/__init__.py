@@ -1 +1 @@
-from .components import LambdaPackage
\ No newline at end of file
+from .components import LambdaPackage, LambdaPackageGroup
@@ -0,0 +1,53 @@
+import importlib.util
+import marshal
+import os
+import sys
+
+# Flags of unchecked hash-based pycs (PEP 552): the source is never checked
+UNCHECKED_HASH_FLAGS = 0b01
+
+
+def runtime_cache_tag(runtime):
+    """
+    Returns the bytecode cache tag of the lambda runtime (e.g. "cpython-38"),
+    or None when the current interpreter can't compile bytecode for it
+    """
+    current = f"python{sys.version_info.major}.{sys.version_info.minor}"
+    if runtime != current or sys.implementation.cache_tag is None:
+        return None
+    return sys.implementation.cache_tag
+
+
+def cache_path(arcname, cache_tag, optimize=0):
+    """
+    Returns the archive path of the pyc file of a source archive path,
+    like importlib.util.cache_from_source without sys.pycache_prefix
+    """
+    head, tail = os.path.split(arcname)
+    name = f"{tail.rpartition('.')[0]}.{cache_tag}"
+    if optimize:
+        name += f".opt-{optimize}"
+    return os.path.join(head, "__pycache__", f"{name}.pyc")
+
+
+def compile_source(file, arcname, optimize=0):
+    """
+    Compiles a python source file into a deterministic unchecked hash-based pyc
+
+    The archive path is used as the code filename, so the pyc only depends
+    on the source content, the optimization level and the interpreter.
+    Returns None when the source can't be compiled.
+    """
+    with open(file, "rb") as fp:
+        source = fp.read()
+    try:
+        code = compile(source, arcname, "exec", dont_inherit=True, optimize=optimize)
+    except (SyntaxError, ValueError):
+        return None
+
+    return (
+        importlib.util.MAGIC_NUMBER
+        + UNCHECKED_HASH_FLAGS.to_bytes(4, "little")
+        + importlib.util.source_hash(source)
+        + marshal.dumps(code)
+    )
@@ -0,0 +1,224 @@
+import hashlib
+import json
+import os
+import shutil
+import sys
+import sysconfig
+import tempfile
+from pathlib import Path
+
+# Default upper bound of the requirements cache (bytes)
+DEFAULT_CACHE_MAX_SIZE = 2 * 1024**3
+
+# Name of the file holding the metadata of a cache entry
+ENTRY_METADATA = ".entry.json"
+
+
+def cache_key(*parts):
+    """
+    Computes a content-addressed key from the given string parts
+    """
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(str(part).encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def host_platform():
+    """
+    Returns the ABI and platform of the running interpreter, which pip
+    installs wheels for outside of docker
+    """
+    return f"{sys.implementation.cache_tag}-{sysconfig.get_platform()}"
+
+
+def requirements_key(requirements, runtime, docker_image=None):
+    """
+    Computes the key of a filtered requirements dict, independent of its order
+
+    Requirements installed without docker_image are installed for the host
+    interpreter, so its ABI and platform are part of the key.
+    """
+    lines = sorted(requirements.values())
+    return cache_key(runtime, docker_image or host_platform(), *lines)
+
+
+def directory_size(path):
+    """
+    Returns the total size in bytes of the files under path
+    """
+    size = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                size += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return size
+
+
+def tree_signature(path):
+    """
+    Returns a hash of the relative paths, sizes and mtimes of the files
+    under path, None when path is not a directory
+    """
+    if not os.path.isdir(path):
+        return None
+    h = hashlib.sha256()
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            file = os.path.join(root, name)
+            stat = os.lstat(file)
+            relpath = os.path.relpath(file, path)
+            h.update(f"{relpath}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+    return h.hexdigest()
+
+
+def evict_lru(entries, max_size):
+    """
+    Removes the least recently used entries until their total size fits in max_size
+
+    :entries: list of (path, size, last_used) tuples
+    Returns the list of evicted paths.
+    """
+    total = sum(size for _, size, _ in entries)
+    evicted = []
+    for path, size, _ in sorted(entries, key=lambda e: (e[2], str(e[0]))):
+        if total <= max_size:
+            break
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        elif os.path.exists(path):
+            os.remove(path)
+        total -= size
+        evicted.append(path)
+    return evicted
+
+
+class RequirementsCache:
+    """
+    Content-addressed cache of installed requirements trees.
+
+    Every entry is a directory named after the hash of the filtered
+    requirements, runtime and docker image. Entries are shared across
+    runs and stacks and evicted in LRU order once the cache grows
+    beyond max_size. A marker next to an install folder records the
+    entry it holds, so that unchanged folders are not copied again.
+    """
+
+    def __init__(self, cache_dir, max_size=DEFAULT_CACHE_MAX_SIZE):
+        self.cache_dir = Path(cache_dir) / "requirements"
+        self.max_size = max_size
+
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def entry_path(self, key):
+        """Return absolute path of a cache entry"""
+        return self.cache_dir / key
+
+    def marker_path(self, install_path):
+        """
+        Return path of the marker recording the entry held by install_path
+        """
+        install_path = Path(install_path)
+        return install_path.with_name(f"{install_path.name}.cache.json")
+
+    def holds(self, key, install_path, variant=""):
+        """
+        Returns True when install_path still holds the tree recorded for
+        key and variant
+        """
+        try:
+            with open(self.marker_path(install_path), "r") as f:
+                marker = json.load(f)
+        except (OSError, ValueError):
+            return False
+        return marker == {
+            "key": key,
+            "variant": variant,
+            "tree": tree_signature(install_path),
+        }
+
+    def record(self, key, install_path, variant=""):
+        """
+        Records that install_path holds the tree of key, as restored or
+        as transformed by the steps identified by variant
+        """
+        with open(self.marker_path(install_path), "w") as f:
+            json.dump(
+                {"key": key, "variant": variant, "tree": tree_signature(install_path)},
+                f,
+            )
+
+    def get(self, key, install_path, variant=""):
+        """
+        Copies the cached tree of key into install_path, unless it still
+        holds the tree recorded for key and variant.
+        Returns False on a cache miss.
+        """
+        entry = self.entry_path(key)
+        if not os.path.isfile(entry / ENTRY_METADATA):
+            return False
+
+        if not self.holds(key, install_path, variant):
+            if os.path.isdir(install_path):
+                shutil.rmtree(install_path)
+            shutil.copytree(
+                entry / "tree",
+                install_path,
+                symlinks=True,
+            )
+            self.record(key, install_path)
+
+        # mark the entry as recently used
+        os.utime(entry / ENTRY_METADATA)
+        return True
+
+    def put(self, key, install_path):
+        """
+        Stores a copy of install_path in the cache under key
+        """
+        entry = self.entry_path(key)
+        if os.path.isfile(entry / ENTRY_METADATA):
+            return entry
+
+        # populate a temporary directory first so that a partially
+        # written entry is never visible to other processes
+        staging = Path(tempfile.mkdtemp(prefix=".staging-", dir=self.cache_dir))
+        try:
+            shutil.copytree(install_path, staging / "tree", symlinks=True)
+            with open(staging / ENTRY_METADATA, "w") as f:
+                json.dump({"size": directory_size(staging / "tree")}, f)
+            try:
+                os.rename(staging, entry)
+            except OSError:
+                # entry was stored concurrently by another process
+                pass
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+        self.evict()
+        return entry
+
+    def entries(self):
+        """
+        Returns list of (path, size, last_used) of the stored entries
+        """
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            metadata = os.path.join(entry.path, ENTRY_METADATA)
+            if entry.name.startswith(".") or not os.path.isfile(metadata):
+                continue
+            with open(metadata, "r") as f:
+                size = json.load(f)["size"]
+            entries.append((entry.path, size, os.stat(metadata).st_mtime))
+        return entries
+
+    def evict(self):
+        """
+        Evicts least recently used entries beyond max_size
+        """
+        return evict_lru(self.entries(), self.max_size)
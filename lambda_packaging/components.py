@@ -3,10 +3,30 @@ from pulumi import log
 import sys
 import os
 from pulumi_aws import lambda_, iam
-from .utils import format_resource_name, filebase64sha256
+from .utils import format_resource_name, format_file_name
 import glob
 from .zip_package import ZipPackage
-from .pip_requirements import PipRequirements
+from .pip_requirements import (
+    PipRequirements,
+    default_lock_path,
+    filter_requirements,
+)
+from .cache import DEFAULT_CACHE_MAX_SIZE, cache_key, requirements_key
+from .pruning import LayerPruner, check_unzipped_size, check_archives_size
+from .stripping import SymbolStripper
+from .layer_planner import LayerPlanner, check_max_layers
+from .profiler import Profiler
+from .fingerprint import BuildRecord, input_fingerprint
+from .member_store import MemberStore, DEFAULT_MEMBER_STORE_MAX_SIZE
+from .compression import DEFAULT_PROFILE
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import json
+import threading
+from pathlib import Path
+
+# Locks serializing the builds of packages sharing an install folder
+_INSTALL_LOCKS = {}
 
 
 class LambdaPackage(pulumi.ComponentResource):
@@ -26,6 +46,8 @@ class LambdaPackage(pulumi.ComponentResource):
         requirements_path="requirements.txt",
         runtime="python3.6",
         layer=False,
+        max_layers=1,
+        volatile_requirements=[],
         dockerize=False,
         include=["**"],
         no_deploy=[],
@@ -34,6 +56,25 @@ class LambdaPackage(pulumi.ComponentResource):
         container_path="/io",
         target_folder="dist/",
         docker_image="lambci/lambda",
+        cache_dir=None,
+        cache_max_size=DEFAULT_CACHE_MAX_SIZE,
+        wheelhouse_dir=None,
+        lock=False,
+        exclude_transitive=False,
+        sync_requirements=False,
+        incremental=True,
+        compression_workers=1,
+        compression=DEFAULT_PROFILE,
+        patch_archives=False,
+        member_store_dir=None,
+        member_store_max_size=DEFAULT_MEMBER_STORE_MAX_SIZE,
+        asynchronous=False,
+        prune=None,
+        check_size=False,
+        strip_symbols=False,
+        compile_bytecode=False,
+        profile=False,
+        fast_preview=False,
         opts=None,
     ):
         """
@@ -41,6 +82,8 @@ class LambdaPackage(pulumi.ComponentResource):
         :requirements_path: relative path of requirements.txt file from __main__.py
         :runtime: python runtime
         :layer: use lambda layer
+        :max_layers: split dependencies into up to max_layers layers (at most 5, ValueError otherwise) by size and change frequency
+        :volatile_requirements: names of distributions packaged in the layer of frequently changing ones
         :dockerize: dockerize python requirements
         :no_deploy: list of requirements to prevent from packaging
         :include: list of glob pattern for files to include (default: "**")
@@ -48,17 +91,71 @@ class LambdaPackage(pulumi.ComponentResource):
         :install_folder: name of the folder to install requirements before packaging(temporary)
         :container: mount path for container
         :target_folder: temporary folder for pip installation
-        :docker_image: docker image name to use for pip installation
+        :docker_image: docker image name to use for pip installation (untagged images use their build-<runtime> tag)
+        :cache_dir: directory of the installed requirements cache shared across runs and stacks (disabled when None)
+        :cache_max_size: maximum size in bytes of the requirements cache before LRU eviction
+        :wheelhouse_dir: directory of wheels built once and shared across runs and stacks, installed offline (disabled when None)
+        :lock: resolve requirements into a lockfile next to requirements.txt and install its hash-pinned versions
+        :exclude_transitive: also remove no_deploy distributions installed as dependencies, with their exclusive dependencies
+        :sync_requirements: only install the distributions added or changed since the previous install and uninstall the removed ones
+        :incremental: reuse existing archives and their hashes when their input files are unchanged
+        :compression_workers: number of threads compressing archive files in parallel
+        :compression: compression profile of the archives, "fast", "balanced" or "smallest"
+        :patch_archives: copy the compressed files left unchanged from the previous archives instead of compressing them again (requires incremental)
+        :member_store_dir: directory of compressed files shared by every archive across packages, runs and stacks (disabled when None)
+        :member_store_max_size: maximum size in bytes of the member store before LRU eviction
+        :asynchronous: package in the background and expose archives and hashes as pulumi.Output
+        :prune: names of the pruning rules applied to installed requirements ("tests", "examples", "stubs", "bytecode", "runtime")
+        :check_size: fail when the packages exceed the lambda size limits
+        :strip_symbols: strip the debug sections of the native extensions of installed requirements, when strip is installed
+        :compile_bytecode: package deterministic unchecked hash-based pycs of python files (runtime must match the current interpreter)
+        :profile: log a JSON report of the time, CPU, bytes and files of each packaging phase
+        :fast_preview: during previews, reuse the archives of the last build when the project files, requirements and options are unchanged
         """
+        check_max_layers(max_layers)
         super().__init__("nuage:aws:LambdaPackage", name, None, opts)
         self.name = name
         self.requirements_path = requirements_path
         self.runtime = runtime
         self.layer = layer
+        self.max_layers = max_layers
+        self.volatile_requirements = volatile_requirements
         self.dockerize = dockerize
         self.no_deploy = no_deploy
         self.include = include
         self.exclude = exclude
+        self.prune = prune
+        self.check_size = check_size
+        self.strip_symbols = strip_symbols
+        self.cache_dir = cache_dir
+        self.size_report = None
+        self.strip_report = None
+        self.no_deploy_report = None
+        self.sync_report = None
+        self.profile = None
+        self.profiler = Profiler(name) if profile else None
+        self.fast_preview = fast_preview
+
+        # options the archives depend on, part of the preview fingerprint
+        self.settings = {
+            "runtime": runtime,
+            "layer": layer,
+            "max_layers": max_layers,
+            "volatile_requirements": volatile_requirements,
+            "dockerize": dockerize,
+            "docker_image": docker_image,
+            "include": include,
+            "exclude": exclude,
+            "no_deploy": no_deploy,
+            "install_folder": install_folder,
+            "target_folder": target_folder,
+            "lock": lock,
+            "exclude_transitive": exclude_transitive,
+            "prune": prune,
+            "strip_symbols": strip_symbols,
+            "compile_bytecode": compile_bytecode,
+            "compression": compression,
+        }
 
         # root of __main__.py file
         self.project_root = os.path.dirname(
@@ -70,14 +167,26 @@ class LambdaPackage(pulumi.ComponentResource):
             resource_name=name,
             project_root=self.project_root,
             requirements_path=requirements_path,
+            runtime=self.runtime,
             dockerize=self.dockerize,
             target_folder=target_folder,
             install_folder=install_folder,
             no_deploy=self.no_deploy,
             docker_image=docker_image,
             container_path=container_path,
+            cache_dir=cache_dir,
+            cache_max_size=cache_max_size,
+            wheelhouse_dir=wheelhouse_dir,
+            lock=lock,
+            exclude_transitive=exclude_transitive,
+            sync=sync_requirements,
+            install_variant=json.dumps([strip_symbols, prune]),
+            profiler=self.profiler,
         )
-        pip.install_requirements()
+
+        member_store = None
+        if member_store_dir:
+            member_store = MemberStore(member_store_dir, member_store_max_size)
 
         # zip files and dirs
         packaged_asset = ZipPackage(
@@ -87,34 +196,378 @@ class LambdaPackage(pulumi.ComponentResource):
             exclude=self.exclude,
             install_folder=install_folder,
             target_folder=target_folder,
+            incremental=incremental,
+            workers=compression_workers,
+            compile_bytecode=compile_bytecode,
+            runtime=self.runtime,
+            profiler=self.profiler,
+            compression=compression,
+            patch=patch_archives,
+            member_store=member_store,
         )
 
         self.layer_archive_path = None
         self.layer_hash = None
+        self.layer_archives = None
+        self.layer_hashes = None
 
-        if layer:
-            self.package_archive = str(packaged_asset.zip_package(requirements=False))
-            self.layer_archive_path = str(packaged_asset.zip_requirements())
+        if asynchronous:
+            # package in an executor while the program keeps registering resources
+            build = asyncio.get_event_loop().run_in_executor(
+                None, self._build, pip, packaged_asset
+            )
+            build_output = pulumi.Output.from_input(build)
+            outputs = {
+                key: build_output.apply(lambda built, key=key: built[key])
+                for key in self._output_keys()
+            }
+        else:
+            outputs = self._build(pip, packaged_asset)
 
-            self.package_hash = filebase64sha256(self.package_archive)
-            self.layer_hash = filebase64sha256(self.layer_archive_path)
+        self.package_archive = outputs["package_archive"]
+        self.package_hash = outputs["package_hash"]
+        if layer and max_layers > 1:
+            self.layer_archives = outputs["layer_archives"]
+            self.layer_hashes = outputs["layer_hashes"]
+        elif layer:
+            self.layer_archive_path = outputs["layer_archive"]
+            self.layer_hash = outputs["layer_hash"]
 
-            # output archive path and lambda layer archive path
-            self.register_outputs(
-                {
-                    "package_archive": self.package_archive,
-                    "package_hash": self.package_hash,
-                    "layer_archive": self.layer_archive_path,
-                    "layer_hash": self.layer_hash,
-                }
+        # output archive path and lambda layer archive path
+        self.register_outputs(outputs)
+
+    def _output_keys(self):
+        if self.layer and self.max_layers > 1:
+            return ["package_archive", "package_hash", "layer_archives", "layer_hashes"]
+        if self.layer:
+            return ["package_archive", "package_hash", "layer_archive", "layer_hash"]
+        return ["package_archive", "package_hash"]
+
+    def _build(self, pip, packaged_asset):
+        """
+        Installs requirements, creates the archives and returns their paths and hashes
+
+        With "fast_preview=True", previews return the outputs of the last build
+        instead when the fingerprint of the inputs did not change since.
+        """
+        outputs = None
+        if self.fast_preview:
+            record = BuildRecord(
+                packaged_asset.get_path(format_file_name(self.name, "build.json"))
             )
-        else:
-            self.package_archive = str(packaged_asset.zip_package())
-            self.package_hash = filebase64sha256(self.package_archive)
-            # output archive path and lambda layer resource
-            self.register_outputs(
-                {
-                    "package_archive": self.package_archive,
-                    "package_hash": self.package_hash,
-                }
+            fingerprint = self._fingerprint(pip, packaged_asset)
+            if pulumi.runtime.is_dry_run():
+                outputs = record.load(fingerprint)
+                if outputs:
+                    log.info(f"{self.name}: inputs unchanged, reusing the last build")
+
+        if outputs is None:
+            outputs = self._build_archives(pip, packaged_asset)
+            if self.fast_preview:
+                record.save(fingerprint, outputs)
+
+        # the report is written next to the archives
+        if self.profiler:
+            self.profile = self.profiler.report()
+            self.profiler.save(
+                packaged_asset.get_path(format_file_name(self.name, "profile.json"))
+            )
+            self.profiler.log()
+        return outputs
+
+    def _fingerprint(self, pip, packaged_asset):
+        """
+        Returns the fingerprint of the project files, requirements and options
+        """
+        files = packaged_asset.filter_package()
+        with packaged_asset.profiler.phase("fingerprint") as record:
+            inputs = files + [pip.requirements_path]
+            if pip.lockfile:
+                inputs.append(pip.lockfile.path)
+            fingerprint = input_fingerprint(inputs, self.settings)
+            record["files"] = len(inputs)
+        return fingerprint
+
+    def _build_archives(self, pip, packaged_asset):
+        """
+        Runs the install and archiving phases of _build
+
+        With "layer=True", the package archive doesn't depend on the requirements,
+        so it is created while they are installed and archived.
+        """
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            package = None
+            if self.layer:
+                package = executor.submit(
+                    packaged_asset.zip_package, requirements=False
+                )
+
+            # packages sharing an install folder are built one at a time
+            with _INSTALL_LOCKS.setdefault(str(pip.install_path), threading.Lock()):
+                pip.install_requirements()
+                self.no_deploy_report = pip.no_deploy_report
+                self.sync_report = pip.sync_report
+                if self.strip_symbols:
+                    self._strip_requirements(pip)
+                if self.prune or self.check_size:
+                    self._prune_requirements(pip.install_path)
+                pip.record_install()
+
+                layer_archives = {}
+                if self.layer and self.max_layers > 1:
+                    layer_archives = self._build_layers(pip, packaged_asset)
+                elif self.layer:
+                    layer_archives = {"layer": str(packaged_asset.zip_requirements())}
+                else:
+                    package_archive = str(packaged_asset.zip_package())
+
+            if package:
+                package_archive = str(package.result())
+
+        if self.check_size:
+            check_archives_size([package_archive] + list(layer_archives.values()))
+        outputs = {
+            "package_archive": package_archive,
+            "package_hash": packaged_asset.archive_hash(package_archive),
+        }
+        if self.layer and self.max_layers > 1:
+            outputs["layer_archives"] = layer_archives
+            outputs["layer_hashes"] = {
+                name: packaged_asset.archive_hash(path)
+                for name, path in layer_archives.items()
+            }
+        elif self.layer:
+            outputs["layer_archive"] = layer_archives["layer"]
+            outputs["layer_hash"] = packaged_asset.archive_hash(layer_archives["layer"])
+        return outputs
+
+    def _build_layers(self, pip, packaged_asset):
+        """
+        Creates one archive per planned layer and returns their paths by layer name
+        """
+        planner = LayerPlanner(
+            pip.install_path,
+            packaged_asset.get_path(format_file_name(self.name, "layers.json")),
+            max_layers=self.max_layers,
+            volatile=self.volatile_requirements,
+        )
+        return {
+            name: str(path)
+            for name, path in packaged_asset.zip_requirement_layers(
+                planner.plan()
+            ).items()
+        }
+
+    def _strip_requirements(self, pip):
+        """
+        Strips the native extensions of installed requirements and reports
+        the bytes saved per file
+        """
+        stripper = SymbolStripper(pip.install_path, self.cache_dir)
+        if not stripper.strip_tool:
+            log.warn(f"{self.name}: strip is not installed, symbols are kept")
+            return
+
+        with pip.profiler.phase("strip_symbols") as record:
+            self.strip_report = stripper.strip()
+            record["files"] = len(self.strip_report)
+            record["bytes_saved"] = sum(self.strip_report.values())
+
+        log.info(
+            f"{self.name}: stripped {record['bytes_saved']} bytes"
+            f" from {len(self.strip_report)} native extensions"
+        )
+        for file, saved in self.strip_report.items():
+            log.debug(f"{self.name}: {file} {saved} bytes stripped")
+
+    def _prune_requirements(self, install_path):
+        """
+        Prunes installed requirements, reports their size and
+        fails fast when they already exceed the lambda unzipped limit
+        """
+        pruner = LayerPruner(install_path, self.prune or [])
+        removed = pruner.prune()
+        self.size_report = pruner.size_report(removed)
+
+        total = sum(package["size"] for package in self.size_report.values())
+        pruned = sum(package["pruned"] for package in self.size_report.values())
+        log.info(
+            f"{self.name}: requirements size {total} bytes ({pruned} bytes pruned)"
+        )
+        for package, sizes in self.size_report.items():
+            log.debug(
+                f"{self.name}: {package} {sizes['size']} bytes in {sizes['files']} files"
+                f" ({sizes['pruned']} bytes pruned)"
             )
+
+        if self.check_size:
+            check_unzipped_size(total)
+
+
+class LambdaPackageGroup(pulumi.ComponentResource):
+    """
+    Creates the packages of several lambda functions of the same project.
+
+    Functions with the same filtered requirements share a single pip
+    installation and a single lambda layer. The code archives of the
+    functions are packaged concurrently.
+    """
+
+    def __init__(
+        self,
+        name,
+        functions,
+        requirements_path="requirements.txt",
+        runtime="python3.6",
+        dockerize=False,
+        include=["**"],
+        no_deploy=[],
+        exclude=[],
+        container_path="/io",
+        target_folder="dist/",
+        docker_image="lambci/lambda",
+        cache_dir=None,
+        cache_max_size=DEFAULT_CACHE_MAX_SIZE,
+        wheelhouse_dir=None,
+        lock=False,
+        exclude_transitive=False,
+        sync_requirements=False,
+        incremental=True,
+        compression_workers=1,
+        compression=DEFAULT_PROFILE,
+        patch_archives=False,
+        member_store_dir=None,
+        member_store_max_size=DEFAULT_MEMBER_STORE_MAX_SIZE,
+        workers=None,
+        opts=None,
+    ):
+        """
+        :name: name of the resource
+        :functions: dict of function name to its options overriding the group ones
+                    ("requirements_path", "include", "exclude", "no_deploy")
+        :workers: number of threads packaging the function archives (default: executor default)
+        :lock: resolve each set of requirements into its own lockfile, named like the LambdaPackage one and suffixed with a hash of no_deploy when a function overrides it
+
+        Other options are the same as LambdaPackage ones and apply to every function.
+        """
+        super().__init__("nuage:aws:LambdaPackageGroup", name, None, opts)
+        self.name = name
+        self.runtime = runtime
+        self.dockerize = dockerize
+
+        # root of __main__.py file
+        self.project_root = os.path.dirname(
+            os.path.abspath(sys.modules["__main__"].__file__)
+        )
+
+        # group functions by filtered requirements
+        requirements_sets = {}
+        function_sets = {}
+        for function_name, options in functions.items():
+            function_requirements = (
+                options.get("requirements_path", requirements_path),
+                options.get("no_deploy", no_deploy),
+            )
+            key = requirements_key(
+                filter_requirements(
+                    Path(self.project_root) / function_requirements[0],
+                    function_requirements[1],
+                ),
+                runtime,
+                docker_image if dockerize else None,
+            )[:12]
+            requirements_sets.setdefault(key, function_requirements)
+            function_sets[function_name] = key
+
+        member_store = None
+        if member_store_dir:
+            member_store = MemberStore(member_store_dir, member_store_max_size)
+
+        # package the code of every function concurrently,
+        # while the requirements are installed
+        def package(function_name):
+            options = functions[function_name]
+            packaged_asset = ZipPackage(
+                resource_name=function_name,
+                project_root=self.project_root,
+                include=options.get("include", include),
+                exclude=options.get("exclude", exclude),
+                install_folder=f"requirements-{function_sets[function_name]}/",
+                target_folder=target_folder,
+                incremental=incremental,
+                workers=compression_workers,
+                compression=compression,
+                patch=patch_archives,
+                member_store=member_store,
+            )
+            package_archive = packaged_asset.zip_package(requirements=False)
+            return {
+                "package_archive": str(package_archive),
+                "package_hash": packaged_asset.archive_hash(package_archive),
+            }
+
+        def lock_path(set_requirements_path, set_no_deploy):
+            # named after the set only when its no_deploy differs from the
+            # group's, so that lockfiles survive edits of the requirements
+            name = None
+            if sorted(set_no_deploy) != sorted(no_deploy):
+                name = cache_key(*sorted(set_no_deploy))[:12]
+            return default_lock_path(set_requirements_path, dockerize, name)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            names = sorted(functions)
+            packages = [executor.submit(package, name) for name in names]
+
+            # install each distinct set of requirements once and build its layer
+            self.layers = {}
+            for key, (set_requirements_path, set_no_deploy) in sorted(
+                requirements_sets.items()
+            ):
+                install_folder = f"requirements-{key}/"
+                pip = PipRequirements(
+                    resource_name=f"{name}-{key}",
+                    project_root=self.project_root,
+                    requirements_path=set_requirements_path,
+                    runtime=runtime,
+                    dockerize=dockerize,
+                    target_folder=target_folder,
+                    install_folder=install_folder,
+                    no_deploy=set_no_deploy,
+                    docker_image=docker_image,
+                    container_path=container_path,
+                    cache_dir=cache_dir,
+                    cache_max_size=cache_max_size,
+                    wheelhouse_dir=wheelhouse_dir,
+                    lock=lock_path(set_requirements_path, set_no_deploy)
+                    if lock
+                    else False,
+                    exclude_transitive=exclude_transitive,
+                    sync=sync_requirements,
+                )
+                pip.install_requirements()
+                pip.record_install()
+
+                layer_asset = ZipPackage(
+                    resource_name=f"{name}-{key}",
+                    project_root=self.project_root,
+                    install_folder=install_folder,
+                    target_folder=target_folder,
+                    incremental=incremental,
+                    workers=compression_workers,
+                    compression=compression,
+                    patch=patch_archives,
+                    member_store=member_store,
+                )
+                layer_archive_path = layer_asset.zip_requirements()
+                self.layers[key] = {
+                    "layer_archive": str(layer_archive_path),
+                    "layer_hash": layer_asset.archive_hash(layer_archive_path),
+                }
+
+            self.packages = {
+                name: dict(self.layers[function_sets[name]], **built.result())
+                for name, built in zip(names, packages)
+            }
+
+        # output archive paths and hashes of every function
+        self.register_outputs({"packages": self.packages, "layers": self.layers})
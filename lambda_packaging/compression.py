@@ -0,0 +1,325 @@
+import shutil
+import struct
+import tempfile
+import threading
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import zopfli.zlib
+except ImportError:
+    zopfli = None
+
+# Size of the chunks read from input files and copied into archives (bytes)
+CHUNK_SIZE = 1024 * 1024
+
+# Compressed data larger than this is spooled to a temporary file (bytes)
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+# Compression profiles: deflate level, whether already compressed file types
+# are stored, whether members that don't shrink are stored and whether zopfli
+# is used when installed
+PROFILES = {
+    "fast": {
+        "level": 1,
+        "store_types": True,
+        "store_larger": True,
+        "zopfli": False,
+    },
+    "balanced": {
+        "level": zlib.Z_DEFAULT_COMPRESSION,
+        "store_types": False,
+        "store_larger": False,
+        "zopfli": False,
+    },
+    "smallest": {
+        "level": 9,
+        "store_types": False,
+        "store_larger": True,
+        "zopfli": True,
+    },
+}
+
+DEFAULT_PROFILE = "balanced"
+
+# Extensions of files that are already compressed
+STORED_EXTENSIONS = (
+    ".so",
+    ".pyd",
+    ".dylib",
+    ".whl",
+    ".zip",
+    ".jar",
+    ".egg",
+    ".gz",
+    ".tgz",
+    ".bz2",
+    ".xz",
+    ".zst",
+    ".png",
+    ".jpg",
+    ".jpeg",
+    ".gif",
+    ".webp",
+)
+
+# Larger files are deflated with zlib, zopfli being too slow for them (bytes)
+ZOPFLI_MAX_SIZE = 8 * 1024 * 1024
+
+
+class CompressedMember:
+    """
+    Archive member whose data is already compressed,
+    ready to be written raw into a zip archive.
+    """
+
+    def __init__(self, zip_info, data, reused=False):
+        self.zip_info = zip_info
+        # file object positioned at the start of the compressed data
+        self.data = data
+        # whether the data is copied from a previous archive
+        self.reused = reused
+
+    def close(self):
+        self.data.close()
+
+
+def check_profile(profile):
+    """
+    Raises ValueError if profile is not one of PROFILES
+    """
+    if profile not in PROFILES:
+        raise ValueError(
+            f"Unknown compression profile {profile!r}, "
+            f"expected one of {', '.join(PROFILES)}"
+        )
+
+
+def profile_settings(profile):
+    """
+    Returns the settings of a profile that change the archives it produces
+    """
+    zopfli_version = None
+    if PROFILES[profile]["zopfli"] and zopfli:
+        zopfli_version = zopfli.__version__
+    return [profile, zopfli_version]
+
+
+def compress_file(file, zip_info, profile=DEFAULT_PROFILE):
+    """
+    Compresses a file according to profile, the "balanced" profile
+    deflating it the same way ZipFile.writestr does
+
+    The file is read in CHUNK_SIZE chunks and the compressed data is spooled
+    to disk beyond SPOOL_MAX_SIZE, so memory stays bounded whatever the file
+    size. zlib releases the GIL while compressing, so this can run in worker
+    threads.
+    """
+
+    def chunks():
+        with open(file, "rb") as fp:
+            yield from iter(lambda: fp.read(CHUNK_SIZE), b"")
+
+    return _compress_chunks(chunks, zip_info, profile)
+
+
+def compress_data(data, zip_info, profile=DEFAULT_PROFILE):
+    """
+    Compresses in-memory data according to profile
+    """
+    zip_info.file_size = len(data)
+    return _compress_chunks(lambda: [data], zip_info, profile)
+
+
+def _deflate(chunks, level, data):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    for chunk in chunks:
+        data.write(compressor.compress(chunk))
+    data.write(compressor.flush())
+
+
+def _zopfli_deflate(chunks, data):
+    # zopfli only compresses whole buffers into a zlib stream, whose
+    # 2 bytes header and 4 bytes adler32 checksum are stripped
+    data.write(zopfli.zlib.compress(b"".join(chunks))[2:-4])
+
+
+def _compress_chunks(chunks, zip_info, profile=DEFAULT_PROFILE):
+    """
+    Compresses the data of the chunks() iterable into a CompressedMember
+
+    :chunks: callable returning an iterable of the data, called again
+             when the data is stored after being deflated
+    """
+    settings = PROFILES[profile]
+    data = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    checksum = {"file_size": 0, "crc": 0}
+
+    def checked(chunks):
+        for chunk in chunks:
+            checksum["file_size"] += len(chunk)
+            checksum["crc"] = zlib.crc32(chunk, checksum["crc"])
+            yield chunk
+
+    compress_type = zipfile.ZIP_DEFLATED
+    if settings["store_types"] and zip_info.filename.lower().endswith(
+        STORED_EXTENSIONS
+    ):
+        compress_type = zipfile.ZIP_STORED
+        for chunk in checked(chunks()):
+            data.write(chunk)
+    elif settings["zopfli"] and zopfli and zip_info.file_size <= ZOPFLI_MAX_SIZE:
+        _zopfli_deflate(checked(chunks()), data)
+    else:
+        _deflate(checked(chunks()), settings["level"], data)
+
+    # members that deflate doesn't shrink are stored instead
+    file_size = checksum["file_size"]
+    if (
+        compress_type == zipfile.ZIP_DEFLATED
+        and settings["store_larger"]
+        and data.tell() >= file_size
+    ):
+        compress_type = zipfile.ZIP_STORED
+        data.seek(0)
+        data.truncate()
+        for chunk in chunks():
+            data.write(chunk)
+
+    zip_info.compress_type = compress_type
+    zip_info.file_size = file_size
+    zip_info.compress_size = data.tell()
+    zip_info.CRC = checksum["crc"]
+    zip_info.flag_bits = 0x00
+    if not zip_info.external_attr:
+        zip_info.external_attr = 0o600 << 16
+
+    data.seek(0)
+    return CompressedMember(zip_info, data)
+
+
+class ArchiveReader:
+    """
+    Reads the compressed data of the members of an existing zip archive,
+    so that they can be copied raw into another archive. Reads are
+    serialized, so members can be copied from several threads.
+    """
+
+    def __init__(self, path):
+        self.fp = open(path, "rb")
+        self.lock = threading.Lock()
+        with zipfile.ZipFile(self.fp) as zip_file:
+            self.infos = {info.filename: info for info in zip_file.infolist()}
+
+    def read(self, offset, size):
+        with self.lock:
+            self.fp.seek(offset)
+            return self.fp.read(size)
+
+    def copy_member(self, zip_info):
+        """
+        Returns a CompressedMember of zip_info whose data is the compressed
+        data of the archive member of the same name, or None if the archive
+        has no such member with the same attributes
+        """
+        previous = self.infos.get(zip_info.filename)
+        if (
+            previous is None
+            or previous.flag_bits & 0x09  # encrypted or with a data descriptor
+            or previous.date_time != zip_info.date_time
+            or previous.external_attr != zip_info.external_attr
+        ):
+            return None
+
+        # the data follows the local header and its variable length fields
+        header = struct.unpack(
+            zipfile.structFileHeader,
+            self.read(previous.header_offset, zipfile.sizeFileHeader),
+        )
+        offset = (
+            previous.header_offset
+            + zipfile.sizeFileHeader
+            + header[zipfile._FH_FILENAME_LENGTH]
+            + header[zipfile._FH_EXTRA_FIELD_LENGTH]
+        )
+
+        zip_info.compress_type = previous.compress_type
+        zip_info.file_size = previous.file_size
+        zip_info.compress_size = previous.compress_size
+        zip_info.CRC = previous.CRC
+        zip_info.flag_bits = 0x00
+        return CompressedMember(
+            zip_info, _RangeReader(self, offset, previous.compress_size), reused=True
+        )
+
+    def close(self):
+        self.fp.close()
+
+
+class _RangeReader:
+    """
+    File object reading size bytes of an ArchiveReader from offset
+    """
+
+    def __init__(self, archive, offset, size):
+        self.archive = archive
+        self.offset = offset
+        self.remaining = size
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.archive.read(self.offset, size)
+        self.offset += len(data)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        pass
+
+
+def write_member(zip_file, member):
+    """
+    Writes a compressed member into an open zip archive without recompressing it
+
+    The local header is written once with the final sizes and CRC, which
+    produces the same bytes as ZipFile.writestr on a seekable file.
+    """
+    zip_info = member.zip_info
+    zip64 = zip_info.file_size * 1.05 > zipfile.ZIP64_LIMIT
+
+    with zip_file._lock:
+        if zip_file._seekable:
+            zip_file.fp.seek(zip_file.start_dir)
+        zip_info.header_offset = zip_file.fp.tell()
+
+        zip_file._writecheck(zip_info)
+        zip_file._didModify = True
+
+        zip_file.fp.write(zip_info.FileHeader(zip64))
+        shutil.copyfileobj(member.data, zip_file.fp, CHUNK_SIZE)
+        zip_file.start_dir = zip_file.fp.tell()
+
+        zip_file.filelist.append(zip_info)
+        zip_file.NameToInfo[zip_info.filename] = zip_info
+
+    member.close()
+
+
+def ordered_map(fn, items, workers):
+    """
+    Maps fn over items in a thread pool and yields the results in input order
+
+    At most twice as many items as workers are in flight, which bounds
+    the memory held by results waiting to be consumed.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(fn, *item))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -0,0 +1,119 @@
+import csv
+import os
+import re
+import shutil
+from email.parser import HeaderParser
+from .lockfile import canonical_name
+
+# Name at the start of a Requires-Dist value
+REQUIREMENT_NAME = re.compile(r"^\s*([A-Za-z0-9][A-Za-z0-9._-]*)")
+
+
+class DependencyGraph:
+    """
+    Graph of the distributions installed in a folder, read from the
+    METADATA and RECORD files of their dist-info folders.
+    """
+
+    def __init__(self, install_path):
+        self.install_path = install_path
+        self.distributions = {}
+
+        for entry in sorted(os.scandir(install_path), key=lambda e: e.name):
+            if entry.is_dir() and entry.name.endswith(".dist-info"):
+                self._read_distribution(entry.path)
+
+    def _read_distribution(self, dist_info):
+        with open(os.path.join(dist_info, "METADATA"), "r", encoding="utf-8") as f:
+            metadata = HeaderParser().parse(f)
+
+        requires = set()
+        for requirement in metadata.get_all("Requires-Dist") or []:
+            # dependencies of extras are not installed unless requested
+            marker = requirement.partition(";")[2]
+            match = REQUIREMENT_NAME.match(requirement)
+            if match and "extra" not in marker:
+                requires.add(canonical_name(match.group(1)))
+
+        files = [dist_info]
+        record = os.path.join(dist_info, "RECORD")
+        if os.path.isfile(record):
+            with open(record, "r", newline="", encoding="utf-8") as f:
+                for row in csv.reader(f):
+                    path = row[0] if row else ""
+                    # scripts are recorded relative to site-packages, but
+                    # pip install --target moves them into its bin folder
+                    if path.startswith("../"):
+                        path = path.lstrip("./")
+                        if not path.startswith("bin/"):
+                            continue
+                    if path:
+                        files.append(os.path.join(self.install_path, path))
+
+        self.distributions[canonical_name(metadata["Name"])] = {
+            "version": metadata["Version"],
+            "requires": sorted(requires),
+            "files": files,
+        }
+
+    def closure(self, names, stop=()):
+        """
+        Returns the installed distributions of names and their transitive
+        dependencies, without traversing the distributions of stop
+        """
+        found = set()
+        pending = [canonical_name(name) for name in names]
+        while pending:
+            name = pending.pop()
+            if name in found or name in stop or name not in self.distributions:
+                continue
+            found.add(name)
+            pending.extend(self.distributions[name]["requires"])
+        return found
+
+    def exclusive_dependencies(self, excluded, roots):
+        """
+        Returns sorted names of the excluded distributions and of their
+        dependencies that are not required by the kept roots
+        """
+        excluded = {canonical_name(name) for name in excluded}
+        kept = self.closure(roots, stop=excluded)
+        return sorted(self.closure(excluded) - kept)
+
+    def remove(self, excluded, roots):
+        """
+        Deletes the files of the excluded distributions and their exclusive
+        dependencies
+
+        Returns dict of distribution name to number of bytes removed.
+        """
+        return self.uninstall(self.exclusive_dependencies(excluded, roots))
+
+    def uninstall(self, names):
+        """
+        Deletes the files of the installed distributions of names
+
+        Returns dict of distribution name to number of bytes removed.
+        """
+        removed = {}
+        for name in names:
+            if name not in self.distributions:
+                continue
+            size = 0
+            for path in self.distributions[name]["files"]:
+                if os.path.isdir(path) and not os.path.islink(path):
+                    for root, _, files in os.walk(path):
+                        for file in files:
+                            size += os.lstat(os.path.join(root, file)).st_size
+                    shutil.rmtree(path)
+                elif os.path.lexists(path):
+                    size += os.lstat(path).st_size
+                    os.remove(path)
+            removed[name] = size
+            del self.distributions[name]
+
+        # remove directories left empty
+        for root, dirs, files in os.walk(self.install_path, topdown=False):
+            if root != os.fspath(self.install_path) and not os.listdir(root):
+                os.rmdir(root)
+        return removed
@@ -0,0 +1,206 @@
+import os
+import subprocess
+import sys
+import threading
+from pathlib import Path
+from .cache import cache_key
+
+# Path of the persistent pip cache inside builder containers
+CONTAINER_PIP_CACHE = "/var/cache/pip"
+
+# Writable home of the host user inside builder containers
+CONTAINER_HOME = "/tmp"
+
+# Default host folder of the pip cache mounted into builder containers
+DEFAULT_PIP_CACHE = Path.home() / ".cache" / "lambda-packaging" / "pip"
+
+# Warm builders of the current process, by container name and backend
+_BUILDERS = {}
+_BUILDERS_LOCK = threading.Lock()
+
+
+def builder_image(docker_image, runtime):
+    """
+    Returns the image of the builder container, defaulting untagged images
+    to their build tag of the runtime (e.g. lambci/lambda:build-python3.6)
+    """
+    if ":" in docker_image.rsplit("/", 1)[-1]:
+        return docker_image
+    return f"{docker_image}:build-{runtime}"
+
+
+def host_user():
+    """
+    Returns "uid:gid" of the current user, None where there is none (Windows)
+    """
+    if not hasattr(os, "getuid"):
+        return None
+    return f"{os.getuid()}:{os.getgid()}"
+
+
+class DockerCLIBackend:
+    """
+    Manages builder containers through the docker CLI
+
+    Commands run as the host user, so that the files they write into the
+    mounted folders can be replaced and removed by the host afterwards.
+    """
+
+    def __init__(self, docker="docker", user=None):
+        """
+        :docker: docker CLI executable
+        :user: "uid:gid" running the commands (default: the host user)
+        """
+        self.docker = docker
+        self.user = user or host_user()
+
+    def _user_args(self):
+        if not self.user:
+            return []
+        # the host user has no home in the image, pip needs a writable one
+        return ["--user", self.user, "-e", f"HOME={CONTAINER_HOME}"]
+
+    def _run(self, args):
+        return subprocess.run(
+            [self.docker] + args,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+        )
+
+    def state(self, name):
+        """
+        Returns "running", "stopped" or None when the container does not exist
+        """
+        result = self._run(["inspect", "-f", "{{.State.Running}}", name])
+        if result.returncode != 0:
+            return None
+        return "running" if result.stdout.strip() == "true" else "stopped"
+
+    def start(self, name, image, volumes, environment):
+        """
+        Starts the container, creating it idle when it does not exist
+        """
+        if self.state(name) == "stopped":
+            return self._run(["start", name])
+
+        args = ["run", "-d", "--name", name, "--entrypoint", "sleep"]
+        args += self._user_args()
+        for host_path, container_path in sorted(volumes.items()):
+            args += ["-v", f"{host_path}:{container_path}"]
+        for key, value in sorted(environment.items()):
+            args += ["-e", f"{key}={value}"]
+        return self._run(args + [image, "infinity"])
+
+    def exec(self, name, command, workdir):
+        return self._run(["exec"] + self._user_args() + ["-w", workdir, name] + command)
+
+
+class LocalBackend:
+    """
+    Stand-in for the docker daemon running builder commands on the host,
+    with container paths mapped back to their host volumes.
+
+    Usable in tests and where docker is not available: installs then target
+    the host platform instead of the lambda one.
+    """
+
+    def __init__(self):
+        self.containers = {}
+        self.commands = []
+
+    def state(self, name):
+        return "running" if name in self.containers else None
+
+    def start(self, name, image, volumes, environment):
+        self.containers[name] = (volumes, environment)
+
+    def _host_path(self, volumes, value):
+        for host_path, container_path in volumes.items():
+            if value == container_path or value.startswith(container_path + "/"):
+                return host_path + value[len(container_path) :]
+        return value
+
+    def exec(self, name, command, workdir):
+        volumes, environment = self.containers[name]
+        self.commands.append(command)
+        if command[0] == "python":
+            command = [sys.executable] + command[1:]
+        env = dict(
+            os.environ,
+            **{
+                key: self._host_path(volumes, value)
+                for key, value in environment.items()
+            },
+        )
+        return subprocess.run(
+            [self._host_path(volumes, arg) for arg in command],
+            cwd=self._host_path(volumes, workdir),
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+        )
+
+
+class DockerBuilder:
+    """
+    Long-lived builder container of a docker image.
+
+    The container is started once, idle, with the persistent pip cache
+    mounted, and reused by every install through exec.
+    """
+
+    def __init__(self, image, volumes, pip_cache=None, backend=None):
+        """
+        :image: docker image of the container
+        :volumes: dict of host path to container path
+        :pip_cache: host folder of the pip cache (default: DEFAULT_PIP_CACHE)
+        :backend: container backend (default: DockerCLIBackend)
+        """
+        self.image = image
+        self.pip_cache = Path(os.path.abspath(pip_cache or DEFAULT_PIP_CACHE))
+        self.volumes = {
+            os.path.abspath(host_path): container_path
+            for host_path, container_path in volumes.items()
+        }
+        self.volumes[str(self.pip_cache)] = CONTAINER_PIP_CACHE
+        self.environment = {"PIP_CACHE_DIR": CONTAINER_PIP_CACHE}
+        self.backend = backend or DockerCLIBackend()
+        self.name = (
+            "lambda-packaging-builder-"
+            + cache_key(image, *sorted(self.volumes.items()))[:12]
+        )
+        self.lock = threading.Lock()
+
+    def ensure_started(self):
+        """
+        Starts the container unless it is already running
+        """
+        if self.backend.state(self.name) == "running":
+            return
+        os.makedirs(self.pip_cache, exist_ok=True)
+        result = self.backend.start(
+            self.name, self.image, self.volumes, self.environment
+        )
+        if result is not None and result.returncode != 0:
+            raise RuntimeError(
+                f"could not start builder container {self.name}: {result.stderr}"
+            )
+
+    def exec(self, command, workdir):
+        """
+        Runs command in the container and returns the completed process
+        """
+        with self.lock:
+            self.ensure_started()
+            return self.backend.exec(self.name, command, workdir)
+
+
+def get_builder(image, volumes, pip_cache=None, backend=None):
+    """
+    Returns the warm builder of image and volumes, creating it on first use
+    """
+    builder = DockerBuilder(image, volumes, pip_cache, backend)
+    with _BUILDERS_LOCK:
+        return _BUILDERS.setdefault((builder.name, backend), builder)
@@ -0,0 +1,67 @@
+import hashlib
+import json
+import os
+
+
+def input_fingerprint(files, settings):
+    """
+    Returns a hex digest of the settings and of the path, size and mtime
+    of every file, computed without reading the files
+    """
+    h = hashlib.sha256(json.dumps(settings, sort_keys=True, default=str).encode())
+    for file in files:
+        try:
+            stat = os.stat(file)
+        except FileNotFoundError:
+            h.update(f"{file}\0missing\n".encode())
+            continue
+        h.update(f"{file}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+    return h.hexdigest()
+
+
+def _archive_paths(outputs):
+    for key in ["package_archive", "layer_archive"]:
+        if key in outputs:
+            yield outputs[key]
+    yield from outputs.get("layer_archives", {}).values()
+
+
+class BuildRecord:
+    """
+    Records the input fingerprint of the last build of a package next to
+    its archives, with the paths and hashes it produced, so that previews
+    of unchanged inputs reuse them instead of building the archives.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self, fingerprint):
+        """
+        Returns the outputs of the last build when it had the same
+        fingerprint and its archives still exist, None otherwise
+        """
+        try:
+            with open(self.path, "r") as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if record.get("fingerprint") != fingerprint:
+            return None
+        outputs = record["outputs"]
+        if not all(os.path.isfile(path) for path in _archive_paths(outputs)):
+            return None
+        return outputs
+
+    def save(self, fingerprint, outputs):
+        """
+        Records the outputs built from the inputs of fingerprint
+        """
+        with open(self.path, "w") as f:
+            json.dump(
+                {"fingerprint": fingerprint, "outputs": outputs},
+                f,
+                indent=1,
+                sort_keys=True,
+            )
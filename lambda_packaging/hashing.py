@@ -0,0 +1,139 @@
+import hashlib
+import json
+import mmap
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Files from this size are hashed through a memory map (bytes)
+MMAP_MIN_SIZE = 4 * 1024 * 1024
+
+# Size of the buffer of files hashed by reading them (bytes)
+BUFFER_SIZE = 128 * 1024
+
+# Files modified less than this before being hashed are not cached, as a
+# change within the same mtime tick would go unnoticed (nanoseconds)
+RACY_WINDOW = 2 * 10**9
+
+
+def file_digest(path):
+    """
+    Returns the SHA256 digest of a file
+
+    Large files are hashed through a memory map, others with
+    hashlib.file_digest when available (python >= 3.11) or by reading
+    them into a reused buffer. hashlib releases the GIL while hashing,
+    so files can be hashed in parallel threads.
+    """
+    with open(path, "rb", buffering=0) as f:
+        if os.fstat(f.fileno()).st_size >= MMAP_MIN_SIZE:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return hashlib.sha256(mapped).digest()
+
+        if hasattr(hashlib, "file_digest"):
+            return hashlib.file_digest(f, "sha256").digest()
+
+        h = hashlib.sha256()
+        buffer = bytearray(BUFFER_SIZE)
+        view = memoryview(buffer)
+        for n in iter(lambda: f.readinto(view), 0):
+            h.update(view[:n])
+        return h.digest()
+
+
+def digest_files(paths, workers=None):
+    """
+    Returns the SHA256 digests of files, in order, hashed by workers threads
+    (default: executor default)
+    """
+    paths = list(paths)
+    if len(paths) < 2 or workers == 1:
+        return [file_digest(path) for path in paths]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(file_digest, paths))
+
+
+def _stat_key(stat):
+    return [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+
+
+class DigestCache:
+    """
+    Persistent cache of file digests keyed by absolute path, size, mtime
+    and inode, so that unchanged files are never hashed again across runs.
+
+    Files modified within RACY_WINDOW of being hashed are hashed again on
+    the next lookup, since a later write in the same mtime tick would
+    leave their stat unchanged.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        try:
+            with open(path, "r") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+        self.changed = False
+
+    def digests(self, paths, workers=None):
+        """
+        Returns the SHA256 digests of files, in order, hashing in parallel
+        only the files missing from the cache or changed since cached
+        """
+        paths = [os.path.abspath(path) for path in paths]
+        stats = [os.stat(path) for path in paths]
+        digests = [None] * len(paths)
+        missing = []
+        with self.lock:
+            for i, (path, stat) in enumerate(zip(paths, stats)):
+                entry = self.entries.get(path)
+                if entry and entry[:3] == _stat_key(stat):
+                    digests[i] = bytes.fromhex(entry[3])
+                else:
+                    missing.append(i)
+
+        started = time.time_ns()
+        hashed = digest_files([paths[i] for i in missing], workers)
+        with self.lock:
+            for i, digest in zip(missing, hashed):
+                digests[i] = digest
+                if stats[i].st_mtime_ns < started - RACY_WINDOW:
+                    self.entries[paths[i]] = _stat_key(stats[i]) + [digest.hex()]
+                    self.changed = True
+        return digests
+
+    def digest(self, path):
+        """
+        Returns the SHA256 digest of a file
+        """
+        return self.digests([path])[0]
+
+    def save(self):
+        """
+        Writes the cache when it changed, dropping the entries of deleted files
+        """
+        with self.lock:
+            if not self.changed:
+                return
+            entries = {
+                path: entry
+                for path, entry in self.entries.items()
+                if os.path.exists(path)
+            }
+            # the cache may be shared by concurrent runs, which must never
+            # read a partially written file
+            folder = os.path.dirname(os.path.abspath(self.path))
+            fd, staging = tempfile.mkstemp(prefix=".staging-", dir=folder)
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(entries, f)
+                os.replace(staging, self.path)
+            finally:
+                if os.path.exists(staging):
+                    os.remove(staging)
+            self.entries = entries
+            self.changed = False
@@ -0,0 +1,168 @@
+import json
+import os
+from .dependency_graph import DependencyGraph
+from .lockfile import canonical_name
+from .walker import walk_files
+from .zip_package import IGNORE_MATCHER
+
+# Maximum number of layers of a lambda function
+MAX_LAYERS = 5
+
+# Size (bytes) from which a stable distribution gets a layer of its own
+HEAVY_LAYER_SIZE = 20 * 1024**2
+
+# Number of version changes from which a distribution is volatile
+VOLATILE_CHANGES = 2
+
+# Layer of the installed files that no distribution records
+UNOWNED = "other"
+
+
+def check_max_layers(max_layers):
+    """
+    Raises ValueError if lambda can't attach max_layers layers to a function
+    """
+    if not 1 <= max_layers <= MAX_LAYERS:
+        raise ValueError(
+            f"max_layers must be between 1 and {MAX_LAYERS}, got {max_layers}"
+        )
+
+
+def plan_layers(
+    distributions,
+    max_layers=MAX_LAYERS,
+    heavy_size=HEAVY_LAYER_SIZE,
+    volatile_changes=VOLATILE_CHANGES,
+):
+    """
+    Partitions distributions into at most max_layers layers
+
+    Volatile distributions, whose version changed volatile_changes times,
+    go in a "volatile" layer so that updating them does not republish the
+    others. The heaviest stable distributions get a layer of their own and
+    the remaining ones share a "stable" layer. The plan only depends on
+    the given sizes and changes, so an unchanged install gives the same layers.
+
+    :distributions: dict of name to {"size": bytes, "changes": version changes}
+    Returns dict of layer name to sorted distribution names, in layer order.
+    """
+    names = sorted(distributions)
+    volatile = [n for n in names if distributions[n]["changes"] >= volatile_changes]
+    stable = [n for n in names if n not in volatile]
+
+    # a volatile layer is only worth it next to stable ones
+    budget = max_layers
+    if volatile and stable and budget > 1:
+        budget -= 1
+    else:
+        stable, volatile = names, []
+
+    heavy = sorted(
+        (n for n in stable if distributions[n]["size"] >= heavy_size),
+        key=lambda n: (-distributions[n]["size"], n),
+    )
+    if len(heavy) >= budget:
+        heavy = heavy[: budget - 1]
+
+    layers = {name: [name] for name in heavy}
+    light = [n for n in stable if n not in heavy]
+    if light:
+        layers["stable"] = light
+    if volatile:
+        layers["volatile"] = volatile
+    return layers
+
+
+class LayerPlanner:
+    """
+    Plans the layers of the distributions installed in a folder.
+
+    Versions of the distributions are recorded in a history file across
+    builds, so that the distributions updated most often are told apart.
+    """
+
+    def __init__(
+        self,
+        install_path,
+        history_path,
+        max_layers=MAX_LAYERS,
+        heavy_size=HEAVY_LAYER_SIZE,
+        volatile_changes=VOLATILE_CHANGES,
+        volatile=[],
+    ):
+        """
+        :install_path: folder where requirements are installed
+        :history_path: JSON file of the versions seen across builds
+        :max_layers: maximum number of layers
+        :heavy_size: size (bytes) from which a stable distribution gets its own layer
+        :volatile_changes: number of version changes from which a distribution is volatile
+        :volatile: names of distributions always considered volatile
+        """
+        self.install_path = install_path
+        self.history_path = history_path
+        self.max_layers = max_layers
+        self.heavy_size = heavy_size
+        self.volatile_changes = volatile_changes
+        self.volatile = [canonical_name(name) for name in volatile]
+
+    def _load_history(self):
+        try:
+            with open(self.history_path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def distribution_files(self):
+        """
+        Returns (dict of distribution name to the sorted archived files it
+        installed, dependency graph), files recorded by none belonging to UNOWNED
+        """
+        graph = DependencyGraph(self.install_path)
+        owners = {
+            os.path.normpath(file): name
+            for name, distribution in graph.distributions.items()
+            for file in distribution["files"]
+        }
+
+        files = {}
+        for file in walk_files(self.install_path, ignore=IGNORE_MATCHER):
+            owner = owners.get(os.path.normpath(file), UNOWNED)
+            files.setdefault(owner, []).append(file)
+        return files, graph
+
+    def plan(self):
+        """
+        Records the installed versions and returns dict of layer name
+        to the sorted files of its distributions, in layer order
+        """
+        files, graph = self.distribution_files()
+
+        history = self._load_history()
+        for name, distribution in graph.distributions.items():
+            seen = history.setdefault(
+                name, {"version": distribution["version"], "changes": 0}
+            )
+            if seen["version"] != distribution["version"]:
+                seen["version"] = distribution["version"]
+                seen["changes"] += 1
+        with open(self.history_path, "w") as f:
+            json.dump(history, f, indent=2, sort_keys=True)
+
+        distributions = {
+            name: {
+                "size": sum(os.lstat(file).st_size for file in owned),
+                "changes": (
+                    self.volatile_changes
+                    if name in self.volatile
+                    else history.get(name, {}).get("changes", 0)
+                ),
+            }
+            for name, owned in files.items()
+        }
+        layers = plan_layers(
+            distributions, self.max_layers, self.heavy_size, self.volatile_changes
+        )
+        return {
+            layer: sorted(file for name in names for file in files[name])
+            for layer, names in layers.items()
+        }
@@ -0,0 +1,126 @@
+import json
+import os
+import re
+
+# Header lines of lockfiles, the second one holds the key of their input
+LOCK_HEADER = "# generated by lambda_packaging from the filtered requirements"
+INPUT_PREFIX = "# input: "
+
+# Platform of the wheels resolved for dockerized installs
+DOCKER_PLATFORM = "manylinux2014_x86_64"
+
+
+class LockError(Exception):
+    """
+    Raised when requirements cannot be resolved into a lockfile
+    """
+
+
+def canonical_name(name):
+    """
+    Returns the normalized name of a distribution (PEP 503)
+    """
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def resolve_args(
+    requirements_file, report_path, runtime=None, target=None, only_binary=False
+):
+    """
+    Returns pip arguments resolving requirements_file without installing it
+    and writing the resolution report to report_path.
+
+    When runtime is given, wheels are resolved for the lambda platform and
+    python version, in which case pip needs a (never written) target folder.
+    With only_binary, only wheels are resolved on the host platform too.
+    """
+    args = [
+        "install",
+        "--dry-run",
+        "--ignore-installed",
+        "--quiet",
+        "--report",
+        report_path,
+        "-r",
+        requirements_file,
+    ]
+    if runtime:
+        args += [
+            "--target",
+            target,
+            "--platform",
+            DOCKER_PLATFORM,
+            "--python-version",
+            runtime.replace("python", ""),
+            "--implementation",
+            "cp",
+            "--only-binary=:all:",
+        ]
+    elif only_binary:
+        args.append("--only-binary=:all:")
+    return args
+
+
+def read_report(report_path):
+    """
+    Returns dict of distribution name to its pinned line with artifact hash
+    from a pip installation report
+    """
+    with open(report_path, "r") as f:
+        report = json.load(f)
+
+    requirements = {}
+    for item in report["install"]:
+        name = canonical_name(item["metadata"]["name"])
+        archive_info = item["download_info"].get("archive_info", {})
+        hashes = archive_info.get("hashes") or dict(
+            [archive_info["hash"].split("=", 1)] if "hash" in archive_info else []
+        )
+        if "sha256" not in hashes:
+            raise LockError(
+                f"{name} cannot be locked: {item['download_info']['url']} has no sha256 hash"
+            )
+        requirements[name] = (
+            f"{name}=={item['metadata']['version']} --hash=sha256:{hashes['sha256']}"
+        )
+    return dict(sorted(requirements.items()))
+
+
+class Lockfile:
+    """
+    Requirements resolved to exact versions and artifact hashes.
+
+    The lockfile records the key of the filtered requirements it was
+    resolved from, and is only resolved again when they change.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        """
+        Returns (input key, dict of name to pinned line), or None when
+        the lockfile does not exist
+        """
+        if not os.path.isfile(self.path):
+            return None
+
+        input_key = None
+        requirements = {}
+        with open(self.path, "r") as f:
+            for line in f:
+                line = line.strip()
+                if line.startswith(INPUT_PREFIX):
+                    input_key = line[len(INPUT_PREFIX) :]
+                elif line and not line.startswith("#"):
+                    requirements[line.split("==", 1)[0]] = line
+        return input_key, requirements
+
+    def save(self, input_key, requirements):
+        """
+        Writes the pinned requirements resolved from input_key
+        """
+        with open(self.path, "w") as f:
+            f.write(f"{LOCK_HEADER}\n{INPUT_PREFIX}{input_key}\n")
+            for name in sorted(requirements):
+                f.write(f"{requirements[name]}\n")
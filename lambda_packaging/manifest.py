@@ -0,0 +1,129 @@
+import json
+import os
+from pathlib import Path
+from .hashing import digest_files
+
+# Version of the manifest format, bump it to invalidate existing manifests
+MANIFEST_VERSION = 2
+
+
+class ArchiveManifest:
+    """
+    Records the inputs of an archive next to it, so that an unchanged
+    archive and its hash can be reused instead of being rebuilt.
+    """
+
+    def __init__(self, archive_path):
+        self.archive_path = Path(archive_path)
+        self.path = Path(f"{archive_path}.manifest.json")
+
+    def load(self):
+        """
+        Returns the stored manifest or None if missing or unreadable
+        """
+        try:
+            with open(self.path, "r") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get("version") != MANIFEST_VERSION:
+            return None
+        return manifest
+
+    def snapshot(self, entries, settings, previous=None):
+        """
+        Records path, size, mtime, mode and content hash of every (file, arcname) entry
+
+        Content hashes of files whose size and mtime did not change since
+        the previous manifest are reused instead of being computed again,
+        the others are computed in parallel.
+        """
+        known = {}
+        if previous:
+            known = {f["source"]: f for f in previous["files"]}
+
+        files = []
+        missing = []
+        for file, arcname in entries:
+            stat = os.stat(file)
+            record = {
+                "path": arcname,
+                "source": str(file),
+                "size": stat.st_size,
+                "mtime": stat.st_mtime_ns,
+                # archived as the external attributes of the member
+                "mode": stat.st_mode,
+            }
+            old = known.get(str(file))
+            if (
+                old
+                and old["size"] == record["size"]
+                and old["mtime"] == record["mtime"]
+            ):
+                record["sha256"] = old["sha256"]
+            else:
+                missing.append((record, file))
+            files.append(record)
+
+        digests = digest_files(file for _, file in missing)
+        for (record, _), digest in zip(missing, digests):
+            record["sha256"] = digest.hex()
+
+        # normalize settings the way they are read back from disk
+        settings = json.loads(json.dumps(settings))
+        return {"version": MANIFEST_VERSION, "settings": settings, "files": files}
+
+    def _intact(self, previous):
+        """
+        Returns True when the archive on disk is the one previous was saved with
+        """
+        if not previous or not os.path.isfile(self.archive_path):
+            return False
+
+        archive = previous.get("archive", {})
+        stat = os.stat(self.archive_path)
+        return (
+            archive.get("size") == stat.st_size
+            and archive.get("mtime") == stat.st_mtime_ns
+        )
+
+    def matches(self, previous, current):
+        """
+        Returns True when the archive on disk was built from the current inputs
+        """
+        return (
+            self._intact(previous)
+            and previous["settings"] == current["settings"]
+            and previous["files"] == current["files"]
+        )
+
+    def unchanged_sources(self, previous, current):
+        """
+        Returns the sources of the current files archived with the same
+        content, under the same path and with the same settings, in the
+        archive on disk
+        """
+        if not self._intact(previous) or previous["settings"] != current["settings"]:
+            return set()
+
+        def key(f):
+            return f["source"], f["path"], f["sha256"]
+
+        recorded = {key(f) for f in previous["files"]}
+        return {f["source"] for f in current["files"] if key(f) in recorded}
+
+    def save(self, current, archive_hash):
+        """
+        Writes the manifest of the freshly built archive
+        """
+        stat = os.stat(self.archive_path)
+        manifest = dict(
+            current,
+            archive={
+                "size": stat.st_size,
+                "mtime": stat.st_mtime_ns,
+                "hash": archive_hash,
+            },
+        )
+        with open(self.path, "w") as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
@@ -0,0 +1,118 @@
+import os
+import shutil
+import struct
+import tempfile
+from pathlib import Path
+from .cache import evict_lru
+from .compression import CompressedMember, CHUNK_SIZE
+from .hashing import DigestCache
+
+# Default upper bound of the member store (bytes)
+DEFAULT_MEMBER_STORE_MAX_SIZE = 1024**3
+
+# Header of the blobs: compress type, CRC, file size and compressed size
+BLOB_HEADER = struct.Struct("<HIQQ")
+
+
+class MemberStore:
+    """
+    Content-addressed store of compressed archive members.
+
+    Every blob holds the compressed data of a member with its CRC and
+    sizes, keyed by the hash of its content and of the settings it was
+    compressed with, so that archives sharing files copy their compressed
+    data instead of compressing them again. Blobs are shared across
+    packages, runs and stacks and evicted in LRU order once the store
+    grows beyond max_size. The content hashes of the sources are cached
+    in digests, so unchanged files are not read again to look them up.
+    """
+
+    def __init__(self, store_dir, max_size=DEFAULT_MEMBER_STORE_MAX_SIZE):
+        self.store_dir = Path(store_dir)
+        self.max_size = max_size
+        os.makedirs(self.store_dir, exist_ok=True)
+        self.digests = DigestCache(self.store_dir / "digests.json")
+
+    def blob_path(self, key):
+        """Return absolute path of the blob of key"""
+        return self.store_dir / key[:2] / key
+
+    def get(self, key, zip_info):
+        """
+        Returns a CompressedMember of zip_info with the stored data of key,
+        or None on a miss
+        """
+        path = self.blob_path(key)
+        try:
+            data = open(path, "rb")
+        except OSError:
+            return None
+
+        header = data.read(BLOB_HEADER.size)
+        if len(header) != BLOB_HEADER.size:
+            data.close()
+            return None
+        compress_type, crc, file_size, compress_size = BLOB_HEADER.unpack(header)
+
+        # mark the blob as recently used
+        os.utime(path)
+
+        zip_info.compress_type = compress_type
+        zip_info.CRC = crc
+        zip_info.file_size = file_size
+        zip_info.compress_size = compress_size
+        zip_info.flag_bits = 0x00
+        return CompressedMember(zip_info, data, reused=True)
+
+    def put(self, key, member):
+        """
+        Stores the compressed data of member under key and rewinds it
+        """
+        path = self.blob_path(key)
+        if os.path.isfile(path):
+            return path
+        os.makedirs(path.parent, exist_ok=True)
+
+        # blobs are written to a temporary file first so that a partially
+        # written blob is never visible to other processes
+        zip_info = member.zip_info
+        fd, staging = tempfile.mkstemp(prefix=".staging-", dir=self.store_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(
+                    BLOB_HEADER.pack(
+                        zip_info.compress_type,
+                        zip_info.CRC,
+                        zip_info.file_size,
+                        zip_info.compress_size,
+                    )
+                )
+                shutil.copyfileobj(member.data, f, CHUNK_SIZE)
+            os.replace(staging, path)
+        finally:
+            if os.path.exists(staging):
+                os.remove(staging)
+            member.data.seek(0)
+        return path
+
+    def entries(self):
+        """
+        Returns list of (path, size, last_used) of the stored blobs
+        """
+        entries = []
+        for folder in os.scandir(self.store_dir):
+            if not folder.is_dir() or folder.name.startswith("."):
+                continue
+            for blob in os.scandir(folder.path):
+                try:
+                    stat = blob.stat()
+                except OSError:
+                    continue
+                entries.append((blob.path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def evict(self):
+        """
+        Evicts least recently used blobs beyond max_size
+        """
+        return evict_lru(self.entries(), self.max_size)
@@ -5,8 +5,57 @@ import sys
 from pathlib import Path
 import pulumi
 import json
-from .utils import format_resource_name
-from pulumi_docker import RemoteImage, Container
+import shutil
+import tempfile
+from .cache import (
+    RequirementsCache,
+    DEFAULT_CACHE_MAX_SIZE,
+    cache_key,
+    host_platform,
+    requirements_key,
+)
+from .docker_builder import builder_image, get_builder
+from .wheelhouse import (
+    Wheelhouse,
+    CONTAINER_WHEELHOUSE,
+    wheel_args,
+    offline_install_args,
+)
+from .lockfile import Lockfile, LockError, resolve_args, read_report
+from .dependency_graph import DependencyGraph
+from .sync import pinned_version, read_resolution, diff_distributions, merge_tree
+from .profiler import Profiler, tree_stats
+
+
+class InstallError(Exception):
+    """
+    Raised when requirements cannot be installed
+    """
+
+
+def filter_requirements(requirements_path, no_deploy=[]):
+    """
+    Returns dict of name to line of the requirements of requirements_path,
+    without the no_deploy ones
+    """
+    with open(requirements_path, "r") as f:
+        requirements = {r.name: r.line for r in req.parse(f)}
+
+    for n in no_deploy:
+        requirements.pop(n, None)
+    return requirements
+
+
+def default_lock_path(requirements_path, dockerize=False, name=None):
+    """
+    Returns the path of the lockfile of requirements_path, suffixed with
+    name when given and named after the host platform without docker,
+    as the lock pins the hashes of the wheels of the resolving platform
+    """
+    requirements_path = Path(requirements_path)
+    stem = f"{requirements_path.stem}-{name}" if name else requirements_path.stem
+    platform = "" if dockerize else f".{host_platform()}"
+    return requirements_path.with_name(f"{stem}{platform}.lock")
 
 
 class PipRequirements:
@@ -26,8 +75,20 @@ class PipRequirements:
         install_folder="requirements/",
         docker_image="lambci/lambda",
         container_path="/io",
+        cache_dir=None,
+        cache_max_size=DEFAULT_CACHE_MAX_SIZE,
+        pip_cache=None,
+        docker_backend=None,
+        wheelhouse_dir=None,
+        lock=False,
+        exclude_transitive=False,
+        sync=False,
+        install_variant="",
+        profiler=None,
     ):
         self.resource_name = resource_name
+        self.profiler = profiler or Profiler(resource_name)
+        self.pip_output = ""
         self.pip_cmd = [sys.executable, "-m", "pip", "install", "-r"]
         self.project_root = Path(project_root)
         self.no_deploy = no_deploy
@@ -37,12 +98,40 @@ class PipRequirements:
         self.install_folder = self.target_folder / install_folder
         self.docker_image = docker_image
         self.container_path = container_path
-
-        self.target_requirements_path = (
-            self.project_root / self.target_folder / "requirements.txt"
+        self.pip_cache = pip_cache
+        if pip_cache is None and cache_dir:
+            self.pip_cache = Path(cache_dir) / "pip"
+        self.docker_backend = docker_backend
+        self.exclude_transitive = exclude_transitive
+        self.sync = sync
+        self.sync_report = {}
+        self.requirements = {}
+        self.top_level = []
+        self.no_deploy_report = {}
+        self.cache = (
+            RequirementsCache(cache_dir, cache_max_size) if cache_dir else None
         )
+        # steps transforming the installed tree, recorded with the cache
+        # entry it holds so that an unchanged folder is not restored again
+        self.install_variant = cache_key(
+            install_variant, exclude_transitive, *sorted(no_deploy)
+        )
+        self.install_key = None
+        self.wheelhouse = Wheelhouse(wheelhouse_dir) if wheelhouse_dir else None
+
         self.requirements_path = self.project_root / requirements_path
+        self.lockfile = None
+        if lock:
+            lock_path = default_lock_path(self.requirements_path, dockerize)
+            if not isinstance(lock, bool):
+                lock_path = self.project_root / lock
+            self.lockfile = Lockfile(lock_path)
         self.install_path = self.project_root / self.install_folder
+        # named after the install folder, so that concurrent installs into
+        # other folders of target_folder don't overwrite it
+        self.target_requirements_path = self.install_path.with_name(
+            f"{self.install_path.name}.txt"
+        )
 
         if not os.path.isdir(self.install_path):
             os.makedirs(self.install_path, exist_ok=True)
@@ -51,57 +140,415 @@ class PipRequirements:
         """
         Parses requirements and add requirements.txt in .plp folder    
         """
-        requirements = self.filter_requirements()
+        with self.profiler.phase("parse_requirements") as record:
+            requirements = self.filter_requirements()
+            record["files"] = 1
+        self.top_level = list(requirements)
+        if self.lockfile:
+            with self.profiler.phase("lock_requirements"):
+                requirements = self.lock_requirements(requirements)
+        self.requirements = requirements
+
+        content = "".join(f"{requirements[k]}\n" for k in requirements)
         with open(self.target_requirements_path, "w") as f:
-            for k in requirements:
-                f.write(f"{requirements[k]}\n")
+            f.write(content)
 
     def filter_requirements(self):
         """
         Filter requirements from mentioned no_deploy paramter
         """
-        with open(self.requirements_path, "r") as f:
-            requirements = {r.name: r.line for r in req.parse(f)}
+        return filter_requirements(self.requirements_path, self.no_deploy)
+
+    def lock_requirements(self, requirements):
+        """
+        Returns the filtered requirements pinned to exact versions and hashes,
+        resolving them into the lockfile unless it was resolved from them
+        """
+        input_key = requirements_key(
+            requirements, self.runtime, self.docker_image if self.dockerize else None
+        )
+        # wheels built from sdists into the wheelhouse would not match the
+        # hashes of the sdists, so only wheels are locked with a wheelhouse
+        only_binary = self.wheelhouse is not None
+        if only_binary:
+            input_key = cache_key(input_key, "only-binary")
+        locked = self.lockfile.load()
+        if locked and locked[0] == input_key:
+            return locked[1]
+
+        locked = self.resolve_requirements(requirements, only_binary=only_binary)
+        self.lockfile.save(input_key, locked)
+        return locked
+
+    def resolve_requirements(self, requirements, read=read_report, only_binary=False):
+        """
+        Resolves requirements with pip without installing them and
+        returns read(path of the pip installation report)
+
+        :only_binary: resolve wheels only, on the host platform too
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            requirements_file = os.path.join(tmp, "requirements.txt")
+            with open(requirements_file, "w") as f:
+                for k in requirements:
+                    f.write(f"{requirements[k]}\n")
+
+            # resolve for the lambda platform when installing in docker
+            report_path = os.path.join(tmp, "report.json")
+            args = resolve_args(
+                requirements_file,
+                report_path,
+                runtime=self.runtime if self.dockerize else None,
+                target=os.path.join(tmp, "target"),
+                only_binary=only_binary,
+            )
+            result = subprocess.run(
+                [sys.executable, "-m", "pip"] + args,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                universal_newlines=True,
+            )
+            if result.returncode != 0:
+                wheels_only = ""
+                if only_binary:
+                    wheels_only = " to wheels only, as wheelhouse_dir is set"
+                raise LockError(
+                    f"could not resolve {self.requirements_path}{wheels_only}: "
+                    f"{result.stderr}"
+                )
+            return read(report_path)
+
+    def remove_no_deploy(self):
+        """
+        Removes the no_deploy distributions installed as dependencies of
+        other requirements, together with their exclusive dependencies
+        """
+        with self.profiler.phase("remove_no_deploy") as record:
+            graph = DependencyGraph(self.install_path)
+            self.no_deploy_report = graph.remove(self.no_deploy, self.top_level)
+            record["bytes_removed"] = sum(self.no_deploy_report.values())
+
+        if self.no_deploy_report:
+            pulumi.log.info(
+                f"{self.resource_name}: removed {sum(self.no_deploy_report.values())} bytes"
+                f" of no_deploy distributions ({', '.join(self.no_deploy_report)})"
+            )
+
+    def docker_cmd(self, requirements_file="requirements.txt", install_folder=None):
+        """
+        Docker cmd to run in the container
+
+        :requirements_file: requirements file relative to target_folder
+        :install_folder: folder relative to target_folder (default: install_folder)
+        """
+        if install_folder is None:
+            install_folder = self.install_folder.relative_to(self.target_folder)
+        target = Path(self.container_path) / install_folder
+        return [
+            "python",
+            "-m",
+            "pip",
+            "install",
+            "-r",
+            requirements_file,
+            "-t",
+            target.as_posix(),
+        ]
+
+    def dockerize_pip(
+        self,
+        key=None,
+        requirements_file="requirements.txt",
+        install_folder=None,
+        args=[],
+    ):
+        """
+        Installs requirements in the warm builder container of docker_image,
+        started once with target_folder and the pip cache mounted
+
+        :args: extra arguments of pip
+        """
+        volumes = {str(self.project_root / self.target_folder): self.container_path}
+        if self.wheelhouse:
+            volumes[str(self.wheelhouse.path)] = CONTAINER_WHEELHOUSE
+        builder = get_builder(
+            builder_image(self.docker_image, self.runtime),
+            volumes=volumes,
+            pip_cache=self.pip_cache,
+            backend=self.docker_backend,
+        )
+
+        command = self.docker_cmd(requirements_file, install_folder)
+        if self.wheelhouse:
+            return self.wheelhouse_pip(
+                lambda pip_args: builder.exec(
+                    ["python", "-m", "pip"] + pip_args + args,
+                    workdir=self.container_path,
+                ),
+                key,
+                requirements_file,
+                CONTAINER_WHEELHOUSE,
+                command[-1],
+            )
+        return builder.exec(command + args, workdir=self.container_path)
+
+    def wheelhouse_pip(
+        self, pip, key, requirements_file, wheel_dir, target, requirements=None
+    ):
+        """
+        Builds the wheels of the requirements into the wheelhouse unless
+        they are already there, then installs them without reaching the index
+
+        When the offline install of already built wheels fails, their
+        wheels are built again and the install retried once.
+
+        :pip: function running pip with a list of arguments
+        :requirements: requirements of key (default: the filtered requirements)
+        """
+        install_args = offline_install_args(requirements_file, wheel_dir, target)
+        if self.wheelhouse.is_built(key):
+            result = pip(install_args)
+            if result.returncode == 0:
+                return result
+            # wheels may have been removed, or built for another platform
+            pulumi.log.warn(
+                f"{self.resource_name}: could not install requirements from "
+                "the wheelhouse, building their wheels again"
+            )
+            self.wheelhouse.unmark_built(key)
+
+        result = pip(wheel_args(requirements_file, wheel_dir))
+        if result.returncode != 0:
+            pulumi.log.warn(
+                f"{self.resource_name}: could not build wheels of requirements"
+            )
+            return result
+        self.wheelhouse.mark_built(
+            key, self.requirements if requirements is None else requirements
+        )
+        return pip(install_args)
+
+    def _pip_install(
+        self, key, requirements_file, install_folder, requirements=None, args=[]
+    ):
+        """
+        Runs pip install of requirements_file into install_folder, both
+        relative to target_folder, in docker, from the wheelhouse or locally
+
+        :key: key of the requirements of requirements_file
+        :requirements: requirements of key (default: the filtered requirements)
+        :args: extra arguments of pip
+        """
+        if self.dockerize:
+            return self.dockerize_pip(
+                key, Path(requirements_file).as_posix(), install_folder, args
+            )
+
+        target_path = self.project_root / self.target_folder
+        if self.wheelhouse:
+            return self.wheelhouse_pip(
+                lambda pip_args: subprocess.run(
+                    [sys.executable, "-m", "pip"] + pip_args + args,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                ),
+                key,
+                str(target_path / requirements_file),
+                str(self.wheelhouse.path),
+                str(target_path / install_folder),
+                requirements,
+            )
+        return subprocess.run(
+            self.pip_cmd
+            + [
+                str(target_path / requirements_file),
+                f"--target={target_path / install_folder}",
+            ]
+            + args,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
 
-        for n in self.no_deploy:
+    def plan_sync(self):
+        """
+        Returns (names of the installed distributions to uninstall, dict of
+        name to requirement line of the distributions to install) to bring
+        install_path in line with the resolved requirements, or None when
+        they can't be resolved to exact versions
+        """
+        if self.lockfile:
+            desired = {
+                name: (pinned_version(line), line)
+                for name, line in self.requirements.items()
+            }
+        else:
             try:
-                requirements.pop(n)
-            except:
-                pass
-        return requirements
-
-    def docker_cmd(self):
-        """Docker cmd to run in the container"""
-        return f'"cd {self.container_path}; pip install -r requirements.txt -t {os.path.join(self.install_folder)}"'
-
-    def dockerize_pip(self):
-        image = RemoteImage(
-            format_resource_name("python-runtime"),
-            name=self.docker_image,
-            keep_locally=True,
+                desired = self.resolve_requirements(self.requirements, read_resolution)
+            except LockError:
+                return None
+            if desired is None:
+                return None
+
+        installed = {
+            name: distribution["version"]
+            for name, distribution in DependencyGraph(
+                self.install_path
+            ).distributions.items()
+        }
+        uninstall, install = diff_distributions(
+            installed, {name: version for name, (version, _) in desired.items()}
         )
+        return uninstall, {name: desired[name][1] for name in install}
 
-        # run container and install requirements
-        self.container = Container(
-            format_resource_name("docker-container"),
-            image=image.name,
-            command=["bash", "-c", self.docker_cmd],
-            volumes=[
-                {
-                    "containerPath": self.container_path,
-                    "hostPath": self.project_root / self.target_folder,
-                }
-            ],
+    def sync_requirements(self, plan):
+        """
+        Uninstalls and installs the distributions of a plan_sync plan
+
+        Distributions are installed without their dependencies, already in
+        the plan, into a staging folder merged into install_path on success.
+        """
+        uninstall, install = plan
+        DependencyGraph(self.install_path).uninstall(uninstall)
+        self.sync_report = {"uninstalled": uninstall, "installed": sorted(install)}
+        if not install:
+            return subprocess.CompletedProcess([], 0, b"", b"")
+
+        name = self.install_path.name
+        requirements_file = f"{name}.sync.txt"
+        install_folder = f"{name}.sync"
+        staging = self.project_root / self.target_folder / install_folder
+        shutil.rmtree(staging, ignore_errors=True)
+        with open(self.project_root / self.target_folder / requirements_file, "w") as f:
+            f.write("".join(f"{install[n]}\n" for n in sorted(install)))
+
+        result = self._pip_install(
+            requirements_key(
+                install,
+                self.runtime,
+                self.docker_image if self.dockerize else None,
+            ),
+            requirements_file,
+            install_folder,
+            requirements=install,
+            args=["--no-deps"],
         )
+        if result.returncode == 0:
+            merge_tree(staging, self.install_path)
+        shutil.rmtree(staging, ignore_errors=True)
+        return result
+
+    def record_install(self):
+        """
+        Records that install_path holds the cached requirements transformed
+        by the steps of install_variant, once they all ran
+        """
+        if self.cache and self.install_key:
+            self.cache.record(
+                self.install_key, self.install_path, self.install_variant
+            )
+
+    def _record_output(self, result):
+        """
+        Keeps the output of a pip run, logged at debug level or as a
+        warning when pip failed
+        """
+        output = []
+        for stream in (result.stdout, result.stderr):
+            if isinstance(stream, bytes):
+                stream = stream.decode(errors="replace")
+            if isinstance(stream, str):
+                output.append(stream)
+        self.pip_output = "".join(output)
+
+        if result.returncode != 0:
+            pulumi.log.warn(
+                f"{self.resource_name}: pip failed with code {result.returncode}\n"
+                f"{self.pip_output}"
+            )
+        elif self.pip_output:
+            pulumi.log.debug(f"{self.resource_name}: {self.pip_output}")
 
     def install_requirements(self):
         """
         Install requirements.txt
+
+        When a cache is configured, a previously installed tree of the same
+        filtered requirements is reused and pip is skipped entirely. It is
+        not even copied when install_path still holds it, as transformed by
+        the steps of install_variant.
+        When a wheelhouse is configured, requirements are installed offline
+        from their wheels, built on first use.
+        With sync, only the distributions missing from install_path or
+        installed at another version are installed, and the ones no longer
+        required are uninstalled.
+        With exclude_transitive, no_deploy distributions pulled in as
+        dependencies are removed after the install.
+        Raises InstallError when pip fails with a wheelhouse or sync.
         """
         self.generate_requirements_file()
-        if self.dockerize:
-            self.dockerize_pip()
-        else:
-            self.pip_cmd.append(str(self.target_requirements_path))
-            self.pip_cmd.append(f"--target={self.install_path}")
-            subprocess.run(self.pip_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+        key = requirements_key(
+            self.requirements,
+            self.runtime,
+            self.docker_image if self.dockerize else None,
+        )
+        if self.cache:
+            with self.profiler.phase("cache_lookup") as record:
+                hit = self.cache.get(key, self.install_path, self.install_variant)
+                record["hit"] = hit
+                if hit:
+                    record["files"], record["bytes_written"] = tree_stats(
+                        self.install_path
+                    )
+            if hit:
+                self.install_key = key
+                if self.exclude_transitive:
+                    self.remove_no_deploy()
+                return
+
+        plan = None
+        if self.sync:
+            with self.profiler.phase("sync_plan") as record:
+                plan = self.plan_sync()
+                record["resolved"] = plan is not None
+                if plan is None:
+                    # installing over the stale folder would keep removed packages
+                    shutil.rmtree(self.install_path, ignore_errors=True)
+                    os.makedirs(self.install_path, exist_ok=True)
+                else:
+                    record["uninstall"] = len(plan[0])
+                    record["install"] = len(plan[1])
+
+        with self.profiler.phase("pip_install") as record:
+            if plan is not None:
+                result = self.sync_requirements(plan)
+            else:
+                result = self._pip_install(
+                    key,
+                    self.target_requirements_path.relative_to(
+                        self.project_root / self.target_folder
+                    ),
+                    self.install_folder.relative_to(self.target_folder),
+                )
+            record["returncode"] = result.returncode
+            record["files"], record["bytes_written"] = tree_stats(self.install_path)
+        self._record_output(result)
+
+        # a failed wheelhouse install or sync leaves a partial install folder,
+        # which must not be archived into a layer
+        if result.returncode != 0 and (self.wheelhouse or plan is not None):
+            raise InstallError(
+                f"{self.resource_name}: could not install {self.requirements_path},"
+                f" pip failed with code {result.returncode}"
+            )
+
+        # only successful installs are stored in the cache
+        if self.cache and result.returncode == 0:
+            with self.profiler.phase("cache_store"):
+                self.cache.put(key, self.install_path)
+                self.cache.record(key, self.install_path)
+            self.install_key = key
+
+        # the cache keeps complete installs, as no_deploy is not part of its key
+        if self.exclude_transitive:
+            self.remove_no_deploy()
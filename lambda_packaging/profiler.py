@@ -0,0 +1,94 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+import pulumi
+
+# Counters of every phase record
+COUNTERS = ["bytes_read", "bytes_written", "files"]
+
+
+def tree_stats(path):
+    """
+    Returns (number of files, total size in bytes) of the files under path
+    """
+    files = size = 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            try:
+                size += os.lstat(os.path.join(root, name)).st_size
+                files += 1
+            except OSError:
+                pass
+    return files, size
+
+
+def _cpu_time():
+    """
+    Returns CPU time of the process and its finished subprocesses (pip)
+    """
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+class Profiler:
+    """
+    Records wall time, CPU time, bytes read and written and file counts
+    of the phases of a packaging run.
+
+    Phases are not nested, so that totals add up. CPU time covers the
+    whole process and its subprocesses, so phases running concurrently in
+    other threads are accounted in each other.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.phases = []
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name, **details):
+        """
+        Times the phase and yields its record, whose counters are
+        incremented by the caller
+        """
+        record = dict({"phase": name}, **details)
+        record.update({counter: 0 for counter in COUNTERS})
+        wall_start = time.perf_counter()
+        cpu_start = _cpu_time()
+        try:
+            yield record
+        finally:
+            record["wall_time"] = round(time.perf_counter() - wall_start, 6)
+            record["cpu_time"] = round(_cpu_time() - cpu_start, 6)
+            with self.lock:
+                self.phases.append(record)
+
+    def report(self):
+        """
+        Returns the recorded phases, in completion order, and their totals
+        """
+        with self.lock:
+            phases = list(self.phases)
+        totals = {
+            key: round(sum(phase[key] for phase in phases), 6)
+            for key in ["wall_time", "cpu_time"] + COUNTERS
+        }
+        return {"name": self.name, "phases": phases, "totals": totals}
+
+    def to_json(self):
+        return json.dumps(self.report(), indent=2)
+
+    def save(self, path):
+        """
+        Writes the JSON report to path
+        """
+        with open(path, "w") as f:
+            f.write(self.to_json())
+
+    def log(self):
+        """
+        Emits the JSON report through pulumi.log
+        """
+        pulumi.log.info(f"{self.name}: packaging profile {json.dumps(self.report())}")
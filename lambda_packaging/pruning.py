@@ -0,0 +1,124 @@
+import os
+import zipfile
+from .walker import walk_files
+from .zip_package import IGNORE_MATCHER
+
+# AWS Lambda deployment package limits (bytes)
+LAMBDA_ZIPPED_LIMIT = 50 * 1024**2
+LAMBDA_UNZIPPED_LIMIT = 250 * 1024**2
+
+# Packages already provided by the AWS Lambda python runtime
+RUNTIME_PACKAGES = ["boto3", "botocore", "s3transfer", "jmespath"]
+
+# Glob patterns of the files removed by each pruning rule,
+# relative to the install folder
+PRUNE_RULES = {
+    "tests": ["*/**/tests/**", "*/**/test/**"],
+    "examples": ["*/**/examples/**", "*/**/example/**"],
+    "stubs": ["**/*.pyi", "*-stubs/**"],
+    "bytecode": ["**/__pycache__/**", "**/*.pyc", "**/*.pyo"],
+    "runtime": [
+        pattern
+        for package in RUNTIME_PACKAGES
+        for pattern in (f"{package}/**", f"{package}-*.dist-info/**")
+    ],
+}
+
+
+class PackageSizeError(Exception):
+    """
+    Raised when a package exceeds the AWS Lambda size limits
+    """
+
+
+class LayerPruner:
+    """
+    Removes dead weight from installed requirements before they are archived
+    and reports the size of each top-level package.
+    """
+
+    def __init__(self, install_path, rules=PRUNE_RULES.keys(), extra_patterns=[]):
+        """
+        :install_path: folder where requirements are installed
+        :rules: names of the PRUNE_RULES to apply
+        :extra_patterns: additional glob patterns of files to remove
+        """
+        self.install_path = install_path
+        self.patterns = [
+            pattern for rule in rules for pattern in PRUNE_RULES[rule]
+        ] + list(extra_patterns)
+
+    def prune(self):
+        """
+        Deletes the files matching the pruning patterns
+
+        Returns dict of top-level package to number of bytes removed.
+        """
+        removed = {}
+        if not self.patterns:
+            return removed
+
+        for file in walk_files(self.install_path, self.patterns):
+            package = self._top_level(file)
+            removed[package] = removed.get(package, 0) + os.lstat(file).st_size
+            os.remove(file)
+
+        # remove directories left empty
+        for root, dirs, files in os.walk(self.install_path, topdown=False):
+            if root != os.fspath(self.install_path) and not os.listdir(root):
+                os.rmdir(root)
+        return removed
+
+    def size_report(self, removed={}):
+        """
+        Returns dict of top-level package to its number of files,
+        archived size (bytes) and pruned size (bytes), largest first
+        """
+        report = {}
+        for file in walk_files(self.install_path, ignore=IGNORE_MATCHER):
+            package = report.setdefault(
+                self._top_level(file), {"files": 0, "size": 0, "pruned": 0}
+            )
+            package["files"] += 1
+            package["size"] += os.lstat(file).st_size
+
+        for name, size in removed.items():
+            report.setdefault(name, {"files": 0, "size": 0, "pruned": 0})
+            report[name]["pruned"] = size
+        return dict(
+            sorted(report.items(), key=lambda item: (-item[1]["size"], item[0]))
+        )
+
+    def _top_level(self, file):
+        return os.path.relpath(file, self.install_path).split(os.sep)[0]
+
+
+def check_unzipped_size(size, limit=None):
+    """
+    Raises PackageSizeError when the unzipped size exceeds the lambda limit
+    """
+    if limit is None:
+        limit = LAMBDA_UNZIPPED_LIMIT
+    if size > limit:
+        raise PackageSizeError(
+            f"unzipped package size {size} bytes exceeds the lambda limit of {limit} bytes"
+        )
+
+
+def check_archives_size(archives, zipped_limit=None, unzipped_limit=None):
+    """
+    Raises PackageSizeError when an archive exceeds the zipped lambda limit,
+    or when the archives of a function exceed the unzipped limit together
+    """
+    if zipped_limit is None:
+        zipped_limit = LAMBDA_ZIPPED_LIMIT
+    unzipped_size = 0
+    for archive in archives:
+        size = os.path.getsize(archive)
+        if size > zipped_limit:
+            raise PackageSizeError(
+                f"{archive} size {size} bytes exceeds the lambda limit of {zipped_limit} bytes"
+            )
+        with zipfile.ZipFile(archive) as zip_file:
+            unzipped_size += sum(info.file_size for info in zip_file.infolist())
+    check_unzipped_size(unzipped_size, unzipped_limit)
@@ -0,0 +1,161 @@
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+from .cache import cache_key
+from .utils import sha256sum
+
+# Arguments of strip removing the debug sections of shared libraries only
+STRIP_ARGS = ["--strip-debug"]
+
+# Native extensions and shared libraries, versioned or not
+NATIVE_EXTENSION = re.compile(r"\.so(\.\d+)*$")
+
+ELF_MAGIC = b"\x7fELF"
+
+# Suffix of the cache markers of files strip does not shrink
+UNCHANGED_SUFFIX = ".unchanged"
+
+
+def find_strip():
+    """
+    Returns the path of the strip tool, None when it is not installed
+    """
+    return shutil.which("strip")
+
+
+def native_extensions(install_path):
+    """
+    Returns sorted paths of the ELF shared libraries under install_path
+    """
+    files = []
+    for root, _, names in os.walk(install_path):
+        for name in names:
+            path = os.path.join(root, name)
+            if not NATIVE_EXTENSION.search(name) or os.path.islink(path):
+                continue
+            with open(path, "rb") as f:
+                if f.read(len(ELF_MAGIC)) == ELF_MAGIC:
+                    files.append(path)
+    return sorted(files)
+
+
+class SymbolStripper:
+    """
+    Strips the debug sections of the native extensions of installed
+    requirements.
+
+    Stripped files are cached by the hash of their content, so every
+    distinct file is only stripped once across runs and stacks. Files
+    that strip does not shrink, or fails on (e.g. a host strip that
+    can't read the docker platform binaries), are left as installed.
+    """
+
+    def __init__(self, install_path, cache_dir=None, strip_tool=None):
+        """
+        :install_path: folder where requirements are installed
+        :cache_dir: directory of the stripped files cache (disabled when None)
+        :strip_tool: path of strip (default: found in PATH)
+        """
+        self.install_path = install_path
+        self.cache_dir = Path(cache_dir) / "stripped" if cache_dir else None
+        self.strip_tool = strip_tool or find_strip()
+        self._version = None
+
+        if self.cache_dir and not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    @property
+    def version(self):
+        """
+        First line of the strip tool version, part of the cache keys
+        """
+        if self._version is None:
+            result = subprocess.run(
+                [self.strip_tool, "--version"],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                universal_newlines=True,
+            )
+            self._version = result.stdout.partition("\n")[0]
+        return self._version
+
+    def _key(self, file):
+        return cache_key(sha256sum(file).hex(), self.version, *STRIP_ARGS)
+
+    def _store(self, file, name):
+        """
+        Copies file into the cache under name, unless already there
+        """
+        entry = self.cache_dir / name
+        if os.path.isfile(entry):
+            return
+        fd, staging = tempfile.mkstemp(prefix=".staging-", dir=self.cache_dir)
+        os.close(fd)
+        try:
+            shutil.copyfile(file, staging)
+            os.replace(staging, entry)
+        finally:
+            if os.path.exists(staging):
+                os.remove(staging)
+
+    def _keep_mtime(self, key, file):
+        """
+        Gives file the mtime of the cached file of key, so that restoring
+        it again leaves the archive manifests unchanged
+        """
+        stat = os.stat(self.cache_dir / key)
+        os.utime(file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    def _mark_unchanged(self, key):
+        open(self.cache_dir / f"{key}{UNCHANGED_SUFFIX}", "w").close()
+
+    def strip_file(self, file):
+        """
+        Strips file in place and returns the number of bytes saved
+        """
+        size = os.path.getsize(file)
+        key = None
+        if self.cache_dir:
+            key = self._key(file)
+            if os.path.isfile(self.cache_dir / f"{key}{UNCHANGED_SUFFIX}"):
+                return 0
+            if os.path.isfile(self.cache_dir / key):
+                shutil.copyfile(self.cache_dir / key, file)
+                self._keep_mtime(key, file)
+                return size - os.path.getsize(file)
+
+        stripped = f"{file}.strip"
+        result = subprocess.run(
+            [self.strip_tool] + STRIP_ARGS + ["-o", stripped, file],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        if result.returncode != 0 or os.path.getsize(stripped) >= size:
+            if os.path.exists(stripped):
+                os.remove(stripped)
+            if key and result.returncode == 0:
+                self._mark_unchanged(key)
+            return 0
+
+        shutil.copymode(file, stripped)
+        os.replace(stripped, file)
+        if key:
+            self._store(file, key)
+            self._keep_mtime(key, file)
+            # stripping the stripped file again would not shrink it
+            self._mark_unchanged(self._key(file))
+        return size - os.path.getsize(file)
+
+    def strip(self):
+        """
+        Strips every native extension under install_path
+
+        Returns dict of path relative to install_path to bytes saved.
+        """
+        return {
+            os.path.relpath(file, self.install_path): self.strip_file(file)
+            for file in native_extensions(self.install_path)
+        }
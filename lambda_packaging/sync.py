@@ -0,0 +1,71 @@
+import json
+import os
+import shutil
+from .lockfile import canonical_name
+
+
+def pinned_version(line):
+    """
+    Returns the version of a requirement line pinned with ==
+    """
+    return line.split("==", 1)[1].split()[0].split(";")[0]
+
+
+def read_resolution(report_path):
+    """
+    Returns dict of distribution name to (version, requirement line
+    installing exactly that version) from a pip installation report, or
+    None when a distribution can't be pinned (local directories, VCS)
+    """
+    with open(report_path, "r") as f:
+        report = json.load(f)
+
+    resolution = {}
+    for item in report["install"]:
+        name = canonical_name(item["metadata"]["name"])
+        version = item["metadata"]["version"]
+        download_info = item["download_info"]
+        if not item.get("is_direct"):
+            line = f"{name}=={version}"
+        elif "archive_info" in download_info:
+            line = f"{name} @ {download_info['url']}"
+        else:
+            return None
+        resolution[name] = (version, line)
+    return dict(sorted(resolution.items()))
+
+
+def diff_distributions(installed, desired):
+    """
+    Returns (sorted names to uninstall, sorted names to install) to go
+    from the installed distributions to the desired ones
+
+    :installed: dict of distribution name to installed version
+    :desired: dict of distribution name to resolved version
+    """
+    uninstall = sorted(n for n in installed if desired.get(n) != installed[n])
+    install = sorted(n for n in desired if installed.get(n) != desired[n])
+    return uninstall, install
+
+
+def merge_tree(source, target):
+    """
+    Moves the files and folders of source into target, merging the
+    folders present in both and replacing the files
+    """
+    os.makedirs(target, exist_ok=True)
+    for entry in os.scandir(source):
+        destination = os.path.join(target, entry.name)
+        if (
+            entry.is_dir(follow_symlinks=False)
+            and os.path.isdir(destination)
+            and not os.path.islink(destination)
+        ):
+            merge_tree(entry.path, destination)
+            continue
+
+        if os.path.isdir(destination) and not os.path.islink(destination):
+            shutil.rmtree(destination)
+        elif os.path.lexists(destination):
+            os.remove(destination)
+        os.replace(entry.path, destination)
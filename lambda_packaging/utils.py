@@ -1,6 +1,7 @@
 import base64
 import hashlib
 import pulumi
+from .hashing import file_digest
 
 
 def format_resource_name(name):
@@ -30,19 +31,12 @@ def sha256sum(filename):
     Helper function that calculates the hash of a file
     using the SHA256 algorithm
 
-    Inspiration:
-    https://stackoverflow.com/a/44873382
+    Large files are memory-mapped, see hashing.file_digest.
 
     NB: we're deliberately using `digest` instead of `hexdigest` in order to
     mimic Terraform.
     """
-    h = hashlib.sha256()
-    b = bytearray(128 * 1024)
-    mv = memoryview(b)
-    with open(filename, "rb", buffering=0) as f:
-        for n in iter(lambda: f.readinto(mv), 0):
-            h.update(mv[:n])
-    return h.digest()
+    return file_digest(filename)
 
 
 def filebase64sha256(filename):
@@ -55,3 +49,63 @@ def filebase64sha256(filename):
     h = sha256sum(filename)
     b = base64.b64encode(h)
     return b.decode()
+
+
+class HashingWriter:
+    """
+    Wraps a binary file and computes the SHA256 of its content while it is written
+
+    Bytes already present before the first write (e.g. when appending to an
+    archive) are read back once and hashed. Rewriting already hashed bytes
+    invalidates the hash, in which case base64digest() returns None.
+    """
+
+    def __init__(self, fp):
+        self.fp = fp
+        self._hash = hashlib.sha256()
+        self._hashed = 0
+        self._valid = True
+
+    def __getattr__(self, name):
+        return getattr(self.fp, name)
+
+    def _hash_existing(self, end):
+        """Hashes the file bytes between the hashed length and end"""
+        position = self.fp.tell()
+        self.fp.seek(self._hashed)
+        while self._hashed < end:
+            chunk = self.fp.read(min(128 * 1024, end - self._hashed))
+            if not chunk:
+                break
+            self._hash.update(chunk)
+            self._hashed += len(chunk)
+        self.fp.seek(position)
+
+    def write(self, data):
+        position = self.fp.tell()
+        if position < self._hashed:
+            self._valid = False
+        elif position > self._hashed and self._valid:
+            self._hash_existing(position)
+
+        written = self.fp.write(data)
+        if self._valid:
+            self._hash.update(data)
+            self._hashed += written
+        return written
+
+    def truncate(self, size=None):
+        size = self.fp.truncate(size)
+        if size < self._hashed:
+            self._valid = False
+        return size
+
+    def base64digest(self):
+        """
+        Returns the Base64-encoded SHA256 hash of the whole file, like filebase64sha256
+        """
+        if not self._valid:
+            return None
+        self.fp.flush()
+        self._hash_existing(self.fp.seek(0, 2))
+        return base64.b64encode(self._hash.digest()).decode()
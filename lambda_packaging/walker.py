@@ -0,0 +1,149 @@
+import fnmatch
+import os
+import re
+
+
+def translate_segment(segment):
+    """
+    Translates a glob path segment into a regex which doesn't cross "/"
+    """
+    i, n = 0, len(segment)
+    regex = "" if segment.startswith(".") else r"(?!\.)"
+    while i < n:
+        c = segment[i]
+        i += 1
+        if c == "*":
+            regex += "[^/]*"
+        elif c == "?":
+            regex += "[^/]"
+        elif c == "[":
+            j = i
+            if j < n and segment[j] == "!":
+                j += 1
+            if j < n and segment[j] == "]":
+                j += 1
+            while j < n and segment[j] != "]":
+                j += 1
+            if j >= n:
+                regex += r"\["
+                continue
+            chars = segment[i:j].replace("\\", r"\\")
+            # escape nested sets and set operations like fnmatch.translate,
+            # which future versions of re may interpret
+            chars = re.sub(r"([\[&~|])", r"\\\1", chars)
+            if chars.startswith("!"):
+                chars = "^" + chars[1:]
+            elif chars.startswith("^"):
+                chars = "\\" + chars
+            regex += f"[{chars}]"
+            i = j + 1
+        else:
+            regex += re.escape(c)
+    return regex
+
+
+def translate_glob(pattern):
+    """
+    Translates a recursive glob pattern into a regex matching relative file paths
+
+    Follows glob.glob(recursive=True) semantics: "**" matches any number of
+    directories, and wildcards don't match hidden names starting with ".".
+    """
+    segments = pattern.split("/")
+    regex = ""
+    for i, segment in enumerate(segments):
+        if segment == "**" and i == len(segments) - 1:
+            regex += r"(?!\.)[^/]+(?:/(?!\.)[^/]+)*"
+        elif segment == "**":
+            regex += r"(?:(?!\.)[^/]+/)*"
+        else:
+            regex += translate_segment(segment)
+            if i < len(segments) - 1:
+                regex += "/"
+    return regex
+
+
+class PathMatcher:
+    """
+    Precompiled matcher of a list of glob patterns against relative paths
+    """
+
+    def __init__(self, patterns):
+        self.patterns = [str(p) for p in patterns]
+        self.regex = re.compile(
+            "|".join(f"(?:{translate_glob(p)})" for p in self.patterns) or "(?!)",
+        )
+
+        # "dir/**" patterns match everything below the directories matching "dir"
+        prefixes = [p[: -len("/**")] for p in self.patterns if p.endswith("/**")]
+        self.prune_regex = re.compile(
+            "|".join(f"(?:{translate_glob(p)})" for p in prefixes) or "(?!)"
+        )
+        self.hidden = any(
+            segment.startswith(".") for p in self.patterns for segment in p.split("/")
+        )
+
+    def match(self, path):
+        """Returns True when the relative path matches any pattern"""
+        return self.regex.fullmatch(path) is not None
+
+    def matches_all_below(self, path):
+        """Returns True when every path below the relative directory matches"""
+        return self.prune_regex.fullmatch(path) is not None
+
+
+class IgnoreMatcher:
+    """
+    Precompiled union of fnmatch patterns tested against full paths
+    """
+
+    def __init__(self, patterns):
+        self.regex = re.compile(
+            "|".join(fnmatch.translate(p) for p in patterns) or "(?!)"
+        )
+
+    def match(self, path):
+        return self.regex.match(os.fspath(path)) is not None
+
+    def matches_all_below(self, path):
+        # patterns ending with a wildcard match whatever follows the directory
+        return self.regex.match(os.path.join(os.fspath(path), "\0")) is not None
+
+
+def walk_files(root, include=("**",), exclude=(), ignore=None):
+    """
+    Returns the sorted list of files below root matching include and not exclude
+
+    Directories are walked once with os.scandir. Excluded and ignored
+    directories are pruned before descending into them, and hidden ones
+    are skipped unless an include pattern names them.
+    """
+    include = PathMatcher(include)
+    exclude = PathMatcher(exclude)
+    root = os.fspath(root)
+    prefix = "" if root == "." else os.path.join(root, "")
+
+    files = []
+    stack = [""]
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = os.scandir(prefix + directory if directory else root)
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                path = directory + entry.name
+                if entry.name.startswith(".") and not include.hidden:
+                    continue
+                if ignore and ignore.match(prefix + path):
+                    if not entry.is_dir() or ignore.matches_all_below(prefix + path):
+                        continue
+                if entry.is_dir():
+                    if not exclude.matches_all_below(path):
+                        stack.append(path + "/")
+                elif (
+                    entry.is_file() and include.match(path) and not exclude.match(path)
+                ):
+                    files.append(prefix + path)
+    return sorted(files)
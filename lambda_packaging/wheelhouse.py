@@ -0,0 +1,90 @@
+import json
+import os
+from pathlib import Path
+
+# Path of the wheelhouse inside builder containers
+CONTAINER_WHEELHOUSE = "/wheelhouse"
+
+# Folder of the markers of the requirements whose wheels are built
+KEYS_FOLDER = ".keys"
+
+
+def wheel_args(requirements_file, wheel_dir):
+    """
+    Returns pip arguments building or collecting the wheels of
+    requirements_file and their dependencies into wheel_dir
+    """
+    return [
+        "wheel",
+        "-r",
+        requirements_file,
+        "--wheel-dir",
+        wheel_dir,
+        "--find-links",
+        wheel_dir,
+    ]
+
+
+def offline_install_args(requirements_file, wheel_dir, target):
+    """
+    Returns pip arguments installing requirements_file from wheel_dir only
+    """
+    return [
+        "install",
+        "--no-index",
+        "--find-links",
+        wheel_dir,
+        "-r",
+        requirements_file,
+        "--target",
+        target,
+    ]
+
+
+class Wheelhouse:
+    """
+    Shared directory of wheels built once for sets of requirements.
+
+    Wheels of every set live side by side, so that a wheel is built or
+    downloaded once and reused by every set depending on it. A marker
+    named after the requirements key records the sets whose wheels are
+    all present, which are then installed without reaching the index.
+    """
+
+    def __init__(self, wheelhouse_dir):
+        self.path = Path(os.path.abspath(wheelhouse_dir))
+
+        if not os.path.isdir(self.path / KEYS_FOLDER):
+            os.makedirs(self.path / KEYS_FOLDER, exist_ok=True)
+
+    def marker_path(self, key):
+        """Return path of the marker of a requirements key"""
+        return self.path / KEYS_FOLDER / key
+
+    def is_built(self, key):
+        """
+        Returns True when the wheels of the requirements of key are present
+        """
+        return os.path.isfile(self.marker_path(key))
+
+    def mark_built(self, key, requirements):
+        """
+        Records that the wheels of the requirements of key are present
+        """
+        with open(self.marker_path(key), "w") as f:
+            json.dump(sorted(requirements.values()), f)
+
+    def unmark_built(self, key):
+        """
+        Forgets that the wheels of the requirements of key are present
+        """
+        try:
+            os.remove(self.marker_path(key))
+        except FileNotFoundError:
+            pass
+
+    def wheels(self):
+        """
+        Returns sorted list of the wheel file names of the wheelhouse
+        """
+        return sorted(name for name in os.listdir(self.path) if name.endswith(".whl"))
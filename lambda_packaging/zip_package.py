@@ -1,20 +1,50 @@
 import zipfile
 import glob
+import functools
+import json
 import os
 import pulumi
 from os import path
 import stat
+import sys
 from pathlib import Path
-import fnmatch
-from .utils import format_resource_name, format_file_name
+from contextlib import contextmanager
+from .utils import (
+    format_resource_name,
+    format_file_name,
+    filebase64sha256,
+    HashingWriter,
+)
+from .cache import cache_key
+from .manifest import ArchiveManifest
+from .walker import walk_files, IgnoreMatcher
+from .compression import (
+    compress_file,
+    compress_data,
+    write_member,
+    ordered_map,
+    ArchiveReader,
+    check_profile,
+    profile_settings,
+    DEFAULT_PROFILE,
+)
+from .bytecode import runtime_cache_tag, cache_path, compile_source
+from .profiler import Profiler
 
 # Files pattern to ignore for deterministic zip archive
 IGNORE_PATTERNS = ["*.py[c|o]", "*/__pycache__*", "__pycache__*", "*.dist-info*"]
 
+# Compiled union of IGNORE_PATTERNS
+IGNORE_MATCHER = IgnoreMatcher(IGNORE_PATTERNS)
+
 # Constand DateTime
 CONST_DATETIME = (2020, 1, 1, 0, 0, 0)
 
 
+def _build_member(build, file, zip_info):
+    return build(file, zip_info)
+
+
 class ZipPackage:
     """
     Creates Zip archive and injects requirements into the zip archive.
@@ -28,8 +58,18 @@ class ZipPackage:
         exclude=[],
         target_folder="dist/",
         install_folder="requirements/",
+        incremental=False,
+        workers=1,
+        compile_bytecode=False,
+        runtime=None,
+        profiler=None,
+        compression=DEFAULT_PROFILE,
+        patch=False,
+        member_store=None,
     ):
+        check_profile(compression)
         self.resource_name = resource_name
+        self.profiler = profiler or Profiler(resource_name)
         self.project_root = Path(project_root)
         self.target_folder = Path(target_folder)
         self.install_folder = self.target_folder / install_folder
@@ -38,6 +78,24 @@ class ZipPackage:
         self.include = include.copy()
         self.exclude = exclude.copy()
         self.install_path = self.project_root / self.install_folder
+        self.incremental = incremental
+        self.workers = workers
+        self.compression = compression
+        self.patch = patch
+        self.member_store = member_store
+
+        # bytecode is only compiled when the interpreter matches the runtime
+        self.cache_tag = None
+        if compile_bytecode:
+            self.cache_tag = runtime_cache_tag(runtime)
+            if self.cache_tag is None:
+                pulumi.log.warn(
+                    f"{resource_name}: bytecode can't be compiled for {runtime} "
+                    f"with python{sys.version_info.major}.{sys.version_info.minor}"
+                )
+        self.hashes = {}
+        # (reader of the previous archive, sources unchanged since) by archive
+        self.previous_archives = {}
 
         self.exclude.append(self.target_folder / "**")
         self.installed_requirements = self.project_root / self.install_folder
@@ -66,84 +124,339 @@ class ZipPackage:
         """
         self.exclude = [str(Path(p)) for p in self.exclude]
         self.include = [str(Path(p)) for p in self.include]
-        self.exclude_files = self._match_glob_files(self.exclude)
-        self.include_files = self._match_glob_files(self.include)
 
-        filtered_package = []
-        if "**" in self.exclude and "**" not in self.include:
-            filtered_package = set(self.include_files)
-        elif "**" not in self.exclude:
-            filtered_package = set(self.include_files) - set(self.exclude_files)
-        return list(filtered_package)
+        # files are returned sorted from a single walk of the project,
+        # pruning excluded directories before descending into them
+        with self.profiler.phase("filter_package") as record:
+            files = []
+            if "**" in self.exclude and "**" not in self.include:
+                files = walk_files(
+                    self.project_root, self.include, ignore=IGNORE_MATCHER
+                )
+            elif "**" not in self.exclude:
+                files = walk_files(
+                    self.project_root, self.include, self.exclude, ignore=IGNORE_MATCHER
+                )
+            record["files"] = len(files)
+        return files
+
+    def archive_hash(self, zip_path):
+        """
+        Returns the Base64-encoded SHA256 hash of an archive, reusing the hash
+        computed while writing it or recorded in its manifest when available.
+        Archives built elsewhere fall back to reading them with filebase64sha256.
+        """
+        if str(zip_path) not in self.hashes:
+            with self.profiler.phase(
+                "archive_hash", archive=os.path.basename(zip_path)
+            ) as record:
+                self.hashes[str(zip_path)] = filebase64sha256(zip_path)
+                record["files"] = 1
+                record["bytes_read"] = os.path.getsize(zip_path)
+        return self.hashes[str(zip_path)]
 
     def zip_package(self, requirements=True):
         """
         Creates zip archive of file and folders
         and inject requirements into the zip package when "requirements=True"
         """
-        self._add_files(self.zip_path, self.filter_package(), "w", self.project_root)
+        files = self.filter_package()
+        sources = [(files, self.project_root)]
         if requirements:
-            self._inject_requirements()
+            sources.append((self._requirement_files(), self.installed_requirements))
+
+        with self._incremental_build(self.zip_path, sources) as changed:
+            if changed:
+                self._add_files(self.zip_path, files, "w", self.project_root)
+                if requirements:
+                    self._inject_requirements()
         return self.zip_path
 
     def zip_requirements(self):
         """
         Creates zip archive of dependencies requirements
         """
-        requirement_files = glob.glob(
-            os.path.join(self.installed_requirements, "**"), recursive=True
-        )
+        requirement_files = self._requirement_files()
         requirements_zip_path = self.get_path(
             format_file_name(self.resource_name, "requirements.zip")
         )
-        self._add_files(
-            requirements_zip_path,
-            requirement_files,
-            base_path=self.installed_requirements,
-        )
+        sources = [(requirement_files, self.installed_requirements)]
+
+        with self._incremental_build(requirements_zip_path, sources) as changed:
+            if changed:
+                self._add_files(
+                    requirements_zip_path,
+                    requirement_files,
+                    base_path=self.installed_requirements,
+                )
         return requirements_zip_path
 
+    def zip_requirement_layers(self, layers):
+        """
+        Creates one zip archive of dependencies per layer
+
+        :layers: dict of layer name to its installed requirements files
+        Returns dict of layer name to archive path.
+        """
+        archives = {}
+        for name, files in layers.items():
+            zip_path = self.get_path(
+                format_file_name(self.resource_name, f"requirements-{name}.zip")
+            )
+            sources = [(files, self.installed_requirements)]
+
+            with self._incremental_build(zip_path, sources) as changed:
+                if changed:
+                    self._add_files(
+                        zip_path, files, base_path=self.installed_requirements
+                    )
+            archives[name] = zip_path
+        return archives
+
+    def _requirement_files(self):
+        """
+        Returns sorted list of installed requirements files
+        """
+        with self.profiler.phase("requirement_files") as record:
+            files = walk_files(self.installed_requirements, ignore=IGNORE_MATCHER)
+            record["files"] = len(files)
+        return files
+
+    def _archive_entries(self, files, base_path):
+        """
+        Returns (file, arcname) of the files written into an archive by _add_files
+        """
+        return [
+            (file, os.path.relpath(file, base_path))
+            for file in filter(self.is_file_allowed, sorted(files))
+            if os.path.isfile(file)
+        ]
+
+    @contextmanager
+    def _incremental_build(self, zip_path, sources):
+        """
+        Yields whether the archive has to be (re)built from the sources,
+        a list of (files, base_path), and records its manifest afterwards.
+
+        Archives are always rebuilt when "incremental=False". With "patch=True",
+        the compressed members of unchanged sources are copied from the
+        previous archive while it is rebuilt.
+        """
+        if not self.incremental:
+            yield True
+            return
+
+        with self.profiler.phase(
+            "manifest", archive=os.path.basename(zip_path)
+        ) as record:
+            manifest = ArchiveManifest(zip_path)
+            previous = manifest.load()
+            entries = [
+                entry
+                for files, base_path in sources
+                for entry in self._archive_entries(files, base_path)
+            ]
+            settings = {
+                "datetime": CONST_DATETIME,
+                "ignore": IGNORE_PATTERNS,
+                "bytecode": self.cache_tag,
+                "compression": profile_settings(self.compression),
+            }
+            current = manifest.snapshot(entries, settings, previous)
+            record["files"] = len(entries)
+            record["unchanged"] = manifest.matches(previous, current)
+
+        if record["unchanged"]:
+            self.hashes[str(zip_path)] = previous["archive"]["hash"]
+            yield False
+            return
+
+        unchanged = set()
+        if self.patch:
+            unchanged = manifest.unchanged_sources(previous, current)
+        self.hashes.pop(str(zip_path), None)
+        if not unchanged:
+            yield True
+            manifest.save(current, self.archive_hash(zip_path))
+            return
+
+        # the previous archive is moved aside to read it while rebuilding
+        previous_path = f"{zip_path}.previous"
+        os.replace(zip_path, previous_path)
+        reader = ArchiveReader(previous_path)
+        self.previous_archives[str(zip_path)] = (reader, unchanged)
+        try:
+            yield True
+        finally:
+            del self.previous_archives[str(zip_path)]
+            reader.close()
+            os.remove(previous_path)
+        manifest.save(current, self.archive_hash(zip_path))
+
     def _add_files(self, zip_path, files, mode="w", base_path=""):
         """
         Utility function to add new files in existing/new zip and create deterministic zip
 
         Reference: https://github.com/bboe/deterministic_zip#how-does-it-work
         """
-        zip_file = zipfile.ZipFile(zip_path, mode)
-
         # sort files to preserve the order
+        compress = self._reusing(
+            zip_path,
+            self._storing(functools.partial(compress_file, profile=self.compression)),
+        )
+        members = []
         for file in filter(self.is_file_allowed, sorted(files)):
-            zip_path = os.path.relpath(file, base_path)
+            arcname = os.path.relpath(file, base_path)
 
-            zip_info = zipfile.ZipInfo.from_file(file, zip_path)
+            zip_info = zipfile.ZipInfo.from_file(file, arcname)
 
             # set consistent date info for the file
             zip_info.date_time = CONST_DATETIME
 
             if os.path.isfile(file):
-                with open(file, "rb") as fp:
-                    zip_file.writestr(
-                        zip_info, fp.read(), compress_type=zipfile.ZIP_DEFLATED
-                    )
+                members.append((compress, file, zip_info))
+
+        # unchecked hash-based pycs of the python sources follow the files
+        if self.cache_tag:
+            compile_member = self._reusing(
+                zip_path,
+                self._storing(self._compile_member, self._pyc_info),
+                self._pyc_info,
+            )
+            for _, file, zip_info in list(members):
+                if str(file).endswith(".py"):
+                    members.append((compile_member, file, zip_info))
+
+        # the archive hash is computed over the bytes as they are written
+        file_mode = "r+b" if mode == "a" and os.path.isfile(zip_path) else "w+b"
+        with self.profiler.phase(
+            "add_files", archive=os.path.basename(zip_path)
+        ) as record, open(zip_path, file_mode) as fp:
+            initial_size = os.fstat(fp.fileno()).st_size
+            writer = HashingWriter(fp)
+            zip_file = zipfile.ZipFile(writer, mode)
+
+            # files are streamed in chunks and compressed by "workers" threads,
+            # then written in the sorted order
+            if self.workers > 1:
+                compressed = ordered_map(_build_member, members, self.workers)
+            else:
+                compressed = (_build_member(*member) for member in members)
+            reused = 0
+            for member in compressed:
+                if member:
+                    reused += member.reused
+                    write_member(zip_file, member)
+
+            zip_file.close()
+            archive_hash = writer.base64digest()
+
+            record["files"] = len(members)
+            record["bytes_read"] = sum(
+                zip_info.file_size for build, _, zip_info in members
+            )
+            record["bytes_written"] = fp.tell() - initial_size
+            record["reused"] = reused
+
+        if archive_hash:
+            self.hashes[str(zip_path)] = archive_hash
+        else:
+            self.hashes.pop(str(zip_path), None)
+
+        if self.member_store:
+            self.member_store.digests.save()
+            if reused < len(members):
+                self.member_store.evict()
+
+    def _reusing(self, zip_path, build, member_info=None):
+        """
+        Returns build, copying instead the members of unchanged sources from
+        the previous archive of zip_path when it is being patched
+
+        :member_info: returns the ZipInfo of the member built from a source
+                      ZipInfo, when they differ
+        """
+        if str(zip_path) not in self.previous_archives:
+            return build
+        reader, unchanged = self.previous_archives[str(zip_path)]
+
+        def reuse(file, zip_info):
+            member = None
+            if str(file) in unchanged:
+                member = reader.copy_member(
+                    member_info(zip_info) if member_info else zip_info
+                )
+            return member or build(file, zip_info)
 
-        zip_file.close()
+        return reuse
+
+    def _storing(self, build, member_info=None):
+        """
+        Returns build, copying instead the compressed members found in
+        member_store and storing the ones it builds
+
+        Members are keyed by the content hash of their source, the
+        compression settings and the name of the member for pycs, whose
+        code depends on it, or its extension for files, which the
+        compression profile may depend on.
+        """
+        if not self.member_store:
+            return build
+
+        settings = json.dumps(profile_settings(self.compression))
+
+        def store(file, zip_info):
+            if member_info:
+                name = member_info(zip_info).filename
+            else:
+                name = os.path.splitext(zip_info.filename)[1].lower()
+            key = cache_key(
+                self.member_store.digests.digest(file).hex(), settings, name
+            )
+
+            member = self.member_store.get(
+                key, member_info(zip_info) if member_info else zip_info
+            )
+            if member:
+                return member
+            member = build(file, zip_info)
+            if member and member.zip_info.compress_type != zipfile.ZIP_STORED:
+                self.member_store.put(key, member)
+            return member
+
+        return store
+
+    def _pyc_info(self, source_info):
+        """
+        Returns the ZipInfo of the pyc of a python source member
+        """
+        zip_info = zipfile.ZipInfo(
+            cache_path(source_info.filename, self.cache_tag),
+            date_time=CONST_DATETIME,
+        )
+        zip_info.external_attr = source_info.external_attr
+        return zip_info
+
+    def _compile_member(self, file, source_info):
+        """
+        Returns the compressed pyc member of a python source, None if it can't compile
+        """
+        data = compile_source(file, source_info.filename)
+        if data is None:
+            return None
+        return compress_data(data, self._pyc_info(source_info), self.compression)
 
     def is_file_allowed(self, file_name):
         """
         Ignore dynamic & redundant files/folders for deterministic zip archive
         """
-        for pattern in IGNORE_PATTERNS:
-            if fnmatch.fnmatch(Path(file_name), pattern):
-                return False
-        return True
+        return not IGNORE_MATCHER.match(file_name)
 
     def _inject_requirements(self):
         """
         Inject requirements into the package archive.
         """
-        requirement_files = glob.glob(
-            str(self.installed_requirements / "**"), recursive=True
-        )
+        requirement_files = self._requirement_files()
         self._add_files(
             zip_path=self.zip_path,
             files=requirement_files,
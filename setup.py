@@ -7,7 +7,6 @@ with open("README.md", encoding="utf-8") as f:
 install_requires = [
     "pulumi==1.8.1",
     "pulumi_aws==1.17.0",
-    "pulumi_docker",
     "requirements-parser",
 ]
 
@@ -19,7 +18,7 @@ setup(
     long_description=long_description,
     long_description_content_type="text/markdown",
     url="https://github.com/nuage-studio/lambda-packaging",
-    packages=find_packages(exclude=("tests", "example")),
+    packages=find_packages(exclude=("tests", "example", "benchmarks")),
     zip_safe=True,
     install_requires=install_requires,
 )
@@ -0,0 +1,73 @@
+from unittest import TestCase
+from lambda_packaging.bytecode import (
+    runtime_cache_tag,
+    cache_path,
+    compile_source,
+)
+import importlib
+import tempfile
+import shutil
+import sys
+import os
+
+CURRENT_RUNTIME = f"python{sys.version_info.major}.{sys.version_info.minor}"
+
+
+class TestBytecode(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.source = os.path.join(self.tmp, "lp_bytecode_sample.py")
+        with open(self.source, "w") as f:
+            f.write("VALUE = 'compiled'\n")
+
+    def test_runtime_cache_tag(self):
+        self.assertEqual(
+            runtime_cache_tag(CURRENT_RUNTIME), sys.implementation.cache_tag
+        )
+        self.assertIsNone(runtime_cache_tag("python2.7"))
+
+    def test_cache_path(self):
+        self.assertEqual(
+            cache_path("pkg/module.py", "cpython-38"),
+            "pkg/__pycache__/module.cpython-38.pyc",
+        )
+        self.assertEqual(
+            cache_path("module.py", "cpython-38", optimize=2),
+            "__pycache__/module.cpython-38.opt-2.pyc",
+        )
+
+    def test_compile_source(self):
+        data = compile_source(self.source, "lp_bytecode_sample.py")
+
+        # verify the output is deterministic and an unchecked hash-based pyc
+        self.assertEqual(data, compile_source(self.source, "lp_bytecode_sample.py"))
+        self.assertEqual(data[:4], importlib.util.MAGIC_NUMBER)
+        self.assertEqual(int.from_bytes(data[4:8], "little"), 0b01)
+
+        with open(self.source, "w") as f:
+            f.write("VALUE = (\n")
+        self.assertIsNone(compile_source(self.source, "lp_bytecode_sample.py"))
+
+    def test_compiled_bytecode_is_imported(self):
+        data = compile_source(self.source, "lp_bytecode_sample.py")
+        pyc = os.path.join(
+            self.tmp, cache_path("lp_bytecode_sample.py", sys.implementation.cache_tag)
+        )
+        os.makedirs(os.path.dirname(pyc))
+        with open(pyc, "wb") as f:
+            f.write(data)
+
+        # unchecked pycs are used even when the source changes
+        with open(self.source, "w") as f:
+            f.write("VALUE = 'source'\n")
+
+        sys.path.insert(0, self.tmp)
+        try:
+            module = importlib.import_module("lp_bytecode_sample")
+            self.assertEqual(module.VALUE, "compiled")
+        finally:
+            sys.path.remove(self.tmp)
+            sys.modules.pop("lp_bytecode_sample", None)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
@@ -0,0 +1,119 @@
+from unittest import TestCase
+from lambda_packaging.cache import (
+    RequirementsCache,
+    cache_key,
+    directory_size,
+    evict_lru,
+    requirements_key,
+)
+from unittest.mock import patch
+from pathlib import Path
+import tempfile
+import shutil
+import os
+
+
+class TestRequirementsCache(TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.cache = RequirementsCache(self.tmp / "cache", max_size=1024)
+
+        # sample installed requirements tree
+        self.install_path = self.tmp / "requirements"
+        os.makedirs(self.install_path / "package")
+        with open(self.install_path / "package" / "__init__.py", "w") as f:
+            f.write("x" * 100)
+
+    def test_cache_key(self):
+        self.assertEqual(cache_key("a", "b"), cache_key("a", "b"))
+        self.assertNotEqual(cache_key("a", "b"), cache_key("ab"))
+
+    def test_key(self):
+        requirements = {"requests": "requests==2.23.0", "six": "six"}
+        key = requirements_key(requirements, "python3.8")
+
+        # key does not depend on requirements order
+        self.assertEqual(
+            key,
+            requirements_key(dict(reversed(list(requirements.items()))), "python3.8"),
+        )
+        self.assertNotEqual(key, requirements_key(requirements, "python3.7"))
+        self.assertNotEqual(
+            key, requirements_key(requirements, "python3.8", "lambci/lambda")
+        )
+
+    def test_key_host_platform(self):
+        requirements = {"numpy": "numpy==1.18.4"}
+        key = requirements_key(requirements, "python3.8")
+        docker_key = requirements_key(requirements, "python3.8", "lambci/lambda")
+
+        # verify host installs of another interpreter don't share entries,
+        # unlike docker installs
+        with patch(
+            "lambda_packaging.cache.host_platform", return_value="cpython-38-macosx"
+        ):
+            self.assertNotEqual(key, requirements_key(requirements, "python3.8"))
+            self.assertEqual(
+                docker_key, requirements_key(requirements, "python3.8", "lambci/lambda")
+            )
+
+    def test_get_and_put(self):
+        self.assertFalse(self.cache.get("key", self.tmp / "restored"))
+
+        self.cache.put("key", self.install_path)
+        self.assertTrue(self.cache.get("key", self.tmp / "restored"))
+        self.assertTrue(
+            os.path.isfile(self.tmp / "restored" / "package" / "__init__.py")
+        )
+
+    def test_get_replaces_stale_install_folder(self):
+        self.cache.put("key", self.install_path)
+
+        with open(self.install_path / "stale.py", "w") as f:
+            f.write("")
+        self.cache.get("key", self.install_path)
+        self.assertFalse(os.path.exists(self.install_path / "stale.py"))
+
+    def test_get_skips_unchanged_install_folder(self):
+        self.cache.put("key", self.install_path)
+        restored = self.tmp / "restored"
+        self.cache.get("key", restored)
+
+        # verify a folder holding the entry is not copied again
+        with patch("lambda_packaging.cache.shutil.copytree") as copytree:
+            self.assertTrue(self.cache.get("key", restored))
+            copytree.assert_not_called()
+
+        # verify a folder transformed after the restore is only kept for
+        # the variant it was recorded with
+        os.remove(restored / "package" / "__init__.py")
+        self.cache.record("key", restored, "pruned")
+        with patch("lambda_packaging.cache.shutil.copytree") as copytree:
+            self.assertTrue(self.cache.get("key", restored, "pruned"))
+            copytree.assert_not_called()
+        self.assertTrue(self.cache.get("key", restored, "other"))
+        self.assertTrue(os.path.isfile(restored / "package" / "__init__.py"))
+
+    def test_evict(self):
+        self.cache.max_size = 150
+        self.cache.put("first", self.install_path)
+        os.utime(self.cache.entry_path("first") / ".entry.json", (0, 0))
+        self.cache.put("second", self.install_path)
+
+        # least recently used entry is evicted
+        self.assertFalse(os.path.exists(self.cache.entry_path("first")))
+        self.assertTrue(os.path.exists(self.cache.entry_path("second")))
+
+    def test_evict_lru(self):
+        entries = [
+            (self.tmp / "a", 10, 3),
+            (self.tmp / "b", 10, 1),
+            (self.tmp / "c", 10, 2),
+        ]
+        self.assertEqual(evict_lru(entries, 10), [self.tmp / "b", self.tmp / "c"])
+
+    def test_directory_size(self):
+        self.assertEqual(directory_size(self.install_path), 100)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
@@ -1,8 +1,12 @@
 from unittest import TestCase
 from unittest.mock import patch, MagicMock
-from lambda_packaging.components import LambdaPackage
+from lambda_packaging.components import LambdaPackage, LambdaPackageGroup
+from lambda_packaging.zip_package import ZipPackage
+from lambda_packaging.utils import filebase64sha256
+from lambda_packaging.pruning import PackageSizeError
 import pulumi
 import shutil
+import threading
 from pathlib import Path
 
 class ResourceMock(pulumi.runtime.Mocks):
@@ -109,6 +113,244 @@ class TestComponents(TestCase):
                 # verify archive hash not equal to detenmined hash
                 self.assertNotEqual(lambda_package.package_hash, test_hash_2)
 
+    @pulumi.runtime.test
+    def test_lambda_package_asynchronous(self):
+        with patch("lambda_packaging.components.os") as mock_os:
+            with patch(
+                "lambda_packaging.components.PipRequirements.install_requirements"
+            ):
+                mock_os.path.dirname.return_value = Path("tests/data")
+                lambda_package = LambdaPackage(
+                    name="example-test",
+                    layer=True,
+                    exclude=["**/requirements*.txt"],
+                    requirements_path="requirements_test_1.txt",
+                    asynchronous=True,
+                )
+
+        # verify archives and hashes are exposed as outputs
+        self.assertIsInstance(lambda_package.package_hash, pulumi.Output)
+        self.assertIsInstance(lambda_package.layer_hash, pulumi.Output)
+
+        def check_outputs(args):
+            package_archive, package_hash, layer_archive, layer_hash = args
+            self.assertEqual(
+                package_archive, "tests/data/dist/stack-example-test-lambda.zip"
+            )
+            self.assertEqual(package_hash, filebase64sha256(package_archive))
+            self.assertEqual(layer_hash, filebase64sha256(layer_archive))
+
+        return pulumi.Output.all(
+            lambda_package.package_archive,
+            lambda_package.package_hash,
+            lambda_package.layer_archive_path,
+            lambda_package.layer_hash,
+        ).apply(check_outputs)
+
+    def test_lambda_package_max_layers(self):
+        # verify more layers than lambda allows are rejected before packaging
+        with patch("lambda_packaging.components.PipRequirements") as mock_pip:
+            with self.assertRaises(ValueError):
+                LambdaPackage(name="example-test", layer=True, max_layers=8)
+            mock_pip.assert_not_called()
+
+    @pulumi.runtime.test
+    def test_lambda_package_size_check(self):
+        with patch("lambda_packaging.components.os") as mock_os:
+            with patch(
+                "lambda_packaging.components.PipRequirements.install_requirements"
+            ):
+                mock_os.path.dirname.return_value = Path("tests/data")
+                with patch("lambda_packaging.pruning.LAMBDA_ZIPPED_LIMIT", 10):
+                    # verify packages above the lambda limits are rejected
+                    with self.assertRaises(PackageSizeError):
+                        LambdaPackage(
+                            name="example-test",
+                            exclude=["requirements*.txt"],
+                            requirements_path="requirements_test_1.txt",
+                            prune=["tests", "runtime"],
+                            check_size=True,
+                        )
+
+                lambda_package = LambdaPackage(
+                    name="example-test",
+                    exclude=["requirements*.txt"],
+                    requirements_path="requirements_test_1.txt",
+                    prune=["tests", "runtime"],
+                    check_size=True,
+                )
+                self.assertEqual(lambda_package.size_report, {})
+
+    @pulumi.runtime.test
+    def test_lambda_package_group(self):
+        with patch("lambda_packaging.components.os") as mock_os:
+            with patch(
+                "lambda_packaging.components.PipRequirements.install_requirements"
+            ) as mock_install:
+                mock_os.path.dirname.return_value = Path("tests/data")
+                group = LambdaPackageGroup(
+                    name="example-group",
+                    functions={
+                        "function-1": {"include": ["test_files/*.py"]},
+                        "function-2": {"include": ["test_files/test_nest/**"]},
+                        "function-3": {
+                            "include": ["*.py"],
+                            "no_deploy": ["requests"],
+                        },
+                    },
+                    requirements_path="requirements_test_1.txt",
+                )
+
+                # verify identical requirements are installed once
+                self.assertEqual(mock_install.call_count, 2)
+                # verify grouping doesn't create the default install folder
+                self.assertFalse(Path("tests/data/dist/requirements").exists())
+                self.assertEqual(len(group.layers), 2)
+
+                packages = group.packages
+                self.assertEqual(
+                    packages["function-1"]["layer_hash"],
+                    packages["function-2"]["layer_hash"],
+                )
+                self.assertNotEqual(
+                    packages["function-1"]["layer_archive"],
+                    packages["function-3"]["layer_archive"],
+                )
+                self.assertEqual(
+                    packages["function-1"]["package_archive"],
+                    "tests/data/dist/stack-function-1-lambda.zip",
+                )
+                self.assertNotEqual(
+                    packages["function-1"]["package_hash"],
+                    packages["function-2"]["package_hash"],
+                )
+
+    @pulumi.runtime.test
+    def test_lambda_package_with_layers(self):
+        with patch("lambda_packaging.components.os") as mock_os:
+            mock_os.path.dirname.return_value = Path("tests/data")
+            lambda_package = LambdaPackage(
+                name="example-test",
+                layer=True,
+                max_layers=3,
+                volatile_requirements=["requests"],
+                exclude=["**/requirements*.txt"],
+                requirements_path="requirements_test_1.txt",
+            )
+
+            # verify volatile requirements are split from the stable ones
+            self.assertIsNone(lambda_package.layer_archive_path)
+            self.assertEqual(
+                lambda_package.layer_archives["volatile"],
+                "tests/data/dist/stack-example-test-requirements-volatile.zip",
+            )
+            self.assertIn("stable", lambda_package.layer_archives)
+            self.assertLessEqual(len(lambda_package.layer_archives), 3)
+
+            for name, archive in lambda_package.layer_archives.items():
+                self.assertEqual(
+                    lambda_package.layer_hashes[name], filebase64sha256(archive)
+                )
+
+    @pulumi.runtime.test
+    def test_lambda_package_profile(self):
+        with patch("lambda_packaging.components.os") as mock_os:
+            with patch(
+                "lambda_packaging.components.PipRequirements.install_requirements"
+            ):
+                mock_os.path.dirname.return_value = Path("tests/data")
+                lambda_package = LambdaPackage(
+                    name="example-test",
+                    layer=True,
+                    exclude=["requirements*.txt"],
+                    requirements_path="requirements_test_1.txt",
+                    profile=True,
+                )
+
+            # verify the phases of both archives are reported
+            phases = [phase["phase"] for phase in lambda_package.profile["phases"]]
+            self.assertIn("filter_package", phases)
+            self.assertEqual(phases.count("add_files"), 2)
+            self.assertTrue(
+                Path("tests/data/dist/stack-example-test-profile.json").is_file()
+            )
+
+    @pulumi.runtime.test
+    def test_lambda_package_code_archived_during_install(self):
+        zip_package = ZipPackage.zip_package
+        packaged = threading.Event()
+
+        def package_code(zip_asset, requirements=True):
+            archive = zip_package(zip_asset, requirements)
+            packaged.set()
+            return archive
+
+        def install():
+            # verify the code archive doesn't wait for the requirements
+            self.assertTrue(packaged.wait(10))
+
+        with patch("lambda_packaging.components.os") as mock_os:
+            with patch.object(ZipPackage, "zip_package", package_code):
+                with patch(
+                    "lambda_packaging.components.PipRequirements.install_requirements",
+                    side_effect=install,
+                ):
+                    mock_os.path.dirname.return_value = Path("tests/data")
+                    lambda_package = LambdaPackage(
+                        name="example-test",
+                        layer=True,
+                        exclude=["**/requirements*.txt"],
+                        requirements_path="requirements_test_1.txt",
+                    )
+
+            self.assertEqual(
+                lambda_package.package_hash,
+                filebase64sha256(lambda_package.package_archive),
+            )
+
+    @pulumi.runtime.test
+    def test_lambda_package_fast_preview(self):
+        def package():
+            return LambdaPackage(
+                name="example-test",
+                layer=True,
+                exclude=["**/requirements*.txt"],
+                requirements_path="requirements_test_1.txt",
+                fast_preview=True,
+            )
+
+        with patch("lambda_packaging.components.os") as mock_os:
+            mock_os.path.dirname.return_value = Path("tests/data")
+            with patch(
+                "lambda_packaging.components.PipRequirements.install_requirements"
+            ) as mock_install:
+                built = package()
+
+                # verify previews of unchanged inputs reuse the last build
+                with patch(
+                    "lambda_packaging.components.pulumi.runtime.is_dry_run",
+                    return_value=True,
+                ):
+                    previewed = package()
+                    mock_install.assert_called_once()
+                    self.assertEqual(previewed.package_hash, built.package_hash)
+                    self.assertEqual(previewed.layer_hash, built.layer_hash)
+
+                    # verify changed options are built
+                    with patch.object(LambdaPackage, "_build_archives") as build:
+                        build.return_value = {
+                            key: "" for key in previewed._output_keys()
+                        }
+                        LambdaPackage(
+                            name="example-test",
+                            layer=True,
+                            exclude=["**/requirements*.txt"],
+                            requirements_path="requirements_test_1.txt",
+                            fast_preview=True,
+                            compression="fast",
+                        )
+                        build.assert_called_once()
+
     def tearDown(self):
         # delete the generated files & directories after each test is run
         shutil.rmtree("tests/data/dist/", ignore_errors=True)
@@ -0,0 +1,133 @@
+from unittest import TestCase, skipUnless
+from unittest.mock import patch
+from lambda_packaging.compression import (
+    compress_file,
+    compress_data,
+    write_member,
+    ordered_map,
+    zopfli,
+    PROFILES,
+)
+from pathlib import Path
+import tempfile
+import zipfile
+import shutil
+import random
+import io
+import zlib
+
+
+class TestCompression(TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        rng = random.Random(0)
+        self.files = {
+            "empty.py": b"",
+            "text.py": b"import os\n" * 1000,
+            "binary.so": bytes(rng.getrandbits(8) for _ in range(50000)),
+        }
+        for name, data in self.files.items():
+            with open(self.tmp / name, "wb") as f:
+                f.write(data)
+
+    def _zip_info(self, name):
+        zip_info = zipfile.ZipInfo.from_file(self.tmp / name, name)
+        zip_info.date_time = (2020, 1, 1, 0, 0, 0)
+        return zip_info
+
+    def test_write_member_matches_writestr(self):
+        expected = io.BytesIO()
+        with zipfile.ZipFile(expected, "w") as zip_file:
+            for name, data in sorted(self.files.items()):
+                zip_file.writestr(
+                    self._zip_info(name), data, compress_type=zipfile.ZIP_DEFLATED
+                )
+
+        actual = io.BytesIO()
+        with zipfile.ZipFile(actual, "w") as zip_file:
+            for name in sorted(self.files):
+                write_member(
+                    zip_file, compress_file(self.tmp / name, self._zip_info(name))
+                )
+
+        self.assertEqual(actual.getvalue(), expected.getvalue())
+
+        # verify the archive content can be read back
+        with zipfile.ZipFile(actual) as zip_file:
+            self.assertIsNone(zip_file.testzip())
+            self.assertEqual(zip_file.read("text.py"), self.files["text.py"])
+
+    def test_write_member_streams_in_chunks(self):
+        # compressed data spills from memory to a temporary file
+        with patch("lambda_packaging.compression.CHUNK_SIZE", 1000):
+            with patch("lambda_packaging.compression.SPOOL_MAX_SIZE", 4096):
+                self.test_write_member_matches_writestr()
+
+    def _archive(self, profile):
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w") as zip_file:
+            for name in sorted(self.files):
+                write_member(
+                    zip_file,
+                    compress_file(self.tmp / name, self._zip_info(name), profile),
+                )
+        return archive
+
+    def test_compression_profiles(self):
+        sizes = {}
+        for profile in PROFILES:
+            archive = self._archive(profile)
+
+            # verify every profile is deterministic and readable
+            self.assertEqual(archive.getvalue(), self._archive(profile).getvalue())
+            with zipfile.ZipFile(archive) as zip_file:
+                self.assertIsNone(zip_file.testzip())
+                for name, data in self.files.items():
+                    self.assertEqual(zip_file.read(name), data)
+            sizes[profile] = len(archive.getvalue())
+
+        self.assertLessEqual(sizes["smallest"], sizes["balanced"])
+        self.assertLessEqual(sizes["balanced"], sizes["fast"])
+
+    def test_fast_stores_compressed_types(self):
+        with zipfile.ZipFile(self._archive("fast")) as zip_file:
+            self.assertEqual(
+                zip_file.getinfo("binary.so").compress_type, zipfile.ZIP_STORED
+            )
+            self.assertEqual(
+                zip_file.getinfo("text.py").compress_type, zipfile.ZIP_DEFLATED
+            )
+
+    def test_stores_data_deflate_does_not_shrink(self):
+        data = self.files["binary.so"]
+        member = compress_data(data, zipfile.ZipInfo("random.bin"), "smallest")
+        self.assertEqual(member.zip_info.compress_type, zipfile.ZIP_STORED)
+        self.assertEqual(member.zip_info.compress_size, len(data))
+        self.assertEqual(member.data.read(), data)
+
+        # the default profile keeps deflating it like ZipFile.writestr
+        member = compress_data(data, zipfile.ZipInfo("random.bin"))
+        self.assertEqual(member.zip_info.compress_type, zipfile.ZIP_DEFLATED)
+
+    @skipUnless(zopfli, "zopfli is not installed")
+    def test_smallest_uses_zopfli(self):
+        data = self.files["text.py"]
+        member = compress_data(data, zipfile.ZipInfo("text.py"), "smallest")
+        with patch("lambda_packaging.compression.zopfli", None):
+            deflated = compress_data(data, zipfile.ZipInfo("text.py"), "smallest")
+        self.assertLessEqual(
+            member.zip_info.compress_size, deflated.zip_info.compress_size
+        )
+
+        # verify the raw deflate stream is readable
+        self.assertEqual(zlib.decompress(member.data.read(), -15), data)
+
+    def test_ordered_map(self):
+        items = [(i,) for i in range(20)]
+        self.assertEqual(
+            list(ordered_map(lambda i: i * 2, items, workers=4)),
+            [i * 2 for i in range(20)],
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
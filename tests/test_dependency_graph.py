@@ -0,0 +1,126 @@
+from unittest import TestCase
+from lambda_packaging.dependency_graph import DependencyGraph
+from pathlib import Path
+import tempfile
+import shutil
+import os
+
+# name, version, Requires-Dist, installed files with their size
+DISTRIBUTIONS = [
+    ("mylib", "1.0", ["boto3", "requests (>=2)", "jmespath"], {"mylib.py": 10}),
+    (
+        "boto3",
+        "1.12.0",
+        [
+            "botocore (<1.16.0,>=1.15.0)",
+            "jmespath",
+            "s3transfer",
+        ],
+        {"boto3/__init__.py": 100},
+    ),
+    ("botocore", "1.15.0", ["jmespath"], {"botocore/__init__.py": 1000}),
+    ("s3transfer", "0.3.3", ["botocore"], {"s3transfer/__init__.py": 50}),
+    ("jmespath", "0.9.5", [], {"jmespath/__init__.py": 20}),
+    (
+        "requests",
+        "2.23.0",
+        ["idna", "PySocks (!=1.5.7) ; extra == 'socks'"],
+        {"requests/__init__.py": 30},
+    ),
+    ("idna", "2.9", [], {"idna/__init__.py": 40}),
+]
+
+
+class TestDependencyGraph(TestCase):
+    def setUp(self):
+        self.install_path = Path(tempfile.mkdtemp())
+        for name, version, requires, files in DISTRIBUTIONS:
+            dist_info = self.install_path / f"{name}-{version}.dist-info"
+            os.makedirs(dist_info)
+            with open(dist_info / "METADATA", "w") as f:
+                f.write(f"Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n")
+                for requirement in requires:
+                    f.write(f"Requires-Dist: {requirement}\n")
+            with open(dist_info / "RECORD", "w") as f:
+                for file, size in files.items():
+                    path = self.install_path / file
+                    os.makedirs(path.parent, exist_ok=True)
+                    with open(path, "wb") as data:
+                        data.write(b"x" * size)
+                    f.write(f"{file},sha256=,{size}\n")
+                f.write(f"{dist_info.name}/METADATA,,\n")
+                f.write(f"../../bin/{name},,\n")
+                os.makedirs(self.install_path / "bin", exist_ok=True)
+                open(self.install_path / "bin" / name, "w").close()
+
+    def test_graph(self):
+        graph = DependencyGraph(self.install_path)
+        self.assertEqual(
+            graph.distributions["mylib"]["requires"], ["boto3", "jmespath", "requests"]
+        )
+
+        # verify dependencies of extras are ignored
+        self.assertEqual(graph.distributions["requests"]["requires"], ["idna"])
+        self.assertEqual(
+            graph.closure(["mylib"], stop={"boto3"}),
+            {"mylib", "jmespath", "requests", "idna"},
+        )
+
+    def test_exclusive_dependencies(self):
+        graph = DependencyGraph(self.install_path)
+        self.assertEqual(
+            graph.exclusive_dependencies(["boto3"], ["mylib"]),
+            ["boto3", "botocore", "s3transfer"],
+        )
+        self.assertEqual(
+            graph.exclusive_dependencies(["botocore"], ["mylib"]), ["botocore"]
+        )
+        self.assertEqual(graph.exclusive_dependencies(["pulumi"], ["mylib"]), [])
+
+    def test_remove(self):
+        self.dist_info_size = {
+            path.name.split("-")[0]: sum(f.stat().st_size for f in path.iterdir())
+            for path in self.install_path.glob("*.dist-info")
+        }
+        self.removed_size = 1150 + sum(
+            self.dist_info_size[name] for name in ["boto3", "botocore", "s3transfer"]
+        )
+
+        graph = DependencyGraph(self.install_path)
+        removed = graph.remove(["boto3"], ["mylib"])
+        self.assertEqual(list(removed), ["boto3", "botocore", "s3transfer"])
+        self.assertEqual(removed["botocore"], 1000 + self.dist_info_size["botocore"])
+        self.assertEqual(sum(removed.values()), self.removed_size)
+
+        # verify files, scripts, dist-info and emptied folders are deleted
+        self.assertEqual(
+            sorted(os.listdir(self.install_path / "bin")),
+            ["idna", "jmespath", "mylib", "requests"],
+        )
+        self.assertEqual(
+            sorted(os.listdir(self.install_path)),
+            [
+                "bin",
+                "idna",
+                "idna-2.9.dist-info",
+                "jmespath",
+                "jmespath-0.9.5.dist-info",
+                "mylib-1.0.dist-info",
+                "mylib.py",
+                "requests",
+                "requests-2.23.0.dist-info",
+            ],
+        )
+
+    def test_uninstall(self):
+        graph = DependencyGraph(self.install_path)
+        removed = graph.uninstall(["idna", "pulumi"])
+
+        # verify only the installed distributions are uninstalled
+        self.assertEqual(list(removed), ["idna"])
+        self.assertNotIn("idna", graph.distributions)
+        self.assertFalse((self.install_path / "idna").exists())
+        self.assertNotIn("idna", os.listdir(self.install_path / "bin"))
+
+    def tearDown(self):
+        shutil.rmtree(self.install_path, ignore_errors=True)
@@ -0,0 +1,129 @@
+from unittest import TestCase
+from unittest.mock import patch, Mock
+from lambda_packaging.docker_builder import (
+    DockerCLIBackend,
+    LocalBackend,
+    builder_image,
+    get_builder,
+)
+import tempfile
+import shutil
+import os
+
+
+class TestDockerBuilder(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.project = os.path.join(self.tmp, "dist")
+        self.pip_cache = os.path.join(self.tmp, "pip")
+        os.makedirs(self.project)
+
+    def test_builder_image(self):
+        self.assertEqual(
+            builder_image("lambci/lambda", "python3.8"),
+            "lambci/lambda:build-python3.8",
+        )
+        self.assertEqual(
+            builder_image("localhost:5000/builder:1.0", "python3.8"),
+            "localhost:5000/builder:1.0",
+        )
+
+    def test_builder_is_reused(self):
+        backend = LocalBackend()
+        builder = get_builder(
+            "lambci/lambda:build-python3.8",
+            {self.project: "/io"},
+            pip_cache=self.pip_cache,
+            backend=backend,
+        )
+        command = [
+            "python",
+            "-c",
+            "import os; print(os.getcwd()); print(os.environ['PIP_CACHE_DIR'])",
+        ]
+
+        # verify container paths are mapped to their volumes
+        result = builder.exec(command, workdir="/io")
+        self.assertEqual(
+            result.stdout.split(), [os.path.realpath(self.project), self.pip_cache]
+        )
+        self.assertTrue(os.path.isdir(self.pip_cache))
+
+        # verify the same warm container serves later installs
+        with patch.object(backend, "start") as start:
+            same_builder = get_builder(
+                "lambci/lambda:build-python3.8",
+                {self.project: "/io"},
+                pip_cache=self.pip_cache,
+                backend=backend,
+            )
+            self.assertIs(same_builder, builder)
+            same_builder.exec(command, workdir="/io")
+            start.assert_not_called()
+        self.assertEqual(len(backend.commands), 2)
+        self.assertEqual(list(backend.containers), [builder.name])
+
+    @patch("lambda_packaging.docker_builder.subprocess.run")
+    def test_docker_cli_backend(self, mock_run):
+        backend = DockerCLIBackend(user="1000:1000")
+
+        # verify an idle container is created with its volumes and environment,
+        # running as the host user so the host can modify the installed files
+        mock_run.return_value = Mock(returncode=1, stdout="")
+        backend.start(
+            "builder", "image:tag", {"/host/dist": "/io"}, {"PIP_CACHE_DIR": "/cache"}
+        )
+        mock_run.assert_called_with(
+            [
+                "docker",
+                "run",
+                "-d",
+                "--name",
+                "builder",
+                "--entrypoint",
+                "sleep",
+                "--user",
+                "1000:1000",
+                "-e",
+                "HOME=/tmp",
+                "-v",
+                "/host/dist:/io",
+                "-e",
+                "PIP_CACHE_DIR=/cache",
+                "image:tag",
+                "infinity",
+            ],
+            stdout=-1,
+            stderr=-1,
+            universal_newlines=True,
+        )
+
+        # verify a stopped container is restarted
+        mock_run.return_value = Mock(returncode=0, stdout="false\n")
+        self.assertEqual(backend.state("builder"), "stopped")
+        backend.start("builder", "image:tag", {}, {})
+        self.assertEqual(mock_run.call_args[0][0], ["docker", "start", "builder"])
+
+        backend.exec("builder", ["python", "-V"], "/io")
+        self.assertEqual(
+            mock_run.call_args[0][0],
+            [
+                "docker",
+                "exec",
+                "--user",
+                "1000:1000",
+                "-e",
+                "HOME=/tmp",
+                "-w",
+                "/io",
+                "builder",
+                "python",
+                "-V",
+            ],
+        )
+
+        # verify commands run as the current user by default
+        self.assertEqual(DockerCLIBackend().user, f"{os.getuid()}:{os.getgid()}")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
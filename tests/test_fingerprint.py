@@ -0,0 +1,52 @@
+from unittest import TestCase
+from lambda_packaging.fingerprint import BuildRecord, input_fingerprint
+from pathlib import Path
+import tempfile
+import shutil
+import os
+
+
+class TestFingerprint(TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.source = self.tmp / "handler.py"
+        with open(self.source, "w") as f:
+            f.write("print('hello')\n")
+        self.archive = self.tmp / "test-lambda.zip"
+        with open(self.archive, "wb") as f:
+            f.write(b"archive")
+        self.settings = {"runtime": "python3.8", "layer": False}
+
+    def test_input_fingerprint(self):
+        fingerprint = input_fingerprint([self.source], self.settings)
+        self.assertEqual(fingerprint, input_fingerprint([self.source], self.settings))
+
+        # verify settings and file changes change the fingerprint
+        self.assertNotEqual(
+            fingerprint, input_fingerprint([self.source], {"runtime": "python3.9"})
+        )
+        with open(self.source, "a") as f:
+            f.write("print('world')\n")
+        self.assertNotEqual(
+            fingerprint, input_fingerprint([self.source], self.settings)
+        )
+
+        # verify missing files are part of the fingerprint
+        missing = input_fingerprint([self.tmp / "requirements.lock"], self.settings)
+        self.assertNotEqual(missing, input_fingerprint([], self.settings))
+
+    def test_build_record(self):
+        record = BuildRecord(self.tmp / "build.json")
+        outputs = {"package_archive": str(self.archive), "package_hash": "hash"}
+        self.assertIsNone(record.load("fingerprint"))
+
+        record.save("fingerprint", outputs)
+        self.assertEqual(record.load("fingerprint"), outputs)
+        self.assertIsNone(record.load("other"))
+
+        # verify outputs whose archives were deleted are not reused
+        os.remove(self.archive)
+        self.assertIsNone(record.load("fingerprint"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
@@ -0,0 +1,94 @@
+from unittest import TestCase
+from unittest.mock import patch
+from lambda_packaging import hashing
+from lambda_packaging.hashing import DigestCache, digest_files, file_digest
+from pathlib import Path
+from types import SimpleNamespace
+import tempfile
+import hashlib
+import shutil
+import time
+import os
+
+
+class TestHashing(TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.files = []
+        for i, size in enumerate([0, 1000, 300 * 1024]):
+            path = self.tmp / f"file{i}.bin"
+            with open(path, "wb") as f:
+                f.write(os.urandom(size))
+            self.files.append(path)
+
+        # make the files older than the racy window so they can be cached
+        old = time.time() - 60
+        for path in self.files:
+            os.utime(path, (old, old))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def expected(self, path):
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).digest()
+
+    def test_file_digest(self):
+        for path in self.files:
+            self.assertEqual(file_digest(path), self.expected(path))
+
+        # verify memory-mapped and buffered reads give the same digests
+        with patch.object(hashing, "MMAP_MIN_SIZE", 1):
+            for path in self.files:
+                self.assertEqual(file_digest(path), self.expected(path))
+        without_file_digest = SimpleNamespace(sha256=hashlib.sha256)
+        with patch.object(hashing, "hashlib", without_file_digest):
+            for path in self.files:
+                self.assertEqual(file_digest(path), self.expected(path))
+
+    def test_digest_files(self):
+        expected = [self.expected(path) for path in self.files]
+        self.assertEqual(digest_files(self.files, workers=4), expected)
+        self.assertEqual(digest_files(self.files, workers=1), expected)
+        self.assertEqual(digest_files([]), [])
+
+    def test_digest_cache(self):
+        cache_path = self.tmp / "digests.json"
+        cache = DigestCache(cache_path)
+        expected = [self.expected(path) for path in self.files]
+        self.assertEqual(cache.digests(self.files), expected)
+        cache.save()
+
+        # verify cached files are not read again, even by another instance
+        cache = DigestCache(cache_path)
+        with patch.object(hashing, "file_digest") as mock_digest:
+            self.assertEqual(cache.digests(self.files), expected)
+            mock_digest.assert_not_called()
+
+        # verify changed files are hashed again
+        with open(self.files[1], "ab") as f:
+            f.write(b"changed")
+        self.assertEqual(cache.digest(self.files[1]), self.expected(self.files[1]))
+
+    def test_digest_cache_racy_files(self):
+        cache_path = self.tmp / "digests.json"
+        cache = DigestCache(cache_path)
+        os.utime(self.files[1])
+        self.assertEqual(cache.digest(self.files[1]), self.expected(self.files[1]))
+        cache.save()
+
+        # verify recently modified files are not cached
+        self.assertFalse(os.path.exists(cache_path))
+
+    def test_digest_cache_save(self):
+        cache_path = self.tmp / "digests.json"
+        cache = DigestCache(cache_path)
+        cache.digests(self.files)
+        os.remove(self.files[0])
+        cache.save()
+
+        # verify entries of deleted files are dropped
+        self.assertEqual(
+            sorted(DigestCache(cache_path).entries),
+            sorted(str(path) for path in self.files[1:]),
+        )
@@ -0,0 +1,130 @@
+from unittest import TestCase
+from lambda_packaging.layer_planner import (
+    plan_layers,
+    check_max_layers,
+    LayerPlanner,
+    MAX_LAYERS,
+)
+from pathlib import Path
+import tempfile
+import shutil
+import json
+import os
+
+MB = 1024**2
+
+
+class TestPlanLayers(TestCase):
+    def test_plan_layers(self):
+        distributions = {
+            "numpy": {"size": 80 * MB, "changes": 0},
+            "scipy": {"size": 120 * MB, "changes": 0},
+            "six": {"size": 1 * MB, "changes": 0},
+            "idna": {"size": 1 * MB, "changes": 0},
+            "mylib": {"size": 2 * MB, "changes": 3},
+        }
+        layers = plan_layers(distributions)
+        self.assertEqual(
+            layers,
+            {
+                "scipy": ["scipy"],
+                "numpy": ["numpy"],
+                "stable": ["idna", "six"],
+                "volatile": ["mylib"],
+            },
+        )
+
+        # verify the plan is independent of the input order
+        self.assertEqual(
+            list(plan_layers(dict(reversed(list(distributions.items()))))),
+            list(layers),
+        )
+
+    def test_check_max_layers(self):
+        check_max_layers(1)
+        check_max_layers(MAX_LAYERS)
+
+        # verify lambda layer limits are enforced
+        for max_layers in [0, MAX_LAYERS + 1, 8]:
+            with self.assertRaises(ValueError):
+                check_max_layers(max_layers)
+
+    def test_plan_layers_budget(self):
+        distributions = {
+            name: {"size": (10 - i) * 30 * MB, "changes": 0}
+            for i, name in enumerate(["a", "b", "c", "d", "e", "f", "g"])
+        }
+        distributions["volatile-lib"] = {"size": MB, "changes": 2}
+
+        # verify the heaviest distributions get their own layers within the limit
+        layers = plan_layers(distributions, max_layers=5)
+        self.assertEqual(
+            layers,
+            {
+                "a": ["a"],
+                "b": ["b"],
+                "c": ["c"],
+                "stable": ["d", "e", "f", "g"],
+                "volatile": ["volatile-lib"],
+            },
+        )
+        self.assertEqual(
+            plan_layers(distributions, max_layers=1),
+            {"stable": sorted(distributions)},
+        )
+
+
+class TestLayerPlanner(TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.install_path = self.tmp / "requirements"
+        self.history_path = self.tmp / "layers.json"
+        self._install("numpy", "1.18.0", {"numpy/core.so": 3000})
+        self._install("six", "1.14.0", {"six.py": 100})
+        with open(self.install_path / "unowned.py", "w") as f:
+            f.write("x")
+
+    def _install(self, name, version, files):
+        dist_info = self.install_path / f"{name}-{version}.dist-info"
+        shutil.rmtree(
+            next(self.install_path.glob(f"{name}-*.dist-info"), dist_info),
+            ignore_errors=True,
+        )
+        os.makedirs(dist_info)
+        with open(dist_info / "METADATA", "w") as f:
+            f.write(f"Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n")
+        with open(dist_info / "RECORD", "w") as f:
+            for file, size in files.items():
+                os.makedirs((self.install_path / file).parent, exist_ok=True)
+                with open(self.install_path / file, "wb") as data:
+                    data.write(b"x" * size)
+                f.write(f"{file},,\n")
+
+    def test_plan(self):
+        planner = LayerPlanner(self.install_path, self.history_path, heavy_size=1000)
+        self.assertEqual(
+            planner.plan(),
+            {
+                "numpy": [str(self.install_path / "numpy/core.so")],
+                "stable": [
+                    str(self.install_path / "six.py"),
+                    str(self.install_path / "unowned.py"),
+                ],
+            },
+        )
+
+    def test_plan_history(self):
+        planner = LayerPlanner(self.install_path, self.history_path, heavy_size=1000)
+        for version in ["1.15.0", "1.16.0"]:
+            planner.plan()
+            self._install("six", version, {"six.py": 100})
+
+        # verify distributions updated twice are volatile
+        layers = planner.plan()
+        self.assertEqual(list(layers), ["numpy", "stable", "volatile"])
+        self.assertEqual(layers["volatile"], [str(self.install_path / "six.py")])
+        with open(self.history_path) as f:
+            self.assertEqual(json.load(f)["six"], {"version": "1.16.0", "changes": 2})
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
@@ -0,0 +1,103 @@
+from unittest import TestCase
+from lambda_packaging.lockfile import (
+    Lockfile,
+    LockError,
+    read_report,
+    resolve_args,
+)
+import tempfile
+import shutil
+import json
+import os
+
+REPORT = {
+    "version": "1",
+    "install": [
+        {
+            "download_info": {
+                "url": "https://files/six-1.14.0-py2.py3-none-any.whl",
+                "archive_info": {"hashes": {"sha256": "aaa"}},
+            },
+            "metadata": {"name": "six", "version": "1.14.0"},
+        },
+        {
+            "download_info": {
+                "url": "https://files/Jinja2-2.11.1-py2.py3-none-any.whl",
+                "archive_info": {"hash": "sha256=bbb"},
+            },
+            "metadata": {"name": "Jinja2", "version": "2.11.1"},
+        },
+    ],
+}
+
+
+class TestLockfile(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.report_path = os.path.join(self.tmp, "report.json")
+
+    def _write_report(self, report):
+        with open(self.report_path, "w") as f:
+            json.dump(report, f)
+
+    def test_read_report(self):
+        self._write_report(REPORT)
+        self.assertEqual(
+            read_report(self.report_path),
+            {
+                "jinja2": "jinja2==2.11.1 --hash=sha256:bbb",
+                "six": "six==1.14.0 --hash=sha256:aaa",
+            },
+        )
+
+        # verify artifacts without hash cannot be locked
+        self._write_report(
+            {
+                "install": [
+                    {
+                        "download_info": {"url": "file:///src/app", "dir_info": {}},
+                        "metadata": {"name": "app", "version": "0.1"},
+                    }
+                ]
+            }
+        )
+        with self.assertRaises(LockError):
+            read_report(self.report_path)
+
+    def test_save_load(self):
+        lockfile = Lockfile(os.path.join(self.tmp, "requirements.lock"))
+        self.assertIsNone(lockfile.load())
+
+        requirements = {"six": "six==1.14.0 --hash=sha256:aaa"}
+        lockfile.save("key", requirements)
+        self.assertEqual(lockfile.load(), ("key", requirements))
+
+    def test_resolve_args(self):
+        args = resolve_args("requirements.txt", "report.json")
+        self.assertEqual(args[:2], ["install", "--dry-run"])
+        self.assertNotIn("--platform", args)
+
+        # verify host resolutions can be restricted to wheels
+        args = resolve_args("requirements.txt", "report.json", only_binary=True)
+        self.assertEqual(args[-1], "--only-binary=:all:")
+        self.assertNotIn("--platform", args)
+
+        # verify lambda platform wheels are resolved for dockerized installs
+        args = resolve_args("requirements.txt", "report.json", "python3.8", "target")
+        self.assertEqual(
+            args[-9:],
+            [
+                "--target",
+                "target",
+                "--platform",
+                "manylinux2014_x86_64",
+                "--python-version",
+                "3.8",
+                "--implementation",
+                "cp",
+                "--only-binary=:all:",
+            ],
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
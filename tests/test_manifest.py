@@ -0,0 +1,107 @@
+from unittest import TestCase
+from lambda_packaging.manifest import ArchiveManifest
+from pathlib import Path
+import tempfile
+import shutil
+import os
+import hashlib
+
+
+class TestArchiveManifest(TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.source = self.tmp / "handler.py"
+        with open(self.source, "w") as f:
+            f.write("print('hello')\n")
+
+        self.archive = self.tmp / "test-lambda.zip"
+        with open(self.archive, "wb") as f:
+            f.write(b"archive")
+
+        self.manifest = ArchiveManifest(self.archive)
+        self.entries = [(self.source, "handler.py")]
+        self.settings = {"datetime": (2020, 1, 1, 0, 0, 0)}
+
+    def test_path(self):
+        self.assertEqual(self.manifest.path, Path(f"{self.archive}.manifest.json"))
+
+    def test_snapshot(self):
+        snapshot = self.manifest.snapshot(self.entries, self.settings)
+        record = snapshot["files"][0]
+        self.assertEqual(record["path"], "handler.py")
+        self.assertEqual(record["size"], 15)
+        self.assertEqual(
+            record["sha256"], hashlib.sha256(b"print('hello')\n").hexdigest()
+        )
+        self.assertEqual(snapshot["settings"], {"datetime": [2020, 1, 1, 0, 0, 0]})
+
+    def test_matches(self):
+        self.assertIsNone(self.manifest.load())
+
+        current = self.manifest.snapshot(self.entries, self.settings)
+        self.manifest.save(current, "hash")
+        previous = self.manifest.load()
+        self.assertEqual(previous["archive"]["hash"], "hash")
+
+        # unchanged inputs
+        current = self.manifest.snapshot(self.entries, self.settings, previous)
+        self.assertTrue(self.manifest.matches(previous, current))
+
+        # changed settings
+        current = self.manifest.snapshot(self.entries, {"datetime": None}, previous)
+        self.assertFalse(self.manifest.matches(previous, current))
+
+        # changed file content
+        with open(self.source, "w") as f:
+            f.write("print('world')\n")
+        current = self.manifest.snapshot(self.entries, self.settings, previous)
+        self.assertFalse(self.manifest.matches(previous, current))
+
+    def test_matches_when_mode_changed(self):
+        current = self.manifest.snapshot(self.entries, self.settings)
+        self.manifest.save(current, "hash")
+        previous = self.manifest.load()
+
+        # only the mode changes, it is archived in the member attributes
+        stat = os.stat(self.source)
+        os.chmod(self.source, 0o755)
+        os.utime(self.source, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        current = self.manifest.snapshot(self.entries, self.settings, previous)
+        self.assertEqual(current["files"][0]["sha256"], previous["files"][0]["sha256"])
+        self.assertFalse(self.manifest.matches(previous, current))
+
+    def test_matches_when_archive_changed(self):
+        current = self.manifest.snapshot(self.entries, self.settings)
+        self.manifest.save(current, "hash")
+        previous = self.manifest.load()
+
+        with open(self.archive, "wb") as f:
+            f.write(b"modified archive")
+        self.assertFalse(self.manifest.matches(previous, current))
+
+        os.remove(self.archive)
+        self.assertFalse(self.manifest.matches(previous, current))
+
+    def test_unchanged_sources(self):
+        other = self.tmp / "util.py"
+        with open(other, "w") as f:
+            f.write("VALUE = 1\n")
+        entries = self.entries + [(other, "util.py")]
+        current = self.manifest.snapshot(entries, self.settings)
+        self.manifest.save(current, "hash")
+        previous = self.manifest.load()
+
+        # only the sources with the same content are unchanged
+        with open(self.source, "w") as f:
+            f.write("print('world')\n")
+        current = self.manifest.snapshot(entries, self.settings, previous)
+        self.assertEqual(
+            self.manifest.unchanged_sources(previous, current), {str(other)}
+        )
+
+        # nothing is reused from an archive built with other settings
+        current = self.manifest.snapshot(entries, {"datetime": None}, previous)
+        self.assertEqual(self.manifest.unchanged_sources(previous, current), set())
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
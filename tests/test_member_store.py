@@ -0,0 +1,54 @@
+from unittest import TestCase
+from lambda_packaging.member_store import MemberStore
+from lambda_packaging.compression import compress_data, write_member
+import tempfile
+import shutil
+import zipfile
+import os
+import io
+
+
+class TestMemberStore(TestCase):
+    def setUp(self):
+        self.store_dir = tempfile.mkdtemp()
+        self.store = MemberStore(self.store_dir, max_size=1000)
+        self.data = b"import os\n" * 1000
+
+    def test_get_put(self):
+        self.assertIsNone(self.store.get("key", zipfile.ZipInfo("a.py")))
+
+        member = compress_data(self.data, zipfile.ZipInfo("a.py"))
+        compressed = member.data.read()
+        member.data.seek(0)
+        self.store.put("key", member)
+
+        # verify the member is rewound and stored data can be written raw
+        self.assertEqual(member.data.read(), compressed)
+        stored = self.store.get("key", zipfile.ZipInfo("b.py"))
+        self.assertTrue(stored.reused)
+        self.assertEqual(stored.zip_info.CRC, member.zip_info.CRC)
+
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w") as zip_file:
+            write_member(zip_file, stored)
+        with zipfile.ZipFile(archive) as zip_file:
+            self.assertEqual(zip_file.read("b.py"), self.data)
+
+    def test_evict(self):
+        for i in range(3):
+            member = compress_data(os.urandom(600), zipfile.ZipInfo("a.bin"))
+            path = self.store.put(f"key{i}", member)
+            os.utime(path, (i, i))
+
+        # verify least recently used blobs are evicted beyond max_size
+        evicted = self.store.evict()
+        self.assertEqual(
+            evicted,
+            [str(self.store.blob_path("key0")), str(self.store.blob_path("key1"))],
+        )
+        member = self.store.get("key2", zipfile.ZipInfo("a.bin"))
+        self.assertIsNotNone(member)
+        member.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.store_dir, ignore_errors=True)
@@ -1,8 +1,18 @@
 from unittest import TestCase
 from unittest.mock import patch, Mock, mock_open
-from lambda_packaging.pip_requirements import PipRequirements
+from lambda_packaging.pip_requirements import (
+    PipRequirements,
+    InstallError,
+    default_lock_path,
+)
+from lambda_packaging.cache import host_platform
+from lambda_packaging.lockfile import LockError
 from pathlib import PosixPath
+import tempfile
+import shutil
+import json
 import sys
+import os
 
 
 # test inputs and outputes of sample requirements
@@ -65,6 +75,40 @@ class TestPipRequirements(TestCase):
             PosixPath("dist/requirements"), exist_ok=True
         )
 
+    def test_target_requirements_path_per_install_folder(self):
+        with patch("lambda_packaging.pip_requirements.os"):
+            pip = PipRequirements(
+                resource_name="test-pip-requirements",
+                project_root="./",
+                requirements_path="requirements.txt",
+                install_folder="requirements-abc/",
+            )
+
+        # verify concurrent installs into other folders write other files
+        self.assertEqual(
+            str(pip.target_requirements_path), "dist/requirements-abc.txt"
+        )
+        self.assertEqual(
+            pip.docker_cmd(pip.target_requirements_path.name)[-3:],
+            ["requirements-abc.txt", "-t", "/io/requirements-abc"],
+        )
+
+    def test_default_lock_path(self):
+        self.assertEqual(
+            default_lock_path("app/requirements.txt", dockerize=True),
+            PosixPath("app/requirements.lock"),
+        )
+        self.assertEqual(
+            default_lock_path("app/requirements.txt", dockerize=True, name="abc"),
+            PosixPath("app/requirements-abc.lock"),
+        )
+
+        # verify host resolutions are named after the platform they pin
+        self.assertEqual(
+            default_lock_path("app/requirements.txt"),
+            PosixPath(f"app/requirements.{host_platform()}.lock"),
+        )
+
     def test_generate_requirements_file(self):
         self.pip.filter_requirements = Mock()
         self.pip.filter_requirements.return_value = filtered_requirements
@@ -119,21 +163,351 @@ class TestPipRequirements(TestCase):
                     self.pip.install_requirements()
                     dockerize.assert_called()
 
-    @patch("lambda_packaging.pip_requirements.RemoteImage")
-    @patch("lambda_packaging.pip_requirements.Container")
-    @patch("lambda_packaging.pip_requirements.format_resource_name")
-    def test_dockerize_pip(self, mock_resource_name, mock_container, mock_remote_image):
+    @patch("lambda_packaging.pip_requirements.get_builder")
+    def test_dockerize_pip(self, mock_get_builder):
         self.pip.dockerize_pip()
-        mock_remote_image.assert_called_with(
-            mock_resource_name("python-runtime"),
-            name="lambci/lambda",
-            keep_locally=True,
+        mock_get_builder.assert_called_with(
+            "lambci/lambda:build-python3.6",
+            volumes={"dist": "/io"},
+            pip_cache=None,
+            backend=None,
         )
 
-        mock_container.assert_called_once()
+        # verify the install runs in the warm builder container
+        mock_get_builder().exec.assert_called_once_with(
+            self.pip.docker_cmd(), workdir="/io"
+        )
 
     def test_docker_cmd(self):
         # assert docker command output
-        expected_cmd = '''"cd /io; pip install -r requirements.txt -t dist/requirements"'''
+        expected_cmd = [
+            "python",
+            "-m",
+            "pip",
+            "install",
+            "-r",
+            "requirements.txt",
+            "-t",
+            "/io/requirements",
+        ]
         self.assertEqual(self.pip.docker_cmd(), expected_cmd)
 
+    @patch("lambda_packaging.pip_requirements.RequirementsCache")
+    def test_install_requirements_cached(self, mock_cache):
+        with patch("lambda_packaging.pip_requirements.os"):
+            pip = PipRequirements(
+                resource_name="test-pip-requirements",
+                project_root="./",
+                requirements_path="requirements.txt",
+                cache_dir="cache/",
+            )
+
+        with patch.object(pip, "generate_requirements_file"):
+            with patch(
+                "lambda_packaging.pip_requirements.subprocess.run"
+            ) as mock_subprocess:
+                # verify pip is skipped on a cache hit
+                mock_cache().get.return_value = True
+                pip.install_requirements()
+                mock_subprocess.assert_not_called()
+
+                # verify successful installs are stored on a cache miss
+                mock_cache().get.return_value = False
+                mock_subprocess.return_value.returncode = 0
+                pip.install_requirements()
+                mock_subprocess.assert_called_once()
+                mock_cache().put.assert_called_once()
+
+    def test_install_requirements_wheelhouse(self):
+        wheelhouse_dir = tempfile.mkdtemp()
+        with patch("lambda_packaging.pip_requirements.os"):
+            pip = PipRequirements(
+                resource_name="test-pip-requirements",
+                project_root="./",
+                requirements_path="requirements.txt",
+                wheelhouse_dir=wheelhouse_dir,
+            )
+
+        with patch.object(pip, "filter_requirements") as filter_requirements:
+            filter_requirements.return_value = filtered_requirements
+            with patch("lambda_packaging.pip_requirements.open", mock_open()):
+                with patch(
+                    "lambda_packaging.pip_requirements.subprocess.run"
+                ) as mock_subprocess:
+                    mock_subprocess.return_value.returncode = 0
+
+                    # verify wheels are built before the offline install
+                    pip.install_requirements()
+                    commands = [c[0][0][3:] for c in mock_subprocess.call_args_list]
+                    self.assertEqual(
+                        [command[0] for command in commands], ["wheel", "install"]
+                    )
+                    self.assertIn("--no-index", commands[1])
+
+                    # verify built wheels are reused without building them again
+                    mock_subprocess.reset_mock()
+                    pip.install_requirements()
+                    mock_subprocess.assert_called_once()
+                    self.assertEqual(
+                        mock_subprocess.call_args[0][0][3:5], ["install", "--no-index"]
+                    )
+
+                    # verify wheels are built again when the offline install fails
+                    mock_subprocess.reset_mock()
+                    mock_subprocess.side_effect = [
+                        Mock(returncode=1),
+                        Mock(returncode=0),
+                        Mock(returncode=0),
+                    ]
+                    with patch("lambda_packaging.pip_requirements.pulumi"):
+                        pip.install_requirements()
+                    commands = [c[0][0][3] for c in mock_subprocess.call_args_list]
+                    self.assertEqual(commands, ["install", "wheel", "install"])
+
+                    # verify a failed retry raises instead of archiving a
+                    # partial install
+                    mock_subprocess.reset_mock()
+                    mock_subprocess.side_effect = None
+                    mock_subprocess.return_value = Mock(returncode=1)
+                    with patch("lambda_packaging.pip_requirements.pulumi"):
+                        with self.assertRaises(InstallError):
+                            pip.install_requirements()
+
+        shutil.rmtree(wheelhouse_dir, ignore_errors=True)
+
+    def test_install_requirements_locked(self):
+        project_root = tempfile.mkdtemp()
+        with open(os.path.join(project_root, "requirements.txt"), "w") as f:
+            f.write("six\n")
+        pip = PipRequirements(
+            resource_name="test-pip-requirements",
+            project_root=project_root,
+            requirements_path="requirements.txt",
+            lock=True,
+        )
+
+        def resolve(cmd, **kwargs):
+            report_path = cmd[cmd.index("--report") + 1]
+            with open(report_path, "w") as f:
+                json.dump(
+                    {
+                        "install": [
+                            {
+                                "download_info": {
+                                    "url": "https://files/six.whl",
+                                    "archive_info": {"hashes": {"sha256": "aaa"}},
+                                },
+                                "metadata": {"name": "six", "version": "1.14.0"},
+                            }
+                        ]
+                    },
+                    f,
+                )
+            return Mock(returncode=0)
+
+        with patch(
+            "lambda_packaging.pip_requirements.subprocess.run", side_effect=resolve
+        ) as mock_subprocess:
+            # verify requirements are resolved into the lockfile once
+            pip.generate_requirements_file()
+            pip.generate_requirements_file()
+            mock_subprocess.assert_called_once()
+
+        self.assertEqual(pip.requirements, {"six": "six==1.14.0 --hash=sha256:aaa"})
+        with open(pip.target_requirements_path) as f:
+            self.assertEqual(f.read(), "six==1.14.0 --hash=sha256:aaa\n")
+        # verify host resolutions are locked per platform
+        self.assertEqual(
+            pip.lockfile.path.name, f"requirements.{host_platform()}.lock"
+        )
+        self.assertTrue(os.path.isfile(pip.lockfile.path))
+
+        shutil.rmtree(project_root, ignore_errors=True)
+
+    def test_lock_requirements_wheelhouse(self):
+        project_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, project_root, ignore_errors=True)
+        with open(os.path.join(project_root, "requirements.txt"), "w") as f:
+            f.write("termcolor==1.1.0\n")
+
+        def build(**kwargs):
+            return PipRequirements(
+                resource_name="test-pip-requirements",
+                project_root=project_root,
+                requirements_path="requirements.txt",
+                lock=True,
+                **kwargs,
+            )
+
+        commands = []
+
+        def resolve(cmd, **kwargs):
+            commands.append(cmd)
+            report_path = cmd[cmd.index("--report") + 1]
+            artifact = "whl" if "--only-binary=:all:" in cmd else "sdist"
+            with open(report_path, "w") as f:
+                json.dump(
+                    {
+                        "install": [
+                            {
+                                "download_info": {
+                                    "url": f"https://files/termcolor.{artifact}",
+                                    "archive_info": {"hashes": {"sha256": artifact}},
+                                },
+                                "metadata": {"name": "termcolor", "version": "1.1.0"},
+                            }
+                        ]
+                    },
+                    f,
+                )
+            return Mock(returncode=0)
+
+        with patch(
+            "lambda_packaging.pip_requirements.subprocess.run", side_effect=resolve
+        ):
+            pip = build()
+            pip.generate_requirements_file()
+            self.assertEqual(
+                pip.requirements["termcolor"], "termcolor==1.1.0 --hash=sha256:sdist"
+            )
+
+            # verify a wheelhouse, which builds its own wheels of sdists,
+            # re-locks the requirements to wheels only
+            pip = build(wheelhouse_dir=os.path.join(project_root, "wheelhouse"))
+            pip.generate_requirements_file()
+            self.assertIn("--only-binary=:all:", commands[-1])
+            self.assertEqual(len(commands), 2)
+            self.assertEqual(
+                pip.requirements["termcolor"], "termcolor==1.1.0 --hash=sha256:whl"
+            )
+
+        # verify requirements without wheels are rejected with a clear error
+        with patch("lambda_packaging.pip_requirements.subprocess.run") as run:
+            run.return_value = Mock(returncode=1, stderr="no matching distribution")
+            with open(os.path.join(project_root, "requirements.txt"), "w") as f:
+                f.write("termcolor==1.1.1\n")
+            with self.assertRaisesRegex(LockError, "wheels only"):
+                pip.generate_requirements_file()
+
+    @patch("lambda_packaging.pip_requirements.DependencyGraph")
+    def test_install_requirements_exclude_transitive(self, mock_graph):
+        with patch("lambda_packaging.pip_requirements.os"):
+            pip = PipRequirements(
+                resource_name="test-pip-requirements",
+                project_root="./",
+                requirements_path="requirements.txt",
+                no_deploy=["boto3"],
+                exclude_transitive=True,
+            )
+
+        mock_graph().remove.return_value = {"boto3": 100, "botocore": 1000}
+        with patch.object(pip, "filter_requirements") as filter_requirements:
+            filter_requirements.return_value = filtered_requirements
+            with patch("lambda_packaging.pip_requirements.open", mock_open()):
+                with patch("lambda_packaging.pip_requirements.subprocess.run"):
+                    pip.install_requirements()
+
+        # verify no_deploy distributions are removed with the top-level roots kept
+        mock_graph().remove.assert_called_with(["boto3"], list(filtered_requirements))
+        self.assertEqual(pip.no_deploy_report, {"boto3": 100, "botocore": 1000})
+
+    def test_install_requirements_output(self):
+        with patch.object(self.pip, "generate_requirements_file"):
+            with patch(
+                "lambda_packaging.pip_requirements.subprocess.run"
+            ) as mock_subprocess:
+                mock_subprocess.return_value = Mock(
+                    returncode=1, stdout=b"Collecting six\n", stderr=b"No matching\n"
+                )
+                with patch("lambda_packaging.pip_requirements.pulumi.log") as mock_log:
+                    self.pip.install_requirements()
+
+        # verify pip output is kept and reported on failure
+        self.assertEqual(self.pip.pip_output, "Collecting six\nNo matching\n")
+        mock_log.warn.assert_called_once()
+        phase = self.pip.profiler.report()["phases"][-1]
+        self.assertEqual(phase["phase"], "pip_install")
+        self.assertEqual(phase["returncode"], 1)
+
+    def test_install_requirements_sync(self):
+        project_root = tempfile.mkdtemp()
+        with open(os.path.join(project_root, "requirements.txt"), "w") as f:
+            f.write("six\nidna\n")
+        pip = PipRequirements(
+            resource_name="test-pip-requirements",
+            project_root=project_root,
+            requirements_path="requirements.txt",
+            sync=True,
+        )
+
+        def install_distribution(target, name, version):
+            dist_info = os.path.join(target, f"{name}-{version}.dist-info")
+            os.makedirs(dist_info)
+            with open(os.path.join(dist_info, "METADATA"), "w") as f:
+                f.write(f"Name: {name}\nVersion: {version}\n")
+            with open(os.path.join(dist_info, "RECORD"), "w") as f:
+                f.write(f"{name}.py,,\n")
+            open(os.path.join(target, f"{name}.py"), "w").close()
+
+        installed = [("six", "1.14.0"), ("idna", "2.9"), ("attrs", "19.3.0")]
+        for name, version in installed:
+            install_distribution(pip.install_path, name, version)
+
+        resolved = [("six", "1.15.0"), ("idna", "2.9")]
+
+        def run(cmd, **kwargs):
+            if "--dry-run" in cmd:
+                with open(cmd[cmd.index("--report") + 1], "w") as f:
+                    json.dump(
+                        {
+                            "install": [
+                                {
+                                    "download_info": {"url": "", "archive_info": {}},
+                                    "metadata": {"name": name, "version": version},
+                                }
+                                for name, version in resolved
+                            ]
+                        },
+                        f,
+                    )
+            else:
+                target = cmd[-2].split("=", 1)[1]
+                install_distribution(target, "six", "1.15.0")
+            return Mock(returncode=0, stdout=b"", stderr=b"")
+
+        with patch(
+            "lambda_packaging.pip_requirements.subprocess.run", side_effect=run
+        ) as mock_subprocess:
+            pip.install_requirements()
+
+        # verify only the changed distribution is installed, without dependencies
+        self.assertEqual(mock_subprocess.call_args[0][0][-1], "--no-deps")
+        with open(os.path.join(project_root, "dist", "requirements.sync.txt")) as f:
+            self.assertEqual(f.read(), "six==1.15.0\n")
+        self.assertEqual(
+            pip.sync_report, {"uninstalled": ["attrs", "six"], "installed": ["six"]}
+        )
+        self.assertEqual(
+            sorted(os.listdir(pip.install_path)),
+            ["idna-2.9.dist-info", "idna.py", "six-1.15.0.dist-info", "six.py"],
+        )
+        self.assertFalse(
+            os.path.exists(os.path.join(project_root, "dist", "requirements.sync"))
+        )
+
+        # verify a failed sync raises instead of leaving a partial install
+        resolved = [("six", "1.16.0"), ("idna", "2.9")]
+
+        def fail(cmd, **kwargs):
+            if "--dry-run" in cmd:
+                return run(cmd, **kwargs)
+            return Mock(returncode=1, stdout=b"", stderr=b"no matching distribution")
+
+        with patch(
+            "lambda_packaging.pip_requirements.subprocess.run", side_effect=fail
+        ):
+            with patch("lambda_packaging.pip_requirements.pulumi"):
+                with self.assertRaises(InstallError):
+                    pip.install_requirements()
+
+        shutil.rmtree(project_root, ignore_errors=True)
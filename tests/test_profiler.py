@@ -0,0 +1,63 @@
+from unittest import TestCase
+from unittest.mock import patch
+from lambda_packaging.profiler import Profiler, tree_stats
+import tempfile
+import shutil
+import json
+import os
+
+
+class TestProfiler(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def test_phase(self):
+        profiler = Profiler("test")
+        with profiler.phase("add_files", archive="test.zip") as record:
+            record["files"] = 2
+            record["bytes_read"] = 100
+        with profiler.phase("archive_hash") as record:
+            record["bytes_read"] = 50
+
+        report = profiler.report()
+        self.assertEqual(report["name"], "test")
+        self.assertEqual(
+            [phase["phase"] for phase in report["phases"]],
+            ["add_files", "archive_hash"],
+        )
+        self.assertEqual(report["phases"][0]["archive"], "test.zip")
+        self.assertEqual(report["totals"]["files"], 2)
+        self.assertEqual(report["totals"]["bytes_read"], 150)
+        for key in ["wall_time", "cpu_time"]:
+            self.assertGreaterEqual(report["phases"][0][key], 0)
+
+    def test_phase_recorded_on_error(self):
+        profiler = Profiler("test")
+        with self.assertRaises(ValueError):
+            with profiler.phase("pip_install"):
+                raise ValueError()
+        self.assertEqual(len(profiler.report()["phases"]), 1)
+
+    def test_save_and_log(self):
+        profiler = Profiler("test")
+        with profiler.phase("filter_package"):
+            pass
+
+        path = os.path.join(self.tmp, "profile.json")
+        profiler.save(path)
+        with open(path) as f:
+            self.assertEqual(json.load(f), profiler.report())
+
+        with patch("lambda_packaging.profiler.pulumi.log") as mock_log:
+            profiler.log()
+            mock_log.info.assert_called_once()
+
+    def test_tree_stats(self):
+        os.makedirs(os.path.join(self.tmp, "nested"))
+        for name, size in [("a.py", 10), ("nested/b.py", 20)]:
+            with open(os.path.join(self.tmp, name), "wb") as f:
+                f.write(b"x" * size)
+        self.assertEqual(tree_stats(self.tmp), (2, 30))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
@@ -0,0 +1,87 @@
+from unittest import TestCase
+from lambda_packaging.pruning import (
+    LayerPruner,
+    PackageSizeError,
+    check_unzipped_size,
+    check_archives_size,
+)
+from pathlib import Path
+import tempfile
+import zipfile
+import shutil
+import os
+
+INSTALLED = {
+    "requests/__init__.py": 100,
+    "requests/api.py": 50,
+    "numpy/__init__.pyi": 10,
+    "numpy/core/tests/test_core.py": 200,
+    "numpy/core/multiarray.py": 300,
+    "numpy/examples/demo.py": 20,
+    "botocore/client.py": 1000,
+    "botocore-1.15.0.dist-info/RECORD": 5,
+    "requests-2.23.0.dist-info/METADATA": 5,
+    "six.py": 30,
+}
+
+
+class TestLayerPruner(TestCase):
+    def setUp(self):
+        self.install_path = Path(tempfile.mkdtemp())
+        for name, size in INSTALLED.items():
+            path = self.install_path / name
+            os.makedirs(path.parent, exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(b"x" * size)
+
+    def test_prune(self):
+        pruner = LayerPruner(self.install_path)
+        removed = pruner.prune()
+        self.assertEqual(
+            removed, {"numpy": 230, "botocore": 1000, "botocore-1.15.0.dist-info": 5}
+        )
+
+        # verify pruned files and emptied directories are deleted
+        self.assertFalse(os.path.exists(self.install_path / "numpy/core/tests"))
+        self.assertFalse(os.path.exists(self.install_path / "botocore"))
+        self.assertTrue(os.path.exists(self.install_path / "numpy/core/multiarray.py"))
+        self.assertTrue(os.path.exists(self.install_path / "six.py"))
+
+    def test_prune_selected_rules(self):
+        pruner = LayerPruner(self.install_path, ["tests"], ["six.py"])
+        self.assertEqual(pruner.prune(), {"numpy": 200, "six.py": 30})
+        self.assertEqual(LayerPruner(self.install_path, []).prune(), {})
+
+    def test_size_report(self):
+        pruner = LayerPruner(self.install_path, ["runtime"])
+        report = pruner.size_report(pruner.prune())
+
+        # dist-info folders are not archived, so not reported
+        self.assertEqual(
+            report,
+            {
+                "numpy": {"files": 4, "size": 530, "pruned": 0},
+                "requests": {"files": 2, "size": 150, "pruned": 0},
+                "six.py": {"files": 1, "size": 30, "pruned": 0},
+                "botocore": {"files": 0, "size": 0, "pruned": 1000},
+                "botocore-1.15.0.dist-info": {"files": 0, "size": 0, "pruned": 5},
+            },
+        )
+
+    def test_check_size(self):
+        check_unzipped_size(100, limit=100)
+        with self.assertRaises(PackageSizeError):
+            check_unzipped_size(101, limit=100)
+
+        archive = self.install_path / "test.zip"
+        with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zip_file:
+            zip_file.writestr("data.bin", b"\0" * 10000)
+
+        check_archives_size([archive])
+        with self.assertRaises(PackageSizeError):
+            check_archives_size([archive], zipped_limit=10)
+        with self.assertRaises(PackageSizeError):
+            check_archives_size([archive, archive], unzipped_limit=15000)
+
+    def tearDown(self):
+        shutil.rmtree(self.install_path, ignore_errors=True)
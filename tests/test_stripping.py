@@ -0,0 +1,87 @@
+from unittest import TestCase, skipUnless
+from unittest.mock import patch
+from lambda_packaging.stripping import SymbolStripper, find_strip, native_extensions
+from pathlib import Path
+import subprocess
+import tempfile
+import shutil
+import ctypes
+import os
+
+SOURCE = "int answer(void) { return 42; }\n"
+
+
+class TestStripping(TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.install_path = self.tmp / "requirements"
+        os.makedirs(self.install_path / "package")
+
+    def _compile(self, name):
+        source = self.tmp / "answer.c"
+        with open(source, "w") as f:
+            f.write(SOURCE)
+        path = self.install_path / "package" / name
+        subprocess.run(
+            ["cc", "-g", "-shared", "-fPIC", "-o", str(path), str(source)], check=True
+        )
+        return path
+
+    def test_native_extensions(self):
+        with open(self.install_path / "package" / "fake.so", "wb") as f:
+            f.write(b"not an ELF file")
+        with open(self.install_path / "package" / "lib.so.1.2", "wb") as f:
+            f.write(b"\x7fELF")
+        os.symlink("lib.so.1.2", self.install_path / "package" / "lib.so")
+
+        self.assertEqual(
+            native_extensions(self.install_path),
+            [str(self.install_path / "package" / "lib.so.1.2")],
+        )
+
+    def test_strip_failure_keeps_file(self):
+        with open(self.install_path / "package" / "lib.so", "wb") as f:
+            f.write(b"\x7fELF")
+
+        stripper = SymbolStripper(self.install_path, strip_tool="false")
+        self.assertEqual(stripper.strip(), {"package/lib.so": 0})
+        self.assertEqual(os.listdir(self.install_path / "package"), ["lib.so"])
+
+    @skipUnless(find_strip() and shutil.which("cc"), "strip or cc is not installed")
+    def test_strip(self):
+        path = self._compile("_answer.cpython-38-x86_64-linux-gnu.so")
+        original = self.tmp / "original.so"
+        shutil.copyfile(path, original)
+
+        stripper = SymbolStripper(self.install_path, cache_dir=self.tmp / "cache")
+        report = stripper.strip()
+        self.assertGreater(report["package/_answer.cpython-38-x86_64-linux-gnu.so"], 0)
+        self.assertEqual(ctypes.CDLL(str(path)).answer(), 42)
+        with open(path, "rb") as f:
+            stripped = f.read()
+        mtime = os.stat(path).st_mtime_ns
+
+        # verify cached results are reused without running strip again
+        shutil.copyfile(original, path)
+        with patch(
+            "lambda_packaging.stripping.subprocess.run", wraps=subprocess.run
+        ) as run:
+            self.assertEqual(
+                SymbolStripper(self.install_path, cache_dir=self.tmp / "cache").strip(),
+                report,
+            )
+            self.assertEqual(
+                [call for call in run.call_args_list if "-o" in call[0][0]], []
+            )
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), stripped)
+        # verify restored files keep their mtime, like their archive manifest
+        self.assertEqual(os.stat(path).st_mtime_ns, mtime)
+
+        # verify stripped files are not stripped again
+        self.assertEqual(
+            stripper.strip(), {"package/_answer.cpython-38-x86_64-linux-gnu.so": 0}
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
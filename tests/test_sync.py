@@ -0,0 +1,87 @@
+from unittest import TestCase
+from lambda_packaging.sync import (
+    pinned_version,
+    read_resolution,
+    diff_distributions,
+    merge_tree,
+)
+from pathlib import Path
+import tempfile
+import shutil
+import json
+import os
+
+
+def report_item(name, version, url, direct=False, info="archive_info"):
+    return {
+        "metadata": {"name": name, "version": version},
+        "download_info": {"url": url, info: {}},
+        "is_direct": direct,
+    }
+
+
+class TestSync(TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+
+    def _report(self, items):
+        report_path = self.tmp / "report.json"
+        with open(report_path, "w") as f:
+            json.dump({"install": items}, f)
+        return report_path
+
+    def test_pinned_version(self):
+        self.assertEqual(pinned_version("six==1.14.0"), "1.14.0")
+        self.assertEqual(pinned_version("six==1.14.0 --hash=sha256:aaa"), "1.14.0")
+
+    def test_read_resolution(self):
+        report_path = self._report(
+            [
+                report_item("Six", "1.14.0", "https://files/six.whl"),
+                report_item("mylib", "1.0", "https://host/mylib.whl", direct=True),
+            ]
+        )
+        self.assertEqual(
+            read_resolution(report_path),
+            {
+                "mylib": ("1.0", "mylib @ https://host/mylib.whl"),
+                "six": ("1.14.0", "six==1.14.0"),
+            },
+        )
+
+        # verify local directories can't be pinned
+        report_path = self._report(
+            [report_item("mylib", "1.0", "file:///src", True, "dir_info")]
+        )
+        self.assertIsNone(read_resolution(report_path))
+
+    def test_diff_distributions(self):
+        installed = {"six": "1.14.0", "idna": "2.9", "attrs": "19.3.0"}
+        desired = {"six": "1.15.0", "idna": "2.9", "requests": "2.23.0"}
+        self.assertEqual(
+            diff_distributions(installed, desired),
+            (["attrs", "six"], ["requests", "six"]),
+        )
+        self.assertEqual(diff_distributions(desired, desired), ([], []))
+
+    def test_merge_tree(self):
+        for path in [
+            "source/google/cloud/storage.py",
+            "source/six.py",
+            "target/google/auth.py",
+            "target/six.py",
+        ]:
+            os.makedirs((self.tmp / path).parent, exist_ok=True)
+            with open(self.tmp / path, "w") as f:
+                f.write(path)
+
+        # verify shared folders are merged and files replaced
+        merge_tree(self.tmp / "source", self.tmp / "target")
+        self.assertEqual(
+            sorted(os.listdir(self.tmp / "target" / "google")), ["auth.py", "cloud"]
+        )
+        with open(self.tmp / "target" / "six.py") as f:
+            self.assertEqual(f.read(), "source/six.py")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
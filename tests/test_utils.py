@@ -5,7 +5,11 @@ from lambda_packaging.utils import (
     format_resource_name,
     sha256sum,
     filebase64sha256,
+    HashingWriter,
 )
+import base64
+import hashlib
+import io
 
 
 class TestUtils(TestCase):
@@ -27,4 +31,29 @@ class TestUtils(TestCase):
 
     def test_filebase64sha256(self):
         expected_hash = "7tmXmHm+TRjBYobZQ5ovx9h0S7iH14vSmH5/ut64Slc="
-        self.assertEqual(filebase64sha256('tests/data/sample_file.py'), expected_hash)
\ No newline at end of file
+        self.assertEqual(filebase64sha256('tests/data/sample_file.py'), expected_hash)
+
+    def test_hashing_writer(self):
+        fp = io.BytesIO()
+        writer = HashingWriter(fp)
+        writer.write(b"hello ")
+        writer.write(b"world")
+        self.assertEqual(
+            writer.base64digest(),
+            base64.b64encode(hashlib.sha256(b"hello world").digest()).decode(),
+        )
+
+        # verify existing content is hashed when appending
+        fp = io.BytesIO(b"hello ")
+        writer = HashingWriter(fp)
+        writer.seek(0, 2)
+        writer.write(b"world")
+        self.assertEqual(
+            writer.base64digest(),
+            base64.b64encode(hashlib.sha256(b"hello world").digest()).decode(),
+        )
+
+        # verify rewriting hashed bytes invalidates the hash
+        writer.seek(0)
+        writer.write(b"H")
+        self.assertIsNone(writer.base64digest())
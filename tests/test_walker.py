@@ -0,0 +1,131 @@
+from unittest import TestCase
+from unittest.mock import patch
+from lambda_packaging.walker import (
+    PathMatcher,
+    IgnoreMatcher,
+    walk_files,
+)
+import tempfile
+import shutil
+import glob
+import warnings
+import os
+
+TREE = [
+    "handler.py",
+    "README.md",
+    ".env",
+    "src/app.py",
+    "src/app.pyc",
+    "src/__pycache__/app.cpython-38.pyc",
+    "src/nested/deep/module.py",
+    "src/[brackets].txt",
+    ".git/config",
+    ".github/workflow.yml",
+    "node_modules/pkg/index.js",
+    "dist/stack-lambda.zip",
+    "requests-2.23.0.dist-info/RECORD",
+]
+
+PATTERNS = [
+    ["**"],
+    ["*.py"],
+    ["**/*.py"],
+    ["src/**"],
+    ["src/*"],
+    ["**/deep/*.py"],
+    ["*.md", "src/nested/**"],
+    ["src/[[]brackets].txt"],
+    ["src/?pp.py"],
+    [".github/**"],
+]
+
+
+class TestWalker(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        for name in TREE:
+            path = os.path.join(self.root, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.write(name)
+
+    def _glob(self, patterns):
+        return {
+            f
+            for pattern in patterns
+            for f in glob.glob(os.path.join(self.root, pattern), recursive=True)
+            if os.path.isfile(f)
+        }
+
+    def test_path_matcher_follows_glob(self):
+        for patterns in PATTERNS:
+            with self.subTest(patterns=patterns):
+                self.assertEqual(
+                    walk_files(self.root, patterns),
+                    sorted(self._glob(patterns)),
+                )
+
+    def test_exclude(self):
+        exclude = ["node_modules/**", "**/*.md", "src/nested/**"]
+        self.assertEqual(
+            walk_files(self.root, ["**"], exclude),
+            sorted(self._glob(["**"]) - self._glob(exclude)),
+        )
+
+    def test_excluded_directories_are_pruned(self):
+        with patch("lambda_packaging.walker.os.scandir", wraps=os.scandir) as scandir:
+            walk_files(self.root, ["**"], ["node_modules/**", "src/**"])
+            walked = {
+                os.path.relpath(c[0][0], self.root) for c in scandir.call_args_list
+            }
+        self.assertEqual(walked, {".", "dist", "requests-2.23.0.dist-info"})
+
+    def test_ignore(self):
+        ignore = IgnoreMatcher(["*.py[c|o]", "*/__pycache__*", "*.dist-info*"])
+        files = walk_files(self.root, ["**"], ignore=ignore)
+        self.assertEqual(
+            [os.path.relpath(f, self.root) for f in files],
+            [
+                "README.md",
+                "dist/stack-lambda.zip",
+                "handler.py",
+                "node_modules/pkg/index.js",
+                "src/[brackets].txt",
+                "src/app.py",
+                "src/nested/deep/module.py",
+            ],
+        )
+        self.assertTrue(
+            ignore.matches_all_below(os.path.join(self.root, "__pycache__"))
+        )
+        self.assertFalse(ignore.matches_all_below(os.path.join(self.root, "src")))
+
+    def test_relative_root(self):
+        cwd = os.getcwd()
+        os.chdir(self.root)
+        try:
+            self.assertEqual(walk_files(".", ["*.py"]), ["handler.py"])
+        finally:
+            os.chdir(cwd)
+
+    def test_path_matcher(self):
+        matcher = PathMatcher(["dist/**", "**/node_modules/**"])
+        self.assertTrue(matcher.match("dist/a/b.zip"))
+        self.assertFalse(matcher.match("dist/.hidden"))
+        self.assertTrue(matcher.matches_all_below("dist"))
+        self.assertTrue(matcher.matches_all_below("web/node_modules"))
+        self.assertFalse(matcher.matches_all_below("src"))
+
+    def test_path_matcher_character_sets(self):
+        # verify set characters are literal, without warnings of future re syntax
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            matcher = PathMatcher(["[[]a].txt", "[&~|]b.txt", "[!&]c.txt"])
+        for name in ["[a].txt", "&b.txt", "~b.txt", "|b.txt", "xc.txt"]:
+            self.assertTrue(matcher.match(name), name)
+        for name in ["a].txt", "&&b.txt", "&c.txt"]:
+            self.assertFalse(matcher.match(name), name)
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
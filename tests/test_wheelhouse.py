@@ -0,0 +1,60 @@
+from unittest import TestCase
+from lambda_packaging.wheelhouse import (
+    Wheelhouse,
+    wheel_args,
+    offline_install_args,
+)
+import tempfile
+import shutil
+import os
+
+
+class TestWheelhouse(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.wheelhouse = Wheelhouse(os.path.join(self.tmp, "wheels"))
+
+    def test_mark_built(self):
+        self.assertFalse(self.wheelhouse.is_built("key"))
+        self.wheelhouse.mark_built("key", {"six": "six==1.14.0"})
+        self.assertTrue(self.wheelhouse.is_built("key"))
+        self.assertFalse(self.wheelhouse.is_built("other-key"))
+
+        self.wheelhouse.unmark_built("key")
+        self.assertFalse(self.wheelhouse.is_built("key"))
+        self.wheelhouse.unmark_built("key")
+
+    def test_wheels(self):
+        for name in ["six-1.14.0-py2.py3-none-any.whl", "idna-2.9.tar.gz"]:
+            open(self.wheelhouse.path / name, "w").close()
+        self.assertEqual(self.wheelhouse.wheels(), ["six-1.14.0-py2.py3-none-any.whl"])
+
+    def test_pip_args(self):
+        self.assertEqual(
+            wheel_args("requirements.txt", "/wheels"),
+            [
+                "wheel",
+                "-r",
+                "requirements.txt",
+                "--wheel-dir",
+                "/wheels",
+                "--find-links",
+                "/wheels",
+            ],
+        )
+        self.assertEqual(
+            offline_install_args("requirements.txt", "/wheels", "/target"),
+            [
+                "install",
+                "--no-index",
+                "--find-links",
+                "/wheels",
+                "-r",
+                "requirements.txt",
+                "--target",
+                "/target",
+            ],
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
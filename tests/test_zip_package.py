@@ -1,7 +1,14 @@
 from unittest import TestCase
 from unittest.mock import patch, mock_open
 from lambda_packaging.zip_package import ZipPackage
+from lambda_packaging.utils import filebase64sha256
+from lambda_packaging.member_store import MemberStore
 from pathlib import PosixPath, Path
+import shutil
+import tempfile
+import zipfile
+import sys
+import os
 
 
 class TestZipPackage(TestCase):
@@ -44,6 +51,12 @@ class TestZipPackage(TestCase):
             PosixPath("dist/requirements"), exist_ok=True
         )
 
+    def test_init_unknown_compression(self):
+        with self.assertRaises(ValueError):
+            ZipPackage(
+                resource_name="test-zip-package", project_root="./", compression="zstd"
+            )
+
     def test_get_path(self):
         self.assertEqual(
             self.zip_package.get_path("sample_file.py"),
@@ -89,28 +102,37 @@ class TestZipPackage(TestCase):
             self.zip_package, "project_root", Path("tests/data/test_files")
         ):
             with patch.object(self.zip_package, "exclude", ["*.txt", "*.md"]):
-                self.assertAlmostEqual(
-                    sorted(self.zip_package.filter_package()),
-                    sorted(
-                        [
-                            "tests/data/test_files/file_1.py",
-                            "tests/data/test_files/test_nest/file_4.py",
-                            "tests/data/test_files/test_nest",
-                            "tests/data/test_files/",
-                        ]
-                    ),
+                self.assertEqual(
+                    self.zip_package.filter_package(),
+                    [
+                        "tests/data/test_files/file_1.py",
+                        "tests/data/test_files/test_nest/file_4.py",
+                    ],
                 )
             with patch.object(self.zip_package, "exclude", ["**"]):
                 self.assertEqual(self.zip_package.filter_package(), [])
                 with patch.object(self.zip_package, "include", ["**/*.py"]):
                     self.assertEqual(
-                        sorted(self.zip_package.filter_package()),
-                        sorted(
-                            [
-                                "tests/data/test_files/test_nest/file_4.py",
-                                "tests/data/test_files/file_1.py",
-                            ]
-                        ),
+                        self.zip_package.filter_package(),
+                        [
+                            "tests/data/test_files/file_1.py",
+                            "tests/data/test_files/test_nest/file_4.py",
+                        ],
+                    )
+
+    def test_filter_package_matches_glob(self):
+        # verify the single walk selects the same files as glob patterns
+        with patch.object(
+            self.zip_package, "project_root", Path("tests/data/test_files")
+        ):
+            for exclude in (["test_nest/**"], ["**/*.md", "file_2.txt"], []):
+                with patch.object(self.zip_package, "exclude", exclude):
+                    expected = set(
+                        self.zip_package._match_glob_files(["**"])
+                    ) - set(self.zip_package._match_glob_files(exclude))
+                    self.assertEqual(
+                        self.zip_package.filter_package(),
+                        sorted(f for f in expected if os.path.isfile(f)),
                     )
 
     def test_zip_package(self):
@@ -140,15 +162,21 @@ class TestZipPackage(TestCase):
                     self.zip_package.zip_requirements(), Path("dist/test-lambda.zip")
                 )
 
+    @patch("lambda_packaging.zip_package.write_member")
     @patch("lambda_packaging.zip_package.zipfile.ZipFile")
-    def test_add_files(self, mocked_zip_file):
+    def test_add_files(self, mocked_zip_file, mocked_write_member):
         test_file = "tests/data/test_files/file_1.py"
-        zip_path = "tests/data/test.zip"
+        zip_path = os.path.join(tempfile.mkdtemp(), "test.zip")
         self.zip_package._add_files(
             zip_path, [test_file], mode="w", base_path="tests/data",
         )
+        shutil.rmtree(os.path.dirname(zip_path))
         # assert if files are writen into a zip archive
-        mocked_zip_file().writestr.assert_called_once()
+        mocked_write_member.assert_called_once()
+        self.assertEqual(
+            mocked_write_member.call_args[0][1].zip_info.filename,
+            "test_files/file_1.py",
+        )
 
     def test_is_file_allowed(self):
         self.assertEqual(self.zip_package.is_file_allowed("hello.py"), True)
@@ -166,3 +194,181 @@ class TestZipPackage(TestCase):
             with patch.object(self.zip_package, "_add_files") as mocked_add_files:
                 self.zip_package._inject_requirements()
                 mocked_add_files.assert_called_once()
+
+    @patch("lambda_packaging.zip_package.format_file_name")
+    def test_incremental_zip_requirements(self, mocked_format_file_name):
+        mocked_format_file_name.return_value = "test-requirements.zip"
+        root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        os.makedirs(root / "dist")
+        with patch.object(self.zip_package, "incremental", True):
+            with patch.object(self.zip_package, "project_root", root):
+                with patch.object(
+                    self.zip_package,
+                    "installed_requirements",
+                    Path("tests/data/test_files"),
+                ):
+                    zip_path = self.zip_package.zip_requirements()
+                    archive_hash = self.zip_package.archive_hash(zip_path)
+
+                    # verify unchanged archive is reused with its hash
+                    with patch.object(self.zip_package, "_add_files") as add_files:
+                        self.zip_package.hashes = {}
+                        self.zip_package.zip_requirements()
+                        add_files.assert_not_called()
+                        self.assertEqual(
+                            self.zip_package.hashes[str(zip_path)], archive_hash
+                        )
+
+                    # verify archive is rebuilt when settings change
+                    with patch(
+                        "lambda_packaging.zip_package.CONST_DATETIME",
+                        (2020, 2, 1, 0, 0, 0),
+                    ):
+                        with patch.object(
+                            self.zip_package, "_add_files"
+                        ) as add_files:
+                            self.zip_package.zip_requirements()
+                            add_files.assert_called_once()
+
+    def test_add_files_parallel(self):
+        dist = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, dist, ignore_errors=True)
+        files = self.zip_package._match_glob_files(["tests/data/test_files/**"])
+
+        # verify parallel compression produces the same archive
+        sequential_path = os.path.join(dist, "sequential.zip")
+        parallel_path = os.path.join(dist, "parallel.zip")
+        self.zip_package._add_files(sequential_path, files, base_path="tests/data")
+        with patch.object(self.zip_package, "workers", 4):
+            self.zip_package._add_files(parallel_path, files, base_path="tests/data")
+
+        with open(sequential_path, "rb") as sequential:
+            with open(parallel_path, "rb") as parallel:
+                self.assertEqual(sequential.read(), parallel.read())
+
+    def test_archive_hash_computed_while_writing(self):
+        dist = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, dist, ignore_errors=True)
+        zip_path = os.path.join(dist, "test.zip")
+        files = self.zip_package._match_glob_files(["tests/data/test_files/*"])
+
+        # verify hashes of new and appended archives match the file content
+        self.zip_package._add_files(zip_path, files, base_path="tests/data")
+        self.assertEqual(self.zip_package.hashes[zip_path], filebase64sha256(zip_path))
+
+        nested = self.zip_package._match_glob_files(["tests/data/test_files/*/*"])
+        self.zip_package._add_files(zip_path, nested, "a", base_path="tests/data")
+        self.assertEqual(self.zip_package.hashes[zip_path], filebase64sha256(zip_path))
+
+        with patch("lambda_packaging.zip_package.filebase64sha256") as file_hash:
+            self.zip_package.archive_hash(zip_path)
+            file_hash.assert_not_called()
+
+    def test_add_files_compile_bytecode(self):
+        dist = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, dist, ignore_errors=True)
+        zip_path = os.path.join(dist, "test.zip")
+        files = self.zip_package._match_glob_files(["tests/data/test_files/**"])
+        runtime = f"python{sys.version_info.major}.{sys.version_info.minor}"
+        cache_tag = sys.implementation.cache_tag
+
+        with patch.object(self.zip_package, "cache_tag", cache_tag):
+            self.zip_package._add_files(zip_path, files, base_path="tests/data")
+
+        # verify pycs of python files follow the archived files
+        with zipfile.ZipFile(zip_path) as zip_file:
+            self.assertEqual(
+                zip_file.namelist(),
+                [
+                    "test_files/file_1.py",
+                    "test_files/file_2.txt",
+                    "test_files/file_3.md",
+                    "test_files/test_nest/file_4.py",
+                    f"test_files/__pycache__/file_1.{cache_tag}.pyc",
+                    f"test_files/test_nest/__pycache__/file_4.{cache_tag}.pyc",
+                ],
+            )
+            self.assertEqual(
+                zip_file.getinfo(
+                    f"test_files/__pycache__/file_1.{cache_tag}.pyc"
+                ).date_time,
+                (2020, 1, 1, 0, 0, 0),
+            )
+
+    def test_add_files_profiled(self):
+        dist = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, dist, ignore_errors=True)
+        zip_path = os.path.join(dist, "test.zip")
+        files = self.zip_package._match_glob_files(["tests/data/sample_file.py"])
+        self.zip_package._add_files(zip_path, files, base_path="tests/data")
+
+        # verify the phase records the files read and the archive written
+        phase = self.zip_package.profiler.report()["phases"][-1]
+        self.assertEqual(phase["phase"], "add_files")
+        self.assertEqual(phase["archive"], "test.zip")
+        self.assertEqual(phase["files"], 1)
+        self.assertEqual(phase["bytes_read"], os.path.getsize(files[0]))
+        self.assertEqual(phase["bytes_written"], os.path.getsize(zip_path))
+
+    def test_patch_reuses_unchanged_members(self):
+        root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        for name in ["handler.py", "util.py", "dist/requirements/lib/module.py"]:
+            os.makedirs((root / name).parent, exist_ok=True)
+            with open(root / name, "w") as f:
+                f.write(f"NAME = {name!r}\n" * 100)
+
+        def build(**kwargs):
+            zip_package = ZipPackage(
+                resource_name="test-patch", project_root=root, **kwargs
+            )
+            zip_package.cache_tag = sys.implementation.cache_tag
+            zip_path = zip_package.zip_package()
+            with open(zip_path, "rb") as f:
+                return f.read(), zip_package
+
+        build(incremental=True, patch=True)
+        with open(root / "handler.py", "a") as f:
+            f.write("CHANGED = True\n")
+        patched, zip_package = build(incremental=True, patch=True)
+
+        # verify only the changed source and its pyc are compressed again
+        reused = [
+            phase["reused"]
+            for phase in zip_package.profiler.report()["phases"]
+            if phase["phase"] == "add_files"
+        ]
+        self.assertEqual(reused, [2, 2])
+        self.assertFalse(os.path.exists(f"{zip_package.zip_path}.previous"))
+
+        # verify the patched archive is the one built from scratch
+        rebuilt, zip_package = build(incremental=False)
+        self.assertEqual(patched, rebuilt)
+
+    def test_member_store_shared_across_packages(self):
+        store_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, store_dir, ignore_errors=True)
+        dist = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, dist, ignore_errors=True)
+        files = self.zip_package._match_glob_files(["tests/data/test_files/**"])
+        self.zip_package._add_files(
+            os.path.join(dist, "expected.zip"), files, base_path="tests/data"
+        )
+
+        # verify the second package copies every member built by the first
+        for name in ["first", "second"]:
+            zip_package = ZipPackage(
+                resource_name=name,
+                project_root=dist,
+                member_store=MemberStore(store_dir),
+            )
+            zip_package._add_files(
+                os.path.join(dist, f"{name}.zip"), files, base_path="tests/data"
+            )
+        phase = zip_package.profiler.report()["phases"][-1]
+        self.assertEqual(phase["reused"], phase["files"])
+
+        with open(os.path.join(dist, "expected.zip"), "rb") as expected:
+            with open(os.path.join(dist, "second.zip"), "rb") as second:
+                self.assertEqual(second.read(), expected.read())